@@ -31,6 +31,7 @@ try:
     from services.document_service import DocumentService
     from services.audio_service import AudioService
     from services.teaching_service import TeachingService
+    from core.course_catalog import CourseCatalog
     SERVICES_AVAILABLE = True
     print("✅ All services loaded successfully")
 except ImportError as e:
@@ -66,11 +67,13 @@ chat_service = None
 document_service = None
 audio_service = None
 teaching_service = None
+course_catalog = None
 
 if SERVICES_AVAILABLE:
     try:
-        chat_service = ChatService()
         document_service = DocumentService()
+        course_catalog = document_service.document_processor.catalog
+        chat_service = ChatService()
         audio_service = AudioService()
         teaching_service = TeachingService()
         print("✅ All services initialized successfully")
@@ -80,44 +83,85 @@ if SERVICES_AVAILABLE:
 
 # ===== COURSE MANAGEMENT ENDPOINTS =====
 
+# Running course builds started with streamed progress, kept referenced until they finish
+build_tasks = set()
+
+async def sse_build_events(course_id: str):
+    """Formats a course build's progress events as server-sent events."""
+    async for event in document_service.build_events.subscribe(course_id):
+        yield f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
 @app.post("/api/upload-pdfs")
 async def upload_and_process_pdfs(
     files: List[UploadFile] = File(...),
-    course_title: str = Form(None)
+    course_title: str = Form(None),
+    course_id: str = Form(None),
+    stream: bool = Form(False)
 ):
-    """Upload PDF files and generate course content."""
+    """
+    Upload PDF files and generate a new course, or regenerate course `course_id` from them.
+    With `stream`, the response is a server-sent event stream of the build's progress
+    (curriculum, module and sub-topic completion), ending with the generated course.
+    """
     if not SERVICES_AVAILABLE or not document_service:
         raise HTTPException(status_code=503, detail="Document processing service not available")
 
     try:
         logging.info(f"Processing {len(files)} PDF files for course: {course_title}")
         
-        # Process PDFs and generate course
-        course_data = await document_service.process_pdfs_and_generate_course(files, course_title)
+        if stream:
+            # Create the course up front so its events can be streamed from the start
+            if course_id is None:
+                course_id = course_catalog.create_course(course_title)
+            elif course_id not in course_catalog:
+                raise HTTPException(status_code=404, detail="Course not found")
+            document_service.build_events.start(course_id)
+            # The build outlives this request's upload files, so it gets its own copies
+            uploads = [UploadFile(file=io.BytesIO(await file.read()), filename=file.filename) for file in files]
+
+            async def build():
+                try:
+                    await asyncio.get_event_loop().run_in_executor(
+                        None, document_service.process_uploaded_pdfs, uploads, course_title, course_id
+                    )
+                except Exception as e:
+                    logging.error(f"Error generating course {course_id}: {e}")
+
+            task = asyncio.create_task(build())
+            build_tasks.add(task)
+            task.add_done_callback(build_tasks.discard)
+            return StreamingResponse(sse_build_events(course_id), media_type="text/event-stream")
+
+        # Process PDFs and generate course off the event loop
+        loop = asyncio.get_event_loop()
+        course_data = await loop.run_in_executor(
+            None, document_service.process_uploaded_pdfs, files, course_title, course_id
+        )
         
         if not course_data:
             raise HTTPException(status_code=500, detail="Failed to generate course content")
         
         logging.info(f"Course generated successfully: {course_data.get('course_title', 'Unknown')}")
-        return {"message": "Course generated successfully", "course": course_data}
+        return {"message": "Course generated successfully", "course_id": course_data["course_id"], "course": course_data}
         
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error processing PDFs: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/course/{course_id}/build-events")
+async def course_build_events(course_id: str):
+    """Server-sent events of a course's latest build: all events so far, then live until it ends."""
+    if not document_service or course_id not in document_service.build_events:
+        raise HTTPException(status_code=404, detail="No build found for this course")
+    return StreamingResponse(sse_build_events(course_id), media_type="text/event-stream")
+
 @app.get("/api/courses")
 async def get_courses():
     """Get list of available courses."""
     try:
-        if os.path.exists(config.OUTPUT_JSON_PATH):
-            with open(config.OUTPUT_JSON_PATH, 'r', encoding='utf-8') as f:
-                course_data = json.load(f)
-                return [{
-                    "course_id": "1",  # Single course system
-                    "course_title": course_data.get("course_title", "Generated Course"),
-                    "modules": len(course_data.get("modules", []))
-                }]
-        return []
+        return course_catalog.list_courses() if course_catalog else []
     except Exception as e:
         logging.error(f"Error loading courses: {e}")
         return []
@@ -126,18 +170,26 @@ async def get_courses():
 async def get_course_content(course_id: str):
     """Get specific course content."""
     try:
-        if os.path.exists(config.OUTPUT_JSON_PATH):
-            with open(config.OUTPUT_JSON_PATH, 'r', encoding='utf-8') as f:
-                course_data = json.load(f)
-                course_data["course_id"] = course_id
-                return course_data
-        raise HTTPException(status_code=404, detail="Course not found")
+        course_data = course_catalog.load_course(course_id) if course_catalog else None
+        if course_data is None:
+            raise HTTPException(status_code=404, detail="Course not found")
+        course_data["course_id"] = course_id
+        return course_data
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error loading course {course_id}: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 # ===== CHAT & COMMUNICATION ENDPOINTS =====
 
+RETRIEVAL_SCOPE_FIELDS = ("week", "topic", "type")
+
+def retrieval_scope(request: dict) -> Optional[dict]:
+    """Metadata filter limiting retrieval to a module/week/topic, e.g. {"week": 3} inside a lesson."""
+    scope = {field: request[field] for field in RETRIEVAL_SCOPE_FIELDS if request.get(field) is not None}
+    return scope or None
+
 @app.post("/api/chat")
 async def chat_endpoint(request: dict):
     """Text-only chat endpoint for dedicated chat page."""
@@ -147,12 +199,13 @@ async def chat_endpoint(request: dict):
     try:
         query = request.get('message') or request.get('query')
         language = request.get('language', 'en-IN')
+        course_id = request.get('course_id')
         
         if not query:
             raise HTTPException(status_code=400, detail="Message/query is required")
         
         logging.info(f"Chat query: {query[:50]}...")
-        response_data = await chat_service.ask_question(query, language)
+        response_data = await chat_service.ask_question(query, language, course_id, retrieval_scope(request))
         return response_data
     except Exception as e:
         logging.error(f"Error in chat: {e}")
@@ -167,6 +220,7 @@ async def chat_with_audio_endpoint(request: dict):
     try:
         query = request.get('message') or request.get('query')
         language = request.get('language', 'en-IN')
+        course_id = request.get('course_id')
         
         if not query:
             raise HTTPException(status_code=400, detail="Message/query is required")
@@ -174,7 +228,7 @@ async def chat_with_audio_endpoint(request: dict):
         logging.info(f"Chat with audio query: {query[:50]}...")
         
         # Get text response
-        response_data = await chat_service.ask_question(query, language)
+        response_data = await chat_service.ask_question(query, language, course_id, retrieval_scope(request))
         response_text = response_data.get('answer') or response_data.get('response', '')
         
         if not response_text:
@@ -243,12 +297,10 @@ async def start_class_endpoint(request: dict):
         logging.info(f"Starting class for course: {course_id}, module: {module_index}, topic: {sub_topic_index}")
         
         # Load course content
-        if not os.path.exists(config.OUTPUT_JSON_PATH):
+        course_data = course_catalog.load_course(course_id or course_catalog.default_course_id())
+        if course_data is None:
             raise HTTPException(status_code=404, detail="Course content not found")
         
-        with open(config.OUTPUT_JSON_PATH, 'r', encoding='utf-8') as f:
-            course_data = json.load(f)
-        
         # Validate indices
         if module_index >= len(course_data.get("modules", [])):
             raise HTTPException(status_code=400, detail="Module not found")
@@ -342,6 +394,25 @@ async def websocket_test(websocket: WebSocket):
     except Exception as e:
         logging.error(f"Test WebSocket connection error: {e}")
 
+@app.websocket("/ws/course-build/{course_id}")
+async def websocket_course_build(websocket: WebSocket, course_id: str):
+    """Streams a course's build progress events, as the build-events endpoint does."""
+    try:
+        await websocket.accept()
+        if not document_service or course_id not in document_service.build_events:
+            await websocket.send_json({"type": "error", "error": "No build found for this course"})
+            await websocket.close()
+            return
+        
+        async for event in document_service.build_events.subscribe(course_id):
+            await websocket.send_json(event)
+        await websocket.close()
+        
+    except WebSocketDisconnect:
+        logging.info(f"Course build WebSocket client of course {course_id} disconnected")
+    except Exception as e:
+        logging.error(f"Course build WebSocket error: {e}")
+
 @app.websocket("/ws/audio-stream")
 async def websocket_audio_stream(websocket: WebSocket):
     """WebSocket endpoint for real-time audio streaming with sub-900ms latency."""
@@ -437,7 +508,9 @@ async def handle_chat_with_audio(websocket: WebSocket, data: dict, chat_service,
         
         try:
             # Get text response
-            response_data = await chat_service.ask_question(query, language)
+            response_data = await chat_service.ask_question(
+                query, language, data.get("course_id"), retrieval_scope(data)
+            )
             response_text = response_data.get('answer') or response_data.get('response', '')
             
             if not response_text:
@@ -534,13 +607,11 @@ async def handle_start_class(websocket: WebSocket, data: dict, teaching_service,
         
         try:
             # Load course content
-            if not os.path.exists(config.OUTPUT_JSON_PATH):
+            course_data = course_catalog.load_course(course_id or course_catalog.default_course_id())
+            if course_data is None:
                 await websocket.send_json({"type": "error", "error": "Course content not found"})
                 return
             
-            with open(config.OUTPUT_JSON_PATH, 'r', encoding='utf-8') as f:
-                course_data = json.load(f)
-            
             # Validate indices
             if module_index >= len(course_data.get("modules", [])):
                 await websocket.send_json({"type": "error", "error": "Module not found"})
@@ -726,7 +797,13 @@ async def health_check():
             "document_service": document_service is not None,
             "audio_service": audio_service is not None,
             "teaching_service": teaching_service is not None
-        }
+        },
+        "loaded_courses": chat_service.rag_services.loaded() if chat_service else [],
+        "query_embedding_cache": chat_service.query_cache_stats() if chat_service else None,
+        "answer_cache": (
+            chat_service.answer_cache.stats()
+            if chat_service and chat_service.answer_cache else None
+        )
     }
 
 @app.get("/test-services")
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Approximate nearest-neighbour benchmark: builds each vector index backend on a synthetic
+corpus and reports recall@k against exact search, p50/p99 query latency, build time and memory.
+
+    python benchmarks/ann_benchmark.py
+    python benchmarks/ann_benchmark.py --count 200000 --dimensions 1024 --ef 32 64 128 --nprobe 8 32
+"""
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.vector_index import VectorIndex, faiss
+
+def synthetic_corpus(count: int, dimensions: int, query_count: int, seed: int):
+    """Clustered unit vectors, queried with noisy copies of corpus vectors."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(8, count // 100), dimensions))
+    vectors = centers[rng.integers(0, len(centers), count)] + 0.8 * rng.standard_normal((count, dimensions))
+    queries = vectors[rng.choice(count, query_count, replace=False)]
+    queries = queries + 0.4 * rng.standard_normal((query_count, dimensions))
+    return vectors.astype(np.float32), (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype(np.float32)
+
+def build_index(vectors: np.ndarray, backend: str, backend_params: dict, batch_size: int, rescore_factor: int):
+    """Builds the index with incremental inserts of `batch_size` rows, as ingestion does."""
+    index = VectorIndex(None, backend=backend, backend_params=backend_params, rescore_factor=rescore_factor)
+    ids = [str(i) for i in range(len(vectors))]
+    start = time.perf_counter()
+    for batch_start in range(0, len(vectors), batch_size):
+        batch_ids = ids[batch_start:batch_start + batch_size]
+        index.add_embeddings(batch_ids, vectors[batch_start:batch_start + batch_size], ids=batch_ids)
+    return index, time.perf_counter() - start
+
+def index_memory(index: VectorIndex) -> int:
+    backend = getattr(index.backend, "faiss_index", None)
+    if backend is not None:
+        return faiss.serialize_index(backend).nbytes
+    return index.memory_usage()["search_vectors"] or index.memory_usage()["vectors"]
+
+def run_queries(index: VectorIndex, queries: np.ndarray, k: int):
+    latencies, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        _, rows = index._search(query, k)
+        latencies.append(time.perf_counter() - start)
+        results.append(set(rows.tolist()))
+    return np.array(latencies) * 1000, results
+
+def report(name: str, index: VectorIndex, build_time: float, queries: np.ndarray, truth, k: int):
+    latencies, results = run_queries(index, queries, k)
+    recall = np.mean([len(found & expected) / len(expected) for found, expected in zip(results, truth)])
+    print(
+        f"{name:<26}{build_time:>9.2f}{index_memory(index) / 1024 ** 2:>10.1f}"
+        f"{np.percentile(latencies, 50):>9.3f}{np.percentile(latencies, 99):>9.3f}{recall:>10.3f}"
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=100000)
+    parser.add_argument("--dimensions", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=512, help="rows per incremental insert")
+    parser.add_argument("--ef", type=int, nargs="+", default=[16, 32, 64, 128], help="HNSW ef_search values")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 16, 64], help="IVF-PQ nprobe values")
+    parser.add_argument("--rescore-factor", type=int, default=4,
+                        help="full-precision rescoring of k * factor candidates (0 disables)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if faiss is None:
+        raise SystemExit("The approximate backends require the faiss-cpu package")
+
+    vectors, queries = synthetic_corpus(args.count, args.dimensions, args.queries, args.seed)
+    print(f"🧪 {args.count} vectors x {args.dimensions} dims, {args.queries} queries, k={args.k}")
+    print(f"\n{'backend':<26}{'build s':>9}{'index MB':>10}{'p50 ms':>9}{'p99 ms':>9}{'recall@k':>10}")
+
+    exact, build_time = build_index(vectors, "flat", {}, args.batch_size, args.rescore_factor)
+    _, truth = run_queries(exact, queries, args.k)
+    report("flat (exact)", exact, build_time, queries, truth, args.k)
+
+    hnsw, build_time = build_index(vectors, "hnsw", {}, args.batch_size, args.rescore_factor)
+    for ef in args.ef:
+        hnsw.backend.params["ef_search"] = ef
+        hnsw.backend._configure()
+        report(f"hnsw ef_search={ef}", hnsw, build_time, queries, truth, args.k)
+
+    ivfpq, build_time = build_index(vectors, "ivfpq", {}, args.batch_size, args.rescore_factor)
+    for nprobe in args.nprobe:
+        ivfpq.backend.params["nprobe"] = nprobe
+        ivfpq.backend._configure()
+        report(f"ivfpq nprobe={nprobe}", ivfpq, build_time, queries, truth, args.k)
+
+    print("\nBuild times include incremental inserts; IVF-PQ retrains whenever the index doubles.")
+
+if __name__ == "__main__":
+    main()
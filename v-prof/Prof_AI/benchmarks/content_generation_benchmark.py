@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Content generation benchmark: generates sub-topic content for a synthetic curriculum against a
+local fake OpenAI-compatible LLM server with a fixed response latency, and reports build time
+and speedup for each content generation concurrency. It then times complete course builds with
+the curriculum streamed by the server, generated first and then filled in, versus pipelined.
+
+    python benchmarks/content_generation_benchmark.py
+    python benchmarks/content_generation_benchmark.py --weeks 12 --topics 5 --latency 2.0 --concurrency 1 8 16
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+from typing import List
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+import config
+from langchain_core.embeddings import Embeddings
+from langchain_openai import ChatOpenAI
+from core.course_generator import CourseGenerator
+from core.vector_index import VectorIndex
+from models.schemas import CourseLMS, Module, SubTopic
+
+class FakeEmbeddings(Embeddings):
+    """Deterministic random vectors seeded by the text, so retrieval needs no embedding API."""
+
+    def __init__(self, size: int):
+        self.size = size
+
+    def _vector(self, text: str) -> List[float]:
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+        return np.random.default_rng(seed).standard_normal(self.size).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._vector(text)
+
+class FakeLLMServer(ThreadingHTTPServer):
+    """Answers chat completion requests after `latency` seconds; every `fail_every`-th request fails."""
+
+    daemon_threads = True
+
+    def __init__(self, latency: float, fail_every: int = 0, curriculum: str = "", curriculum_latency: float = 0.0):
+        super().__init__(("127.0.0.1", 0), FakeLLMHandler)
+        self.latency = latency
+        self.fail_every = fail_every
+        # Curriculum requests get `curriculum`, written over `curriculum_latency` seconds
+        self.curriculum = curriculum
+        self.curriculum_latency = curriculum_latency
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if "instructional designer" in body["messages"][-1]["content"]:
+            self._curriculum(body)
+            return
+        with server.lock:
+            server.requests += 1
+            number = server.requests
+            server.in_flight += 1
+            server.peak_in_flight = max(server.peak_in_flight, server.in_flight)
+        time.sleep(server.latency)
+        with server.lock:
+            server.in_flight -= 1
+
+        if server.fail_every and number % server.fail_every == 0:
+            self._reply(500, {"error": {"message": "fake server error", "type": "server_error"}})
+            return
+        topic = body["messages"][-1]["content"].split("TOPIC:")[-1].split("INSTRUCTIONS:")[0].strip()
+        self._reply(200, {
+            "id": f"chatcmpl-{number}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": f"# {topic}\n\nLecture content on {topic}."},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+        })
+
+    def _curriculum(self, body: dict):
+        server = self.server
+        pieces = [server.curriculum[i:i + 16] for i in range(0, len(server.curriculum), 16)]
+        delay = server.curriculum_latency / len(pieces)
+        if not body.get("stream"):
+            time.sleep(server.curriculum_latency)
+            self._reply(200, {
+                "id": "chatcmpl-curriculum", "object": "chat.completion", "created": int(time.time()),
+                "model": body.get("model", "fake"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": server.curriculum},
+                             "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+            })
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for piece in pieces + [None]:
+            if piece is not None:
+                time.sleep(delay)
+            chunk = {
+                "id": "chatcmpl-curriculum", "object": "chat.completion.chunk", "created": int(time.time()),
+                "model": body.get("model", "fake"),
+                "choices": [{"index": 0, "delta": {"content": piece} if piece is not None else {},
+                             "finish_reason": None if piece is not None else "stop"}]
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def _reply(self, status: int, payload: dict):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+def synthetic_curriculum(weeks: int, topics: int) -> CourseLMS:
+    return CourseLMS(course_title="Benchmark Course", modules=[
+        Module(week=week, title=f"Week {week}", sub_topics=[
+            SubTopic(title=f"Topic {week}.{topic}") for topic in range(1, topics + 1)
+        ])
+        for week in range(1, weeks + 1)
+    ])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--weeks", type=int, default=12)
+    parser.add_argument("--topics", type=int, default=5, help="sub-topics per week")
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per fake LLM response")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--fail-every", type=int, default=0, help="fail every n-th LLM request")
+    parser.add_argument("--curriculum-latency", type=float, default=5.0,
+                        help="seconds the fake LLM takes to write the whole curriculum")
+    args = parser.parse_args()
+
+    curriculum_json = synthetic_curriculum(args.weeks, args.topics).json()
+    server = FakeLLMServer(args.latency, args.fail_every, curriculum_json, args.curriculum_latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    chunks = [f"Course material paragraph {i} on topic {i % args.topics}." for i in range(200)]
+    vector_index = VectorIndex.from_texts(chunks, FakeEmbeddings(size=64))
+    retriever = vector_index.as_retriever(search_type="similarity", search_kwargs={"k": config.RETRIEVAL_K})
+    generator = CourseGenerator()
+    generator.curriculum_model = ChatOpenAI(
+        model=config.CURRICULUM_GENERATION_MODEL, base_url=server.url, openai_api_key="benchmark", max_retries=0
+    )
+    generator.content_model = ChatOpenAI(
+        model=config.CONTENT_GENERATION_MODEL, base_url=server.url, openai_api_key="benchmark", max_retries=0
+    )
+    count = args.weeks * args.topics
+    print(f"🧪 {count} sub-topics, {args.latency:.2f}s per LLM call, fake server at {server.url}")
+
+    print(f"\n{'concurrency':>12}{'seconds':>10}{'speedup':>10}{'peak calls':>12}{'failed':>8}")
+    baseline = None
+    for concurrency in args.concurrency:
+        config.CONTENT_GENERATION_CONCURRENCY = concurrency
+        server.peak_in_flight = 0
+        curriculum = synthetic_curriculum(args.weeks, args.topics)
+        start = time.perf_counter()
+        curriculum = generator._generate_content(curriculum, retriever)
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        sub_topics = [sub_topic for module in curriculum.modules for sub_topic in module.sub_topics]
+        assert all(sub_topic.title in sub_topic.content for sub_topic in sub_topics
+                   if not sub_topic.content.startswith("Content generation failed"))
+        failed = sum(sub_topic.content.startswith("Content generation failed") for sub_topic in sub_topics)
+        print(f"{concurrency:>12}{elapsed:>10.2f}{baseline / elapsed:>9.1f}x{server.peak_in_flight:>12}{failed:>8}")
+
+    documents = vector_index.get_documents()
+    config.CONTENT_GENERATION_CONCURRENCY = max(args.concurrency)
+    config.RETRIEVAL_SEARCH_TYPE = "similarity"
+    print(f"\n{'course build':<14}{'seconds':>10}   (curriculum written in {args.curriculum_latency:.1f}s, "
+          f"concurrency {config.CONTENT_GENERATION_CONCURRENCY})")
+    for name, pipelined in (("sequential", False), ("pipelined", True)):
+        config.COURSE_GENERATION_PIPELINED = pipelined
+        start = time.perf_counter()
+        course = generator.generate_course(documents, vector_index)
+        elapsed = time.perf_counter() - start
+        assert all(sub_topic.content for module in course.modules for sub_topic in module.sub_topics)
+        print(f"{name:<14}{elapsed:>10.2f}")
+
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Embedding benchmark: throughput (chunks/sec, per core) of the local ONNX embedding backend
+across batch sizes and worker counts, and query latency against the remote OpenAI embedder.
+
+    python benchmarks/embedding_benchmark.py --model-dir data/models/all-MiniLM-L6-v2
+    python benchmarks/embedding_benchmark.py --batch-sizes 16 64 --workers 1 2 4 --remote
+"""
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from core.local_embeddings import LocalEmbeddings
+
+WORDS = (
+    "gradient descent converges when the learning rate is small enough relative to the curvature "
+    "of the loss surface while regularization controls variance and the bias of the estimator "
+    "depends on the model class chosen for the hypothesis space in supervised learning tasks"
+).split()
+
+def synthetic_chunks(count: int, chunk_size: int, seed: int):
+    """Chunk-sized texts of random course-like words."""
+    rng = np.random.default_rng(seed)
+    chunks = []
+    for _ in range(count):
+        words = []
+        while sum(len(word) + 1 for word in words) < chunk_size:
+            words.append(WORDS[rng.integers(len(WORDS))])
+        chunks.append(" ".join(words))
+    return chunks
+
+def query_latencies(embeddings, queries):
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        embeddings.embed_query(query)
+        latencies.append(time.perf_counter() - start)
+    return np.array(latencies) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-dir", default=config.LOCAL_EMBEDDING_MODEL_DIR)
+    parser.add_argument("--count", type=int, default=2000, help="chunks to embed per setting")
+    parser.add_argument("--chunk-size", type=int, default=config.CHUNK_SIZE, help="characters per chunk")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[8, 32, 64])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2])
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--remote", action="store_true", help="also time queries against the OpenAI embedder")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    chunks = synthetic_chunks(args.count, args.chunk_size, args.seed)
+    queries = [" ".join(chunk.split()[:12]) + "?" for chunk in synthetic_chunks(args.queries, 80, args.seed + 1)]
+    cores = os.cpu_count() or 1
+    print(f"🧪 {args.count} chunks of ~{args.chunk_size} chars on {cores} cores, model {args.model_dir}")
+
+    print(f"\n{'batch':>6}{'workers':>9}{'threads':>9}{'chunks/s':>10}{'per core':>10}")
+    for workers in args.workers:
+        for batch_size in args.batch_sizes:
+            embeddings = LocalEmbeddings(args.model_dir, batch_size=batch_size, workers=workers)
+            embeddings.embed_documents(chunks[:batch_size])  # warm-up
+            start = time.perf_counter()
+            embeddings.embed_documents(chunks)
+            rate = args.count / (time.perf_counter() - start)
+            used_cores = min(cores, workers * embeddings.threads)
+            print(f"{batch_size:>6}{workers:>9}{embeddings.threads:>9}{rate:>10.1f}{rate / used_cores:>10.1f}")
+
+    print(f"\n{'query embedder':<22}{'p50 ms':>9}{'p99 ms':>9}")
+    local = LocalEmbeddings(args.model_dir)
+    local.embed_query(queries[0])
+    latencies = query_latencies(local, queries)
+    print(f"{'local ONNX':<22}{np.percentile(latencies, 50):>9.2f}{np.percentile(latencies, 99):>9.2f}")
+    if args.remote:
+        from langchain_openai import OpenAIEmbeddings
+        remote = OpenAIEmbeddings(model=config.EMBEDDING_MODEL_NAME, openai_api_key=config.OPENAI_API_KEY)
+        latencies = query_latencies(remote, queries[:min(len(queries), 20)])
+        print(f"{'OpenAI ' + config.EMBEDDING_MODEL_NAME:<22}"
+              f"{np.percentile(latencies, 50):>9.2f}{np.percentile(latencies, 99):>9.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Matryoshka dimension reduction benchmark: latency, memory and recall@k of reduced-dimension
+search, with and without full-dimension rescoring, against full 3072-dimension search.
+
+    python benchmarks/matryoshka_benchmark.py
+    python benchmarks/matryoshka_benchmark.py --index data/courses/1/vectorstore --dims 256 512 1024
+"""
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.vector_index import VectorIndex
+
+def synthetic_corpus(count: int, dimensions: int, query_count: int, seed: int):
+    """
+    Clustered vectors whose variance decays over the dimensions, approximating how
+    Matryoshka embeddings concentrate information in their leading dimensions.
+    Queries are noisy copies of corpus vectors.
+    """
+    rng = np.random.default_rng(seed)
+    decay = (np.arange(dimensions) + 1.0) ** -0.5
+    centers = rng.standard_normal((max(8, count // 50), dimensions)) * decay
+    vectors = centers[rng.integers(0, len(centers), count)]
+    vectors = vectors + 0.6 * rng.standard_normal((count, dimensions)) * decay
+    queries = vectors[rng.choice(count, query_count, replace=False)]
+    queries = queries + 0.3 * rng.standard_normal((query_count, dimensions)) * decay
+    return vectors.astype(np.float32), queries.astype(np.float32)
+
+def saved_index_corpus(path: str, query_count: int, seed: int):
+    """Vectors of a saved index, queried with noisy copies of stored vectors."""
+    index = VectorIndex.load(path, embeddings=None, mmap=False)
+    if not len(index):
+        raise SystemExit(f"Index at {path} is empty")
+    rng = np.random.default_rng(seed)
+    vectors = np.asarray(index.vectors, dtype=np.float32)
+    queries = vectors[rng.choice(len(vectors), min(query_count, len(vectors)), replace=False)]
+    queries = queries + 0.02 * rng.standard_normal(queries.shape).astype(np.float32)
+    return vectors, queries
+
+def build_index(vectors: np.ndarray, search_dtype: str, search_dimensions, rescore_factor: int):
+    index = VectorIndex(None, search_dtype=search_dtype, search_dimensions=search_dimensions,
+                        rescore_factor=rescore_factor)
+    ids = [str(i) for i in range(len(vectors))]
+    start = time.perf_counter()
+    index.add_embeddings(ids, vectors, ids=ids)
+    return index, time.perf_counter() - start
+
+def run_queries(index: VectorIndex, queries: np.ndarray, k: int):
+    latencies, results = [], []
+    for query in queries:
+        query = query / np.linalg.norm(query)
+        start = time.perf_counter()
+        _, rows = index._search(query, k)
+        latencies.append(time.perf_counter() - start)
+        results.append(set(rows.tolist()))
+    return np.array(latencies) * 1000, results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=50000, help="synthetic corpus size")
+    parser.add_argument("--dimensions", type=int, default=3072, help="synthetic embedding dimensions")
+    parser.add_argument("--index", help="benchmark the vectors of a saved index instead, e.g. data/courses/<course_id>/vectorstore")
+    parser.add_argument("--dims", type=int, nargs="+", default=[256, 512, 1024])
+    parser.add_argument("--dtype", default="float32", choices=["float32", "float16", "int8"])
+    parser.add_argument("--rescore-factor", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.index:
+        vectors, queries = saved_index_corpus(args.index, args.queries, args.seed)
+    else:
+        vectors, queries = synthetic_corpus(args.count, args.dimensions, args.queries, args.seed)
+    print(f"🧪 {len(vectors)} vectors x {vectors.shape[1]} dims, {len(queries)} queries, k={args.k}")
+
+    baseline, _ = build_index(vectors, "float32", None, 0)
+    _, truth = run_queries(baseline, queries, args.k)
+
+    settings = [("full (current)", "float32", None, 0)]
+    for dims in args.dims:
+        settings.append((f"{dims} dims", args.dtype, dims, 0))
+        settings.append((f"{dims} dims + rerank", args.dtype, dims, args.rescore_factor))
+
+    print(f"\n{'setting':<22}{'dtype':>9}{'search MB':>11}{'build s':>9}{'p50 ms':>9}{'p99 ms':>9}{'recall@k':>10}")
+    for name, dtype, dims, rescore_factor in settings:
+        index, build_time = build_index(vectors, dtype, dims, rescore_factor)
+        latencies, results = run_queries(index, queries, args.k)
+        recall = np.mean([len(found & expected) / len(expected) for found, expected in zip(results, truth)])
+        memory = index.memory_usage()
+        search_mb = (memory["search_vectors"] or memory["vectors"]) / 1024 ** 2
+        print(
+            f"{name:<22}{dtype:>9}{search_mb:>11.1f}{build_time:>9.2f}"
+            f"{np.percentile(latencies, 50):>9.2f}{np.percentile(latencies, 99):>9.2f}{recall:>10.3f}"
+        )
+    print("\nWith rerank, the full-precision vectors stay memory-mapped; only candidate rows are read.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+MMR microbenchmark: vectorized core.mmr against LangChain's per-candidate implementation.
+
+    python benchmarks/mmr_benchmark.py
+    python benchmarks/mmr_benchmark.py --fetch-k 20 100 500 --k 4 8 --dimensions 3072
+"""
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_community.vectorstores.utils import maximal_marginal_relevance as langchain_mmr
+from core.mmr import maximal_marginal_relevance
+
+def time_call(function, repeats: int) -> float:
+    """Returns the median time of `repeats` calls in milliseconds."""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings)) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dimensions", type=int, default=3072)
+    parser.add_argument("--fetch-k", type=int, nargs="+", default=[20, 50, 100, 500])
+    parser.add_argument("--k", type=int, nargs="+", default=[4, 10])
+    parser.add_argument("--lambda-mult", type=float, default=0.5)
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    print(f"🧪 MMR over {args.dimensions}-dimension candidates, lambda_mult={args.lambda_mult}")
+    print(f"\n{'fetch_k':>8}{'k':>5}{'langchain ms':>14}{'vectorized ms':>15}{'speedup':>9}{'same picks':>12}")
+
+    for fetch_k in args.fetch_k:
+        query = rng.standard_normal(args.dimensions).astype(np.float32)
+        candidates = (query + 2.0 * rng.standard_normal((fetch_k, args.dimensions))).astype(np.float32)
+        for k in args.k:
+            expected = langchain_mmr(query, candidates, lambda_mult=args.lambda_mult, k=k)
+            actual = maximal_marginal_relevance(query, candidates, k=k, lambda_mult=args.lambda_mult)
+            baseline = time_call(lambda: langchain_mmr(query, candidates, lambda_mult=args.lambda_mult, k=k), args.repeats)
+            vectorized = time_call(
+                lambda: maximal_marginal_relevance(query, candidates, k=k, lambda_mult=args.lambda_mult), args.repeats
+            )
+            print(
+                f"{fetch_k:>8}{k:>5}{baseline:>14.3f}{vectorized:>15.3f}"
+                f"{baseline / vectorized:>8.1f}x{str(expected == actual):>12}"
+            )
+
+if __name__ == "__main__":
+    main()
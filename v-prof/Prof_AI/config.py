@@ -8,33 +8,150 @@ load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 SARVAM_API_KEY = os.getenv("SARVAM_API_KEY")
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+# Optional OpenAI-compatible endpoint, e.g. a proxy or a local test server
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")
 
 # --- Project Paths ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(BASE_DIR, "data")
+COURSES_DIR = os.path.join(DATA_DIR, "courses")
+# Documents and vector index of the earlier single-course layout, moved into the
+# course catalog on first start
 DOCUMENTS_DIR = os.path.join(DATA_DIR, "documents")
 VECTORSTORE_DIR = os.path.join(DATA_DIR, "vectorstore")
-COURSES_DIR = os.path.join(DATA_DIR, "courses")
+CACHE_DIR = os.path.join(DATA_DIR, "cache")
 
 # --- Database Settings ---
 
-CHROMA_DB_PATH = VECTORSTORE_DIR
-CHROMA_COLLECTION_NAME = "profai_documents"
+# Each course in the catalog has its own vector index shard, shared by its uploaded documents
+# and its generated course content.
+# Search backends: "flat" (exact NumPy search), "faiss" (exact FAISS search), or the approximate
+# "hnsw" and "ivfpq" for large indexes. All but "flat" require faiss-cpu.
+VECTOR_INDEX_BACKEND = os.getenv("VECTOR_INDEX_BACKEND", "flat")
+# Approximate backend parameters. Higher ef_search (HNSW) or nprobe (IVF-PQ) raise recall and
+# latency; see benchmarks/ann_benchmark.py. nlist None sizes IVF clusters from the index size.
+VECTOR_INDEX_BACKEND_PARAMS = {
+    "hnsw": {"m": 32, "ef_construction": 40, "ef_search": int(os.getenv("HNSW_EF_SEARCH", 64))},
+    "ivfpq": {"nlist": None, "nprobe": int(os.getenv("IVF_NPROBE", 16)), "pq_m": 32, "refine_factor": 4},
+}
+# Dtype of the memory-mapped vector copy scanned at query time: "float32", "float16"
+# (half the memory) or, opt-in, "int8" (a quarter). Quantized searches rescore the best
+# k * VECTOR_INDEX_RESCORE_FACTOR candidates against the full-precision vectors. On 20,000
+# synthetic 3072-dimension vectors, int8 measured recall@4 of 0.973 without rescoring and
+# 1.000 with the default factor of 4 (`python benchmarks/matryoshka_benchmark.py --count 20000
+# --dims 3072 --dtype int8`); check recall on your own index before enabling it.
+VECTOR_INDEX_SEARCH_DTYPE = os.getenv("VECTOR_INDEX_SEARCH_DTYPE", "float32")
+# Matryoshka dimension reduction: the search copy keeps only the leading dimensions of each
+# embedding (e.g. 256, 512 or 1024 of text-embedding-3-large's 3072), and rescoring reranks the
+# coarse candidates at full dimension. None keeps the setting of the saved index (full dimension
+# for a new one); a rescore factor of 0 returns the coarse ranking as is.
+# See benchmarks/matryoshka_benchmark.py.
+VECTOR_INDEX_SEARCH_DIMENSIONS = int(os.getenv("VECTOR_INDEX_SEARCH_DIMENSIONS", 0)) or None
+VECTOR_INDEX_RESCORE_FACTOR = int(os.getenv("VECTOR_INDEX_RESCORE_FACTOR", 4))
 
 # --- LLM & RAG Settings ---
 LLM_MODEL_NAME = "gpt-4o-mini"
 EMBEDDING_MODEL_NAME = "text-embedding-3-large"
+# Length of the vectors requested from the embedding API by the embedding executor; text-embedding-3
+# models return shortened embeddings on request. 0 keeps the model's native length.
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", 0))
 CURRICULUM_GENERATION_MODEL = "gpt-4o-mini"
 CONTENT_GENERATION_MODEL = "gpt-4o-mini"
+# Sub-topic content is generated with this many LLM calls in flight at once; keep it within
+# the model's rate limits. See benchmarks/content_generation_benchmark.py.
+CONTENT_GENERATION_CONCURRENCY = int(os.getenv("CONTENT_GENERATION_CONCURRENCY", 8))
+# Uploads whose text exceeds CURRICULUM_MAX_CONTEXT_TOKENS are condensed map-reduce style before
+# the curriculum prompt: groups of up to CURRICULUM_MAP_GROUP_TOKENS are summarized into topic
+# outlines in parallel, and outlines are merged level by level until they fit.
+CURRICULUM_MAP_REDUCE_ENABLED = os.getenv("CURRICULUM_MAP_REDUCE_ENABLED", "True").lower() == "true"
+CURRICULUM_MAX_CONTEXT_TOKENS = int(os.getenv("CURRICULUM_MAX_CONTEXT_TOKENS", 30000))
+CURRICULUM_MAP_GROUP_TOKENS = int(os.getenv("CURRICULUM_MAP_GROUP_TOKENS", 6000))
+CURRICULUM_MAP_CONCURRENCY = int(os.getenv("CURRICULUM_MAP_CONCURRENCY", 8))
+# Stream the curriculum and start generating each module's content as soon as it is parsed,
+# instead of waiting for the complete curriculum.
+COURSE_GENERATION_PIPELINED = os.getenv("COURSE_GENERATION_PIPELINED", "True").lower() == "true"
+
+# --- Local Embeddings ---
+# "openai" embeds through the OpenAI API; "local" runs an ONNX export of a sentence embedding
+# model on the CPU (requires onnxruntime and tokenizers), e.g. all-MiniLM-L6-v2 exported with
+# `optimum-cli export onnx --model sentence-transformers/all-MiniLM-L6-v2 <dir>`.
+# Indexes and caches are keyed by model name, so switching backends re-embeds the documents.
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "openai")
+LOCAL_EMBEDDING_MODEL_NAME = os.getenv("LOCAL_EMBEDDING_MODEL_NAME", "all-MiniLM-L6-v2")
+LOCAL_EMBEDDING_MODEL_DIR = os.getenv(
+    "LOCAL_EMBEDDING_MODEL_DIR", os.path.join(DATA_DIR, "models", LOCAL_EMBEDDING_MODEL_NAME)
+)
+LOCAL_EMBEDDING_BATCH_SIZE = 32
+LOCAL_EMBEDDING_MAX_LENGTH = 256
+# Batches run on this many threads, each inference using an equal share of the CPU cores.
+LOCAL_EMBEDDING_WORKERS = int(os.getenv("LOCAL_EMBEDDING_WORKERS", 1))
+
+# --- Embedding Executor ---
+# Chunks are packed into embedding requests by token count and sent concurrently
+# within the configured rate limits. Throttled requests are retried with backoff.
+EMBEDDING_EXECUTOR_ENABLED = os.getenv("EMBEDDING_EXECUTOR_ENABLED", "True").lower() == "true"
+EMBEDDING_MAX_BATCH_TOKENS = 8000
+EMBEDDING_MAX_CONCURRENCY = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", 4))
+EMBEDDING_REQUESTS_PER_MINUTE = int(os.getenv("EMBEDDING_REQUESTS_PER_MINUTE", 3000))
+EMBEDDING_TOKENS_PER_MINUTE = int(os.getenv("EMBEDDING_TOKENS_PER_MINUTE", 1000000))
+
+# --- Embedding Cache ---
+# Embeddings are cached on disk by (model, dimensions, text hash) and shared by all vector stores.
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "True").lower() == "true"
+EMBEDDING_CACHE_PATH = os.path.join(CACHE_DIR, "embeddings.sqlite3")
+# "float16" halves the cache size at a negligible cost in retrieval accuracy.
+EMBEDDING_CACHE_DTYPE = "float16"
+# Recent query embeddings are also kept in memory, keyed by model and normalized query text,
+# so repeated questions skip the embedding round-trip entirely.
+QUERY_EMBEDDING_CACHE_ENABLED = os.getenv("QUERY_EMBEDDING_CACHE_ENABLED", "True").lower() == "true"
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", 2048))
+QUERY_EMBEDDING_CACHE_TTL = float(os.getenv("QUERY_EMBEDDING_CACHE_TTL", 900))
+# Chat answers are cached per course, index snapshot and response language, and served
+# for any question whose embedding has at least this cosine similarity to a cached one.
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "True").lower() == "true"
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", 0.95))
+ANSWER_CACHE_MAX_ENTRIES = 1000
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", 86400))
 
 # --- Text Processing ---
 CHUNK_SIZE = 500
 CHUNK_OVERLAP = 100
 MAX_CHUNK_SIZE = 800
+# "recursive" splits on separators with overlap; "content_defined" uses rolling-hash
+# boundaries so an edit to a document only changes the chunks around it.
+CHUNKING_MODE = os.getenv("CHUNKING_MODE", "recursive")
+# Near-duplicate chunks (MinHash estimate of Jaccard similarity over word shingles at or
+# above the threshold) are dropped before embedding.
+CHUNK_DEDUP_ENABLED = os.getenv("CHUNK_DEDUP_ENABLED", "True").lower() == "true"
+CHUNK_DEDUP_THRESHOLD = float(os.getenv("CHUNK_DEDUP_THRESHOLD", 0.85))
 RETRIEVAL_K = 4
-RETRIEVAL_SEARCH_TYPE = "mmr"
+# Retrieval for both chat and course content generation: "similarity", "mmr" (vectorized
+# maximal marginal relevance, see core/mmr.py) or, opt-in, "hybrid" (BM25 and dense rankings
+# fused with reciprocal rank fusion; queries with a decisive exact-term match skip embedding).
+RETRIEVAL_SEARCH_TYPE = os.getenv("RETRIEVAL_SEARCH_TYPE", "mmr")
+
+# --- Document Extraction ---
+# Number of worker processes used to extract PDFs. 1 disables the process pool.
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", os.cpu_count() or 1))
+# Large PDFs are split into page ranges of this size and extracted in parallel.
+EXTRACTION_PAGES_PER_TASK = 50
+# Extracted text is cached by file hash so re-uploaded files are not parsed again.
+EXTRACTION_CACHE_DIR = os.path.join(CACHE_DIR, "extraction")
+EXTRACTION_CACHE_MAX_BYTES = 512 * 1024 * 1024
+# Chunks are embedded and written to the vector store in batches of this size.
+# Each batch is split into concurrent requests by the embedding executor.
+EMBEDDING_BATCH_SIZE = 512
+# Only embed added or changed documents on upload instead of rebuilding the whole index.
+INCREMENTAL_INGESTION = os.getenv("INCREMENTAL_INGESTION", "True").lower() == "true"
+
+# --- Course Catalog ---
+# Each course owns COURSES_DIR/<course_id>/ with its documents, index shard (and manifest)
+# and course.json. Index shards are loaded on demand; beyond this many, the least recently
+# used course is unloaded.
+MAX_LOADED_COURSE_SHARDS = int(os.getenv("MAX_LOADED_COURSE_SHARDS", 4))
 
 # --- File Paths ---
+# Course JSON of the earlier single-course layout, moved into the course catalog on first start
 OUTPUT_JSON_PATH = os.path.join(COURSES_DIR, "course_output.json")
 
 # --- Audio Settings ---
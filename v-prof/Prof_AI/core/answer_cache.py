@@ -0,0 +1,97 @@
+"""
+Answer Cache - Semantic cache of chat answers, matched by query embedding similarity
+"""
+
+import time
+import threading
+import numpy as np
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+class _Scope:
+    """Unit query vectors of one scope's answers, as rows of one matrix."""
+
+    def __init__(self, dimensions: int):
+        self.vectors = np.zeros((0, dimensions), dtype=np.float32)
+        self.expires: List[float] = []
+        self.responses: List[Dict[str, Any]] = []
+
+    def remove(self, keep: np.ndarray):
+        self.vectors = self.vectors[keep]
+        self.expires = [expires for expires, kept in zip(self.expires, keep) if kept]
+        self.responses = [response for response, kept in zip(self.responses, keep) if kept]
+
+class AnswerCache:
+    """
+    Stores answers under the embedding of the question they answer. A new question is
+    answered from the cache when its cosine similarity to a stored question reaches
+    `threshold`, so paraphrases of a question are answered once. Answers are scoped by
+    (course ID, snapshot key, response language, retrieval scope): an answer is only
+    served for the course, language and retrieval scope (e.g. a week) it was generated
+    for, and only from the index snapshot it was generated from.
+    Each scope holds at most `max_entries` answers, evicting the oldest.
+    """
+
+    def __init__(self, threshold: float = 0.95, max_entries: int = 1000, ttl_seconds: float = 86400):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._scopes: Dict[Tuple[Hashable, Hashable, str, Hashable], _Scope] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _unit(vector: List[float]) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def lookup(self, course_id: Hashable, snapshot_key: Hashable, language: str,
+               query_vector: List[float], retrieval_scope: Hashable = None) -> Optional[Dict[str, Any]]:
+        """Returns a copy of the answer stored for the most similar question, if similar enough."""
+        with self._lock:
+            scope = self._scopes.get((course_id, snapshot_key, language, retrieval_scope))
+            if scope is not None and len(scope.responses):
+                now = time.monotonic()
+                live = np.array([expires > now for expires in scope.expires], dtype=bool)
+                if not live.all():
+                    scope.remove(live)
+                if len(scope.responses):
+                    similarities = scope.vectors @ self._unit(query_vector)
+                    best = int(np.argmax(similarities))
+                    if similarities[best] >= self.threshold:
+                        self.hits += 1
+                        return {**scope.responses[best], "sources": list(scope.responses[best]["sources"])}
+            self.misses += 1
+            return None
+
+    def store(self, course_id: Hashable, snapshot_key: Hashable, language: str,
+              query_vector: List[float], response: Dict[str, Any], retrieval_scope: Hashable = None):
+        vector = self._unit(query_vector)
+        key = (course_id, snapshot_key, language, retrieval_scope)
+        with self._lock:
+            scope = self._scopes.get(key)
+            if scope is None or scope.vectors.shape[1] != len(vector):
+                scope = self._scopes[key] = _Scope(len(vector))
+            if len(scope.responses) >= self.max_entries:
+                keep = np.ones(len(scope.responses), dtype=bool)
+                keep[:len(scope.responses) - self.max_entries + 1] = False
+                scope.remove(keep)
+            scope.vectors = np.vstack([scope.vectors, vector[None, :]])
+            scope.expires.append(time.monotonic() + self.ttl_seconds)
+            scope.responses.append(dict(response))
+
+    def invalidate(self, course_id: Hashable, keep_snapshot: Hashable = None):
+        """Drops a course's answers, except those for the snapshot with key `keep_snapshot`."""
+        with self._lock:
+            for key in [key for key in self._scopes if key[0] == course_id and key[1] != keep_snapshot]:
+                del self._scopes[key]
+
+    def stats(self) -> Dict[str, float]:
+        """Returns hit/miss counters for this process."""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": sum(len(scope.responses) for scope in self._scopes.values()),
+            "hit_rate": self.hits / total if total else 0.0
+        }
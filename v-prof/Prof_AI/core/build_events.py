@@ -0,0 +1,96 @@
+"""
+Build Events - Progress events of course builds, for streaming to clients
+"""
+
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Hashable, List
+
+# Event types that end a build's event stream
+TERMINAL_EVENTS = ("completed", "failed")
+
+class _Build:
+    def __init__(self):
+        self.events: List[Dict[str, Any]] = []
+        self.finished = False
+        self.subscribers: List[tuple] = []
+
+class BuildEventLog:
+    """
+    Records the events of each course build (curriculum, module and sub-topic completion)
+    by course ID. Builds publish from worker threads; subscribers on the event loop receive
+    every event of a build from its start, then follow it live until it completes or fails,
+    so clients that connect late or reconnect see the whole build. The events of the
+    `max_builds` most recent builds are kept.
+    """
+
+    def __init__(self, max_builds: int = 16):
+        self.max_builds = max(1, max_builds)
+        self._builds: "OrderedDict[Hashable, _Build]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, course_id: Hashable) -> bool:
+        return str(course_id) in self._builds
+
+    def start(self, course_id: Hashable):
+        """Starts a new build of a course, discarding the events of its previous build."""
+        with self._lock:
+            previous = self._builds.pop(str(course_id), None)
+            build = self._builds[str(course_id)] = _Build()
+            if previous is not None:
+                # Subscribers of the previous build follow the new one
+                build.subscribers = previous.subscribers
+            while len(self._builds) > self.max_builds:
+                oldest = next((key for key, entry in self._builds.items() if entry.finished), None)
+                if oldest is None:
+                    break
+                del self._builds[oldest]
+
+    def publish(self, course_id: Hashable, event: Dict[str, Any]):
+        """Records an event of a course's running build and wakes its subscribers."""
+        with self._lock:
+            build = self._builds.get(str(course_id))
+            if build is None or build.finished:
+                logging.warning(f"Dropped {event.get('type')} event of course {course_id}: no running build")
+                return
+            build.events.append({**event, "course_id": str(course_id), "seq": len(build.events)})
+            build.finished = event.get("type") in TERMINAL_EVENTS
+            subscribers = list(build.subscribers)
+        for loop, wakeup in subscribers:
+            try:
+                loop.call_soon_threadsafe(wakeup.set)
+            except RuntimeError:
+                # The subscriber's event loop is closed
+                pass
+
+    async def subscribe(self, course_id: Hashable) -> AsyncIterator[Dict[str, Any]]:
+        """Yields the events of a course's latest build, until it completes or fails."""
+        wakeup = asyncio.Event()
+        subscriber = (asyncio.get_running_loop(), wakeup)
+        with self._lock:
+            build = self._builds.get(str(course_id))
+            if build is None:
+                return
+            build.subscribers.append(subscriber)
+        sent = 0
+        try:
+            while True:
+                with self._lock:
+                    latest = self._builds.get(str(course_id), build)
+                    if latest is not build:
+                        # The course is being rebuilt; follow the new build from its start
+                        build, sent = latest, 0
+                    events, finished = build.events[sent:], build.finished
+                for event in events:
+                    yield event
+                sent += len(events)
+                if finished:
+                    return
+                await wakeup.wait()
+                wakeup.clear()
+        finally:
+            with self._lock:
+                if subscriber in build.subscribers:
+                    build.subscribers.remove(subscriber)
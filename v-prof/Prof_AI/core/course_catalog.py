@@ -0,0 +1,339 @@
+"""
+Course Catalog - Per-course storage of documents, vector index shards and course JSON
+"""
+
+import os
+import json
+import time
+import shutil
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+COURSE_FILE = "course.json"
+DOCUMENTS_DIR = "documents"
+VECTORSTORE_DIR = "vectorstore"
+MANIFEST_FILE = "manifest.json"
+CATALOG_LOCK = "catalog.lock"
+# A lock file older than this was left behind by a process that died holding it
+LOCK_STALE_SECONDS = 60
+# Records the course the earlier single-course layout is migrated into, and whether it is done
+LEGACY_MIGRATION_MARKER = "legacy_migration.json"
+MIGRATION_LOCK = "legacy_migration.lock"
+
+class CourseCatalog:
+    """
+    Registry of courses under one root directory. Each course owns a directory named by
+    its ID holding its uploaded documents, its own vector index shard with the index
+    manifest, and its generated course JSON:
+
+        <root>/catalog.json
+        <root>/<course_id>/documents/
+        <root>/<course_id>/vectorstore/          (index files and manifest.json)
+        <root>/<course_id>/course.json
+
+    Course IDs are increasing integers as strings, allocated from a counter stored in
+    catalog.json, so IDs of deleted courses are never reused. catalog.json is re-read on
+    every call and replaced atomically, and every update holds an O_EXCL lock file, so
+    separate processes can share one catalog directory.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.catalog_path = os.path.join(root, "catalog.json")
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    # --- Paths ---
+
+    def course_dir(self, course_id: str) -> str:
+        return os.path.join(self.root, str(course_id))
+
+    def documents_dir(self, course_id: str) -> str:
+        return os.path.join(self.course_dir(course_id), DOCUMENTS_DIR)
+
+    def vectorstore_dir(self, course_id: str) -> str:
+        return os.path.join(self.course_dir(course_id), VECTORSTORE_DIR)
+
+    def manifest_path(self, course_id: str) -> str:
+        return os.path.join(self.vectorstore_dir(course_id), MANIFEST_FILE)
+
+    def course_path(self, course_id: str) -> str:
+        return os.path.join(self.course_dir(course_id), COURSE_FILE)
+
+    # --- Catalog ---
+
+    @contextmanager
+    def _file_lock(self, name: str):
+        """
+        Holds the lock file `name` in the catalog root, created with O_EXCL so only one
+        process can hold it. A lock file older than LOCK_STALE_SECONDS is broken.
+        """
+        lock_path = os.path.join(self.root, name)
+        while True:
+            try:
+                fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(lock_path) > LOCK_STALE_SECONDS:
+                        logging.warning(f"Breaking stale lock {lock_path}")
+                        os.remove(lock_path)
+                        continue
+                except OSError:
+                    # Released meanwhile
+                    continue
+                time.sleep(0.01)
+        try:
+            os.write(fd, str(os.getpid()).encode("ascii"))
+            os.close(fd)
+            yield
+        finally:
+            try:
+                os.remove(lock_path)
+            except OSError:
+                pass
+
+    @contextmanager
+    def _locked(self):
+        """Serializes catalog updates across the threads and processes sharing the root."""
+        with self._lock, self._file_lock(CATALOG_LOCK):
+            yield
+
+    def _read_catalog(self) -> Dict[str, Any]:
+        if not os.path.exists(self.catalog_path):
+            return {"courses": {}}
+        try:
+            with open(self.catalog_path, 'r', encoding='utf-8') as f:
+                catalog = json.load(f)
+            catalog.setdefault("courses", {})
+            return catalog
+        except Exception as e:
+            logging.warning(f"Ignoring unreadable course catalog {self.catalog_path}: {e}")
+            return {"courses": {}}
+
+    def _read(self) -> Dict[str, Dict[str, Any]]:
+        return self._read_catalog()["courses"]
+
+    def _write(self, catalog: Dict[str, Any]):
+        with open(f"{self.catalog_path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(catalog, f, indent=2, ensure_ascii=False)
+        os.replace(f"{self.catalog_path}.tmp", self.catalog_path)
+
+    def __contains__(self, course_id: str) -> bool:
+        return str(course_id) in self._read()
+
+    def create_course(self, course_title: Optional[str] = None) -> str:
+        """Registers a new course and creates its directory. Returns the course ID."""
+        with self._locked():
+            catalog = self._read_catalog()
+            courses = catalog["courses"]
+            # Catalogs written before the counter existed start after their highest ID
+            last_id = max([catalog.get("last_course_id", 0)] + [int(key) for key in courses if key.isdigit()])
+            course_id = str(last_id + 1)
+            catalog["last_course_id"] = last_id + 1
+            courses[course_id] = {"course_title": course_title, "modules": 0, "created_at": time.time()}
+            os.makedirs(self.documents_dir(course_id), exist_ok=True)
+            self._write(catalog)
+        logging.info(f"Created course {course_id}: {course_title}")
+        return course_id
+
+    def delete_course(self, course_id: str):
+        """Removes a course from the catalog along with its documents, index and course JSON."""
+        with self._locked():
+            catalog = self._read_catalog()
+            catalog["courses"].pop(str(course_id), None)
+            self._write(catalog)
+        shutil.rmtree(self.course_dir(course_id), ignore_errors=True)
+
+    def list_courses(self) -> List[Dict[str, Any]]:
+        """Courses whose content has been generated, oldest first."""
+        return [
+            {"course_id": course_id, "course_title": entry.get("course_title") or "Generated Course",
+             "modules": entry.get("modules", 0), "status": entry.get("status", "ready")}
+            for course_id, entry in sorted(self._read().items(), key=lambda item: item[1].get("created_at", 0))
+            if os.path.exists(self.course_path(course_id))
+        ]
+
+    def default_course_id(self) -> Optional[str]:
+        """The most recently created course whose build has finished, for requests without a course ID."""
+        courses = [course for course in self.list_courses() if course["status"] == "ready"]
+        return courses[-1]["course_id"] if courses else None
+
+    def course_entry(self, course_id: str) -> Optional[Dict[str, Any]]:
+        """The catalog entry of a course (title, module count, status, content version), or None."""
+        return self._read().get(str(course_id))
+
+    def load_course(self, course_id: str) -> Optional[Dict[str, Any]]:
+        """Returns the course JSON, or None if the course has no generated content."""
+        path = self.course_path(course_id)
+        if str(course_id) not in self._read() or not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def save_course(self, course_id: str, course_data: Dict[str, Any], status: str = "ready"):
+        """
+        Writes the course JSON and updates the course's catalog entry. `status` is "generating"
+        while a partially generated course is saved during its build. Only saves of a finished
+        course bump the entry's `content_version`, so partial saves never mark shards outdated.
+        """
+        path = self.course_path(course_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._locked():
+            with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+                json.dump(course_data, f, indent=4, ensure_ascii=False)
+            os.replace(f"{path}.tmp", path)
+            catalog = self._read_catalog()
+            entry = catalog["courses"].setdefault(str(course_id), {"created_at": time.time()})
+            entry["course_title"] = course_data.get("course_title") or entry.get("course_title")
+            entry["modules"] = len(course_data.get("modules", []))
+            entry["status"] = status
+            if status == "ready":
+                entry["content_version"] = entry.get("content_version", 0) + 1
+            self._write(catalog)
+
+    def migrate_single_course(self, course_json_path: str, documents_dir: str, vectorstore_dir: str):
+        """
+        Moves the course, documents and vector index of the earlier single-course layout
+        into the catalog as a new course, once. Safe to call from every process at startup:
+        the migration holds a lock file, and a marker file records the new course ID before
+        anything is moved, so a migration interrupted by a crash resumes into the same course
+        on the next call. The legacy course JSON is removed only once the marker records the
+        migration as complete, which makes later calls no-ops.
+        Returns the migrated course ID, or None if there is no such course.
+        """
+        marker_path = os.path.join(self.root, LEGACY_MIGRATION_MARKER)
+        if self._migration_state(marker_path).get("complete"):
+            return None
+        with self._file_lock(MIGRATION_LOCK):
+            state = self._migration_state(marker_path)
+            if state.get("complete") or not os.path.exists(course_json_path):
+                # Migrated by another process meanwhile, or nothing to migrate
+                return None
+            with open(course_json_path, 'r', encoding='utf-8') as f:
+                course_data = json.load(f)
+
+            course_id = state.get("course_id")
+            if course_id is None:
+                course_id = self.create_course(course_data.get("course_title"))
+                self._write_migration_state(marker_path, {"course_id": course_id, "complete": False})
+            else:
+                logging.info(f"Resuming the interrupted migration of the single-course layout into course {course_id}")
+            # Each move is a rename, so after a crash a directory is either still here or fully moved
+            if os.path.isdir(documents_dir):
+                shutil.rmtree(self.documents_dir(course_id), ignore_errors=True)
+                shutil.move(documents_dir, self.documents_dir(course_id))
+            if os.path.isdir(vectorstore_dir):
+                shutil.rmtree(self.vectorstore_dir(course_id), ignore_errors=True)
+                shutil.move(vectorstore_dir, self.vectorstore_dir(course_id))
+            self.save_course(course_id, course_data)
+            self._write_migration_state(
+                marker_path, {"course_id": course_id, "complete": True, "migrated_at": time.time()}
+            )
+            os.remove(course_json_path)
+        logging.info(f"Migrated the single-course layout into the catalog as course {course_id}")
+        return course_id
+
+    @staticmethod
+    def _migration_state(marker_path: str) -> Dict[str, Any]:
+        """The legacy migration marker, or {} before the migration has started."""
+        if not os.path.exists(marker_path):
+            return {}
+        with open(marker_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        # Markers written before migrations could resume were only written once complete
+        state.setdefault("complete", True)
+        return state
+
+    @staticmethod
+    def _write_migration_state(marker_path: str, state: Dict[str, Any]):
+        with open(f"{marker_path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(f"{marker_path}.tmp", marker_path)
+
+class ShardCache:
+    """
+    Keeps the objects serving the most recently used courses (e.g. a loaded index shard
+    and its RAG chain) in memory, evicting the least recently used beyond `max_loaded`,
+    so memory tracks the active courses only. `stamp(course_id)` returns a value that
+    changes whenever a course's shard on disk changes; a loaded shard with an outdated
+    stamp is reloaded on its next use. If `refresh(course_id, shard)` is given, an outdated
+    shard is instead handed to it (e.g. to rebuild in the background) and kept serving
+    until `restamp(course_id)` marks it current again.
+    """
+
+    def __init__(self, loader: Callable[[Hashable], Any], stamp: Callable[[Hashable], Any], max_loaded: int = 4,
+                 refresh: Optional[Callable[[Hashable, Any], None]] = None):
+        self.loader = loader
+        self.stamp = stamp
+        self.refresh = refresh
+        self.max_loaded = max(1, max_loaded)
+        self._shards: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        # Guards the shard map only; loads run under the per-course lock of _load_locks
+        self._lock = threading.RLock()
+        self._load_locks: Dict[Hashable, threading.Lock] = {}
+
+    def __contains__(self, course_id: Hashable) -> bool:
+        return course_id in self._shards
+
+    def loaded(self) -> List[Hashable]:
+        """IDs of the loaded shards, least recently used first."""
+        return list(self._shards)
+
+    def _current(self, course_id: Hashable, stamp: Any) -> tuple:
+        """Returns (shard is current, loaded shard or None), marking it as most recently used."""
+        with self._lock:
+            entry = self._shards.get(course_id)
+            if entry is None:
+                return False, None
+            self._shards.move_to_end(course_id)
+            return entry[0] == stamp, entry[1]
+
+    def get(self, course_id: Hashable) -> Any:
+        """
+        Returns the loaded shard for `course_id`, loading or reloading it as needed. A load
+        only blocks other requests for the same course; concurrent requests for a course
+        being loaded wait for that load instead of starting their own.
+        """
+        current, shard = self._current(course_id, self.stamp(course_id))
+        if current:
+            return shard
+        if shard is not None and self.refresh:
+            self.refresh(course_id, shard)
+            return shard
+
+        with self._lock:
+            load_lock = self._load_locks.setdefault(course_id, threading.Lock())
+        with load_lock:
+            # The shard may have been loaded while this request waited for the lock
+            current, shard = self._current(course_id, self.stamp(course_id))
+            if current:
+                return shard
+            shard = self.loader(course_id)
+            # Loading may itself update the shard on disk, so stamp it afterwards
+            self.put(course_id, shard)
+            return shard
+
+    def put(self, course_id: Hashable, shard: Any):
+        stamp = self.stamp(course_id)
+        with self._lock:
+            self._shards[course_id] = (stamp, shard)
+            self._shards.move_to_end(course_id)
+            while len(self._shards) > self.max_loaded:
+                evicted, _ = self._shards.popitem(last=False)
+                logging.info(f"Unloaded index shard of course {evicted}")
+
+    def restamp(self, course_id: Hashable):
+        """Marks a loaded shard as current with the course's shard on disk."""
+        stamp = self.stamp(course_id)
+        with self._lock:
+            entry = self._shards.get(course_id)
+            if entry is not None:
+                self._shards[course_id] = (stamp, entry[1])
+
+    def unload(self, course_id: Hashable):
+        with self._lock:
+            self._shards.pop(course_id, None)
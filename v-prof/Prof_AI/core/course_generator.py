@@ -7,10 +7,14 @@ from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import JsonOutputParser, StrOutputParser
 from langchain_core.runnables import RunnableParallel, RunnablePassthrough
 from langchain_core.documents import Document
-from typing import List
+from langchain_core.outputs import Generation
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional
 import logging
+import threading
 import config
-from models.schemas import CourseLMS
+from models.schemas import CourseLMS, Module, SubTopic
+from core.vector_index import VectorIndex
 
 class CourseGenerator:
     """Generates complete courses with curriculum and content."""
@@ -29,9 +33,27 @@ class CourseGenerator:
         self.curriculum_parser = JsonOutputParser(pydantic_object=CourseLMS)
         self.content_parser = StrOutputParser()
     
-    def generate_course(self, documents: List[Document], retriever, course_title: str = None) -> CourseLMS:
-        """Generate a complete course with curriculum and content."""
+    def generate_course(self, documents: List[Document], vector_index: VectorIndex, course_title: str = None,
+                        on_event: Optional[Callable[[Dict[str, Any]], None]] = None,
+                        retrieval_filter: Optional[Dict[str, Any]] = None) -> CourseLMS:
+        """
+        Generate a complete course with curriculum and content, retrieving context from the vector index.
+        `retrieval_filter` limits content retrieval to matching chunks, e.g. {"source": [...]}.
+        `on_event` receives progress events as the build runs, from worker threads:
+        - {"type": "module_started", "module_index", "module"}: a module's outline is known
+        - {"type": "curriculum", "course_title", "modules"}: the whole curriculum is known
+        - {"type": "sub_topic", "module_index", "sub_topic_index", "week", "sub_topic", "failed"}
+        - {"type": "module", "module_index", "week", "title"}: all of a module's sub-topics are done
+        """
         try:
+            retriever = vector_index.as_retriever(
+                search_type=config.RETRIEVAL_SEARCH_TYPE,
+                search_kwargs={"k": config.RETRIEVAL_K, "filter": retrieval_filter}
+            )
+
+            if config.COURSE_GENERATION_PIPELINED:
+                return self._generate_pipelined(documents, retriever, course_title, on_event)
+
             # Step 1: Generate curriculum structure
             logging.info("Generating curriculum structure...")
             curriculum = self._generate_curriculum(documents, course_title)
@@ -41,7 +63,7 @@ class CourseGenerator:
             
             # Step 2: Generate content for each topic
             logging.info("Generating detailed content...")
-            final_course = self._generate_content(curriculum, retriever)
+            final_course = self._generate_content(curriculum, retriever, on_event)
             
             return final_course
             
@@ -49,13 +71,47 @@ class CourseGenerator:
             logging.error(f"Course generation failed: {e}")
             raise e
     
-    def _generate_curriculum(self, documents: List[Document], course_title: str = None) -> CourseLMS:
-        """Generate the curriculum structure."""
+    def _generate_pipelined(self, documents: List[Document], retriever, course_title: str = None,
+                            on_event: Optional[Callable[[Dict[str, Any]], None]] = None) -> CourseLMS:
+        """
+        Generates the curriculum and the content in overlapping stages: the curriculum is
+        streamed, and each module's sub-topics are queued for content generation as soon as
+        the module has been parsed, while later modules are still being written.
+        """
+        logging.info("Generating curriculum structure and detailed content...")
+        content_chain = self._content_chain(retriever)
+        with ThreadPoolExecutor(max_workers=max(1, config.CONTENT_GENERATION_CONCURRENCY)) as pool:
+            futures, started = [], []
+            
+            def start_module(module: Module):
+                futures.extend(self._start_module(pool, content_chain, module, len(started), on_event))
+                started.append(module)
+            
+            curriculum = self._generate_curriculum(documents, course_title, on_module=start_module)
+            if not curriculum:
+                for future in futures:
+                    future.cancel()
+                raise Exception("Curriculum generation failed")
+            self._emit_curriculum(on_event, curriculum)
+            wait(futures)
+        
+        logging.info("Content generation completed for all topics")
+        return curriculum
+    
+    def _generate_curriculum(self, documents: List[Document], course_title: str = None,
+                             on_module: Optional[Callable[[Module], None]] = None) -> CourseLMS:
+        """
+        Generate the curriculum structure. With `on_module`, the curriculum is streamed and
+        each module is passed to `on_module` as soon as it is complete.
+        """
         if not documents:
             logging.error("Cannot generate curriculum: No documents provided")
             return None
         
         context_str = "\n---\n".join([doc.page_content for doc in documents])
+        if config.CURRICULUM_MAP_REDUCE_ENABLED and self._count_tokens(context_str) > config.CURRICULUM_MAX_CONTEXT_TOKENS:
+            # Too large for one prompt: reduce the material to topic outlines first
+            context_str = self._condense_context([doc.page_content for doc in documents])
         
         template = """
         You are an expert instructional designer tasked with creating a university-level course curriculum.
@@ -80,8 +136,13 @@ class CourseGenerator:
         )
         
         try:
-            chain = prompt | self.curriculum_model | self.curriculum_parser
-            curriculum = chain.invoke({"context": context_str})
+            if on_module:
+                curriculum = self._stream_curriculum(prompt, context_str, on_module)
+            else:
+                chain = prompt | self.curriculum_model | self.curriculum_parser
+                curriculum = chain.invoke({"context": context_str})
+                if isinstance(curriculum, dict):
+                    curriculum = CourseLMS(**curriculum)
             
             # Override title if provided
             if course_title and hasattr(curriculum, 'course_title'):
@@ -94,11 +155,160 @@ class CourseGenerator:
             logging.error(f"Error generating curriculum: {e}")
             return None
     
-    def _generate_content(self, curriculum: CourseLMS, retriever) -> CourseLMS:
+    def _stream_curriculum(self, prompt: ChatPromptTemplate, context_str: str,
+                           on_module: Callable[[Module], None]) -> CourseLMS:
+        """
+        Streams the curriculum completion and parses the partial JSON as it arrives. A module
+        is complete once the next one has started (the last one, once the stream ends); each
+        is passed to `on_module` once, and the same Module objects end up in the curriculum.
+        """
+        chain = prompt | self.curriculum_model
+        text, modules = "", []
+        for chunk in chain.stream({"context": context_str}):
+            text += chunk.content
+            # Modules can only complete when an object or list opens or closes
+            if not any(char in chunk.content for char in "{}]"):
+                continue
+            partial = self.curriculum_parser.parse_result([Generation(text=text)], partial=True)
+            parsed_modules = partial.get("modules") if isinstance(partial, dict) else None
+            if not isinstance(parsed_modules, list):
+                continue
+            for module_data in parsed_modules[len(modules):-1]:
+                try:
+                    module = Module(**module_data)
+                except Exception:
+                    break
+                modules.append(module)
+                on_module(module)
+        
+        curriculum = CourseLMS(**self.curriculum_parser.parse(text))
+        for index, module in enumerate(curriculum.modules):
+            if index < len(modules):
+                # Completed modules no longer change; keep the objects already being filled
+                curriculum.modules[index] = modules[index]
+            else:
+                on_module(module)
+        return curriculum
+    
+    def _count_tokens(self, text: str) -> int:
+        """Counts tokens for the curriculum model, or estimates four characters per token."""
+        try:
+            return self.curriculum_model.get_num_tokens(text)
+        except Exception:
+            return len(text) // 4 + 1
+    
+    def _truncate_tokens(self, text: str, max_tokens: int) -> str:
+        """Cuts `text` from the end until it has at most `max_tokens` tokens."""
+        tokens = self._count_tokens(text)
+        while text and tokens > max_tokens:
+            text = text[:int(len(text) * max_tokens / tokens * 0.95)]
+            tokens = self._count_tokens(text)
+        return text
+    
+    def _group_texts(self, texts: List[str], max_tokens: int) -> List[str]:
+        """Packs consecutive texts into groups of at most `max_tokens` tokens, keeping their order."""
+        groups, current, current_tokens = [], [], 0
+        for text in texts:
+            tokens = self._count_tokens(text)
+            if current and current_tokens + tokens > max_tokens:
+                groups.append("\n---\n".join(current))
+                current, current_tokens = [], 0
+            current.append(text)
+            current_tokens += tokens
+        if current:
+            groups.append("\n---\n".join(current))
+        return groups
+    
+    def _condense_context(self, texts: List[str]) -> str:
+        """
+        Map-reduce condensation of course material too large for one curriculum prompt. Groups
+        of consecutive chunks are summarized into compact topic outlines in parallel (map);
+        while the outlines together still exceed CURRICULUM_MAX_CONTEXT_TOKENS, consecutive
+        outlines are merged in parallel, level by level (reduce). Outlines that cannot be merged
+        below the limit are truncated. Returns the outlines in document order, as the context
+        of the curriculum prompt.
+        """
+        map_prompt = ChatPromptTemplate.from_template("""
+        You are an expert instructional designer. Summarize the following excerpt of course material
+        into a compact topic outline: the main topics and their key sub-topics, in the order they appear.
+        Use short bullet points only, without explanations.
+
+        EXCERPT:
+        {context}
+        """)
+        merge_prompt = ChatPromptTemplate.from_template("""
+        You are an expert instructional designer. The following topic outlines cover consecutive parts
+        of the same course material. Merge them into one compact topic outline, keeping the order of
+        topics and removing duplicates. Use short bullet points only, without explanations.
+
+        OUTLINES:
+        {context}
+        """)
+        
+        def summarize(prompt, groups: List[str]) -> List[str]:
+            chain = prompt | self.curriculum_model | StrOutputParser()
+            results = chain.batch(
+                [{"context": group} for group in groups],
+                config={"max_concurrency": max(1, config.CURRICULUM_MAP_CONCURRENCY)},
+                return_exceptions=True
+            )
+            outlines = []
+            for group, result in zip(groups, results):
+                if isinstance(result, Exception):
+                    # Keep the material itself rather than losing its topics
+                    logging.error(f"  Failed to summarize a group of course material: {result}")
+                    outlines.append(group)
+                else:
+                    outlines.append(result)
+            return outlines
+        
+        groups = self._group_texts(texts, config.CURRICULUM_MAP_GROUP_TOKENS)
+        logging.info(f"Summarizing {len(groups)} groups of course material into topic outlines...")
+        outlines = summarize(map_prompt, groups)
+        
+        level = 1
+        while self._count_tokens("\n---\n".join(outlines)) > config.CURRICULUM_MAX_CONTEXT_TOKENS:
+            groups = self._group_texts(outlines, config.CURRICULUM_MAP_GROUP_TOKENS)
+            if len(groups) == len(outlines):
+                # Outlines are too large to merge any further
+                break
+            logging.info(f"Merging {len(outlines)} topic outlines into {len(groups)} (level {level})...")
+            outlines = summarize(merge_prompt, groups)
+            level += 1
+        
+        context = "\n---\n".join(outlines)
+        if self._count_tokens(context) > config.CURRICULUM_MAX_CONTEXT_TOKENS:
+            # Condensing did not converge: cut every outline to an equal share of the budget,
+            # so all parts of the material stay represented in the prompt
+            logging.warning(
+                f"Topic outlines still exceed {config.CURRICULUM_MAX_CONTEXT_TOKENS} tokens; truncating them"
+            )
+            share = max(1, config.CURRICULUM_MAX_CONTEXT_TOKENS // len(outlines) - self._count_tokens("\n---\n"))
+            context = "\n---\n".join(self._truncate_tokens(outline, share) for outline in outlines)
+            context = self._truncate_tokens(context, config.CURRICULUM_MAX_CONTEXT_TOKENS)
+        return context
+    
+    def _generate_content(self, curriculum: CourseLMS, retriever,
+                          on_event: Optional[Callable[[Dict[str, Any]], None]] = None) -> CourseLMS:
         """Generate detailed content for each topic in the curriculum."""
         if not retriever:
             raise ValueError("Retriever must be provided for content generation")
         
+        content_chain = self._content_chain(retriever)
+        self._emit_curriculum(on_event, curriculum)
+        
+        # Generate content for all sub-topics, at most CONTENT_GENERATION_CONCURRENCY at a time
+        with ThreadPoolExecutor(max_workers=max(1, config.CONTENT_GENERATION_CONCURRENCY)) as pool:
+            futures = []
+            for module_index, module in enumerate(curriculum.modules):
+                futures.extend(self._start_module(pool, content_chain, module, module_index, on_event))
+            wait(futures)
+        
+        logging.info("Content generation completed for all topics")
+        return curriculum
+    
+    def _content_chain(self, retriever):
+        """Builds the RAG chain generating one sub-topic's content."""
         template = """
         You are an expert university professor. Write detailed, clear, and engaging lecture content
         for the given topic based *only* on the provided context.
@@ -122,7 +332,7 @@ class CourseGenerator:
         # Build RAG chain for content generation
         def get_context(topic_dict):
             topic = topic_dict['topic']
-            docs = retriever.get_relevant_documents(topic)
+            docs = retriever.invoke(topic)
             return {"context": "\n---\n".join(doc.page_content for doc in docs), "topic": topic}
         
         content_chain = (
@@ -133,22 +343,65 @@ class CourseGenerator:
             | self.content_parser
         )
         
-        # Generate content for each sub-topic
-        for module in curriculum.modules:
-            logging.info(f"Generating content for Week {module.week}: {module.title}")
-            
-            for sub_topic in module.sub_topics:
-                try:
-                    logging.info(f"  Generating content for: {sub_topic.title}")
-                    
-                    content = content_chain.invoke({"topic": sub_topic.title})
-                    sub_topic.content = content
-                    
-                    logging.info(f"  Content generated successfully for: {sub_topic.title}")
-                    
-                except Exception as e:
-                    logging.error(f"  Failed to generate content for {sub_topic.title}: {e}")
-                    sub_topic.content = f"Content generation failed for this topic. Error: {str(e)}"
+        return content_chain
+    
+    def _start_module(self, pool: ThreadPoolExecutor, content_chain, module: Module, module_index: int,
+                      on_event: Optional[Callable[[Dict[str, Any]], None]] = None) -> List[Future]:
+        """
+        Queues content generation for a module's sub-topics. Each call writes only its own
+        SubTopic, so results land in place whatever the order. Events are emitted before a
+        call's future completes, so they have all been handled once the futures are done.
+        """
+        logging.info(f"Generating content for Week {module.week}: {module.title}")
+        self._emit(on_event, "module_started", module_index=module_index, module=module.dict())
+        remaining = [len(module.sub_topics)]
+        lock = threading.Lock()
         
-        logging.info("Content generation completed for all topics")
-        return curriculum
\ No newline at end of file
+        def generate(sub_topic_index: int, sub_topic: SubTopic):
+            succeeded = self._generate_sub_topic(content_chain, sub_topic)
+            self._emit(on_event, "sub_topic", module_index=module_index, sub_topic_index=sub_topic_index,
+                       week=module.week, sub_topic=sub_topic.dict(), failed=not succeeded)
+            with lock:
+                remaining[0] -= 1
+                module_done = remaining[0] == 0
+            if module_done:
+                self._emit(on_event, "module", module_index=module_index, week=module.week, title=module.title)
+        
+        if not module.sub_topics:
+            self._emit(on_event, "module", module_index=module_index, week=module.week, title=module.title)
+        return [
+            pool.submit(generate, sub_topic_index, sub_topic)
+            for sub_topic_index, sub_topic in enumerate(module.sub_topics)
+        ]
+    
+    def _emit_curriculum(self, on_event: Optional[Callable[[Dict[str, Any]], None]], curriculum: CourseLMS):
+        self._emit(on_event, "curriculum", course_title=curriculum.course_title,
+                   modules=[module.dict(exclude={"sub_topics": {"__all__": {"content"}}}) for module in curriculum.modules])
+    
+    def _emit(self, on_event: Optional[Callable[[Dict[str, Any]], None]], event_type: str, **fields):
+        """Passes a progress event to `on_event`; a failing handler does not stop the build."""
+        if not on_event:
+            return
+        try:
+            on_event({"type": event_type, **fields})
+        except Exception as e:
+            logging.warning(f"Could not handle {event_type} event: {e}")
+    
+    def _generate_sub_topic(self, content_chain, sub_topic: SubTopic) -> bool:
+        """
+        Generates one sub-topic's content in place; a failure only affects this sub-topic.
+        Returns whether the content was generated.
+        """
+        try:
+            logging.info(f"  Generating content for: {sub_topic.title}")
+            
+            content = content_chain.invoke({"topic": sub_topic.title})
+            sub_topic.content = content
+            
+            logging.info(f"  Content generated successfully for: {sub_topic.title}")
+            return True
+            
+        except Exception as e:
+            logging.error(f"  Failed to generate content for {sub_topic.title}: {e}")
+            sub_topic.content = f"Content generation failed for this topic. Error: {str(e)}"
+            return False
\ No newline at end of file
@@ -0,0 +1,124 @@
+"""
+Embedding Cache - Persistent SQLite cache in front of any LangChain Embeddings model
+"""
+
+import os
+import hashlib
+import logging
+import sqlite3
+import threading
+import numpy as np
+from typing import Dict, List
+from langchain_core.embeddings import Embeddings
+
+class CachedEmbeddings(Embeddings):
+    """
+    Drop-in Embeddings wrapper that stores every document vector in SQLite, keyed by
+    (model name, dimensions, SHA-256 of the text). Vectors are stored as compact
+    float16 or float32 blobs, so the same text is embedded once across uploads,
+    restarts and every vector store that shares the cache file.
+    """
+
+    def __init__(self, embeddings: Embeddings, cache_path: str, model_name: str,
+                 dimensions: int, dtype: str = "float32"):
+        """
+        `dimensions` is the vector length requested from the wrapped model, or 0 for its
+        native length, so vectors shortened to different lengths never share a cache entry.
+        """
+        self.embeddings = embeddings
+        self.cache_path = cache_path
+        self.model_name = model_name
+        self.dimensions = dimensions
+        self.dtype = np.dtype(dtype)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        self._connection = sqlite3.connect(cache_path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            """CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                dimensions INTEGER NOT NULL,
+                text_hash TEXT NOT NULL,
+                dtype TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                PRIMARY KEY (model, dimensions, text_hash)
+            )"""
+        )
+        self._connection.commit()
+
+    @staticmethod
+    def _hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _lookup(self, text_hashes: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        with self._lock:
+            # SQLite limits the number of bound parameters, so look up in slices
+            for i in range(0, len(text_hashes), 500):
+                batch = text_hashes[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._connection.execute(
+                    f"SELECT text_hash, dtype, vector FROM embeddings "
+                    f"WHERE model = ? AND dimensions = ? AND text_hash IN ({placeholders})",
+                    [self.model_name, self.dimensions, *batch]
+                ).fetchall()
+                for text_hash, dtype, blob in rows:
+                    found[text_hash] = np.frombuffer(blob, dtype=dtype).astype(np.float32).tolist()
+        return found
+
+    def _store(self, vectors: Dict[str, List[float]]):
+        rows = [
+            (self.model_name, self.dimensions, text_hash, self.dtype.name,
+             np.asarray(vector, dtype=self.dtype).tobytes())
+            for text_hash, vector in vectors.items()
+        ]
+        with self._lock:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, dimensions, text_hash, dtype, vector) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self._connection.commit()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embeds texts, calling the wrapped model only for texts not already cached."""
+        text_hashes = [self._hash(text) for text in texts]
+        cached = self._lookup(list(set(text_hashes)))
+
+        missing = {}
+        for text, text_hash in zip(texts, text_hashes):
+            if text_hash not in cached and text_hash not in missing:
+                missing[text_hash] = text
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            new_vectors = self.embeddings.embed_documents(list(missing.values()))
+            embedded = dict(zip(missing.keys(), new_vectors))
+            try:
+                self._store(embedded)
+            except Exception as e:
+                logging.warning(f"Could not write embeddings to cache: {e}")
+            cached.update(embedded)
+
+        return [cached[text_hash] for text_hash in text_hashes]
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Embeds a query with the wrapped model. Queries are not persisted: unlike document
+        chunks they are rarely repeated verbatim and would grow the cache without bound.
+        Repeated questions are served by the in-memory QueryEmbeddingCache instead.
+        """
+        return self.embeddings.embed_query(text)
+
+    def stats(self) -> Dict[str, float]:
+        """Returns hit/miss counters for this process."""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0
+        }
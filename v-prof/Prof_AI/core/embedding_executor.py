@@ -0,0 +1,159 @@
+"""
+Embedding Executor - Token-budget batched, rate-limited, concurrent OpenAI embeddings
+"""
+
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+from openai import OpenAI, RateLimitError, APIConnectionError, APITimeoutError, InternalServerError
+from langchain_core.embeddings import Embeddings
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
+
+class _RateLimiter:
+    """Thread-safe token bucket refilled continuously at `per_minute` units per minute."""
+
+    def __init__(self, per_minute: Optional[int]):
+        self.capacity = per_minute
+        self.available = float(per_minute or 0)
+        self.rate = (per_minute or 0) / 60.0
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount: int = 1):
+        """Blocks until `amount` units are available. A limiter without a limit never blocks."""
+        if not self.capacity:
+            return
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.available >= amount:
+                    self.available -= amount
+                    return
+                wait = (amount - self.available) / self.rate
+            time.sleep(wait)
+
+class BatchedEmbeddings(Embeddings):
+    """
+    LangChain Embeddings implementation that calls the OpenAI embeddings endpoint directly.
+    Texts are packed into requests by token count rather than by a fixed number of texts,
+    several requests run concurrently, every request waits for requests-per-minute and
+    tokens-per-minute budget, and throttled or failed requests are retried with
+    exponential backoff. Because it is an Embeddings object, VectorIndex and any other
+    LangChain vector store use it without changes.
+    """
+
+    def __init__(self, model: str, api_key: str, base_url: Optional[str] = None,
+                 dimensions: Optional[int] = None, max_batch_tokens: int = 8000,
+                 max_batch_size: int = 2048, max_concurrency: int = 4,
+                 requests_per_minute: Optional[int] = None, tokens_per_minute: Optional[int] = None,
+                 max_retries: int = 6, initial_backoff: float = 1.0, max_backoff: float = 60.0):
+        self.model = model
+        self.dimensions = dimensions
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        # Retries are handled here so they share the rate limiter with fresh requests
+        self.client = OpenAI(api_key=api_key, base_url=base_url, max_retries=0)
+        self.request_limiter = _RateLimiter(requests_per_minute)
+        self.token_limiter = _RateLimiter(tokens_per_minute)
+        self._encoding = None
+        if tiktoken is not None:
+            try:
+                self._encoding = tiktoken.encoding_for_model(model)
+            except Exception:
+                try:
+                    self._encoding = tiktoken.get_encoding("cl100k_base")
+                except Exception:
+                    self._encoding = None
+
+    def count_tokens(self, text: str) -> int:
+        """Counts tokens with tiktoken, or estimates four characters per token without it."""
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        return len(text) // 4 + 1
+
+    def _pack_batches(self, texts: List[str]) -> List[Tuple[List[int], int]]:
+        """Groups text indices into (indices, token_count) batches within the token and size budgets."""
+        batches = []
+        current, current_tokens = [], 0
+        for index, text in enumerate(texts):
+            tokens = self.count_tokens(text)
+            if current and (current_tokens + tokens > self.max_batch_tokens or len(current) >= self.max_batch_size):
+                batches.append((current, current_tokens))
+                current, current_tokens = [], 0
+            current.append(index)
+            current_tokens += tokens
+        if current:
+            batches.append((current, current_tokens))
+        return batches
+
+    def _retry_delay(self, attempt: int, error: Exception) -> float:
+        """Honours a Retry-After header when present, otherwise backs off exponentially with jitter."""
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.max_backoff)
+            except ValueError:
+                pass
+        delay = min(self.max_backoff, self.initial_backoff * (2 ** attempt))
+        return delay * (0.5 + random.random() / 2)
+
+    def _embed_batch(self, batch: List[str], tokens: int) -> List[List[float]]:
+        """Embeds one batch, retrying throttled and transient failures."""
+        kwargs = {"model": self.model, "input": batch}
+        if self.dimensions:
+            kwargs["dimensions"] = self.dimensions
+
+        for attempt in range(self.max_retries + 1):
+            self.request_limiter.acquire(1)
+            self.token_limiter.acquire(tokens)
+            try:
+                response = self.client.embeddings.create(**kwargs)
+                return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self._retry_delay(attempt, e)
+                logging.warning(f"Embedding batch of {len(batch)} texts failed ({type(e).__name__}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embeds texts in token-budget batches, running up to max_concurrency requests at once."""
+        if not texts:
+            return []
+        batches = self._pack_batches(texts)
+        results: List[Optional[List[float]]] = [None] * len(texts)
+
+        def run(batch_indices: List[int], tokens: int):
+            vectors = self._embed_batch([texts[i] for i in batch_indices], tokens)
+            for index, vector in zip(batch_indices, vectors):
+                results[index] = vector
+
+        if len(batches) == 1:
+            run(*batches[0])
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches))) as pool:
+                for future in [pool.submit(run, indices, tokens) for indices, tokens in batches]:
+                    future.result()
+
+        logging.info(f"Embedded {len(texts)} texts in {len(batches)} requests")
+        return results
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed_batch([text], self.count_tokens(text))[0]
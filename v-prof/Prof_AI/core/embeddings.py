@@ -0,0 +1,59 @@
+"""
+Embeddings - Builds the embedding model shared by every vector store
+"""
+
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+import config
+from core.embedding_cache import CachedEmbeddings
+from core.embedding_executor import BatchedEmbeddings
+from core.local_embeddings import LocalEmbeddings
+from core.query_cache import QueryEmbeddingCache
+
+def create_embeddings(model_name: str, api_key: str) -> Embeddings:
+    """
+    Returns the configured embedding model: the local ONNX model, the batched,
+    rate-limited executor or LangChain's OpenAIEmbeddings, wrapped in the persistent
+    embedding cache and the in-memory query embedding cache when enabled.
+    """
+    # Vector length requested from the model, 0 for its native length; part of the cache key
+    dimensions = 0
+    if config.EMBEDDING_BACKEND == "local":
+        embeddings = LocalEmbeddings(
+            config.LOCAL_EMBEDDING_MODEL_DIR,
+            batch_size=config.LOCAL_EMBEDDING_BATCH_SIZE,
+            max_length=config.LOCAL_EMBEDDING_MAX_LENGTH,
+            workers=config.LOCAL_EMBEDDING_WORKERS
+        )
+    elif config.EMBEDDING_EXECUTOR_ENABLED:
+        embeddings = BatchedEmbeddings(
+            model=model_name,
+            api_key=api_key,
+            base_url=config.OPENAI_BASE_URL,
+            dimensions=config.EMBEDDING_DIMENSIONS or None,
+            max_batch_tokens=config.EMBEDDING_MAX_BATCH_TOKENS,
+            max_concurrency=config.EMBEDDING_MAX_CONCURRENCY,
+            requests_per_minute=config.EMBEDDING_REQUESTS_PER_MINUTE,
+            tokens_per_minute=config.EMBEDDING_TOKENS_PER_MINUTE
+        )
+        dimensions = config.EMBEDDING_DIMENSIONS
+    else:
+        embeddings = OpenAIEmbeddings(model=model_name, openai_api_key=api_key)
+
+    if config.EMBEDDING_CACHE_ENABLED:
+        embeddings = CachedEmbeddings(
+            embeddings,
+            config.EMBEDDING_CACHE_PATH,
+            model_name=model_name,
+            dimensions=dimensions,
+            dtype=config.EMBEDDING_CACHE_DTYPE
+        )
+
+    if config.QUERY_EMBEDDING_CACHE_ENABLED:
+        embeddings = QueryEmbeddingCache(
+            embeddings,
+            model_name=model_name,
+            max_size=config.QUERY_EMBEDDING_CACHE_SIZE,
+            ttl_seconds=config.QUERY_EMBEDDING_CACHE_TTL
+        )
+    return embeddings
@@ -0,0 +1,125 @@
+"""
+Index Manifest - Tracks which documents and chunks are stored in a vector index
+"""
+
+import os
+import json
+import hashlib
+import logging
+from typing import Dict, Iterable, Iterator, List, Tuple
+from langchain_core.documents import Document
+
+class IndexManifest:
+    """
+    Records, for every source document in a vector index, the digest of the file it was
+    built from and the IDs of its chunks. Comparing the manifest against the current set
+    of documents tells an incremental ingest which documents to re-chunk and which chunk
+    IDs to tombstone. Chunk IDs are derived from chunk content, so when a changed document
+    is re-chunked, chunks whose text did not change keep their ID and are not re-embedded.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.documents: Dict[str, Dict] = {}
+        # Chunk IDs of re-chunked or removed sources that have not been reused yet
+        self._superseded: Dict[str, set] = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.documents = json.load(f).get("documents", {})
+            except Exception as e:
+                logging.warning(f"Ignoring unreadable index manifest {path}: {e}")
+
+    def diff(self, digests: Dict[str, str], ignore: Iterable[str] = ()) -> Tuple[List[str], List[str]]:
+        """
+        Compares the manifest with the current {source: digest} mapping.
+        Returns (sources to re-chunk, sources to supersede). A changed document appears in both.
+        Sources in `ignore` are indexed by another process and are never superseded.
+        """
+        ignore = set(ignore)
+        to_embed = [
+            source for source, digest in digests.items()
+            if self.documents.get(source, {}).get("digest") != digest
+        ]
+        to_remove = [
+            source for source, entry in self.documents.items()
+            if source not in ignore and digests.get(source) != entry.get("digest")
+        ]
+        return to_embed, to_remove
+
+    def forget(self, sources: Iterable[str]):
+        """Drops sources from the manifest without tombstoning their chunks."""
+        for source in sources:
+            self.documents.pop(source, None)
+
+    def supersede(self, sources: Iterable[str]):
+        """
+        Marks the chunks of changed or removed sources as stale. Chunks that reappear
+        unchanged while the source is re-chunked are reused; the rest are returned by
+        superseded_chunk_ids() once chunking is done.
+        """
+        for source in sources:
+            entry = self.documents.pop(source, None)
+            if entry:
+                self._superseded.setdefault(source, set()).update(entry.get("chunk_ids", []))
+
+    def superseded_chunk_ids(self) -> List[str]:
+        """Returns, and clears, the stale chunk IDs that were not reused and must be tombstoned."""
+        ids = [chunk_id for chunk_ids in self._superseded.values() for chunk_id in chunk_ids]
+        self._superseded = {}
+        return ids
+
+    @staticmethod
+    def _chunk_uid(source: str, chunk: Document, occurrence: int) -> str:
+        """Builds a chunk ID from the source name and the chunk's content hash."""
+        text_hash = chunk.metadata.get("content_hash")
+        if not text_hash:
+            text_hash = hashlib.sha256(chunk.page_content.encode("utf-8")).hexdigest()[:32]
+        source_key = hashlib.sha256(source.encode("utf-8")).hexdigest()[:8]
+        chunk_uid = f"{source_key}-{text_hash}"
+        return f"{chunk_uid}-{occurrence}" if occurrence else chunk_uid
+
+    def tag_chunks(self, chunks: Iterable[Document], digests: Dict[str, str]) -> Iterator[Document]:
+        """
+        Assigns each chunk a stable `chunk_uid` and records it under its source.
+        Only chunks that still need embedding are yielded: a chunk whose ID was already
+        stored for a superseded version of its source is recorded but skipped.
+        """
+        occurrences: Dict[Tuple[str, str], int] = {}
+        for chunk in chunks:
+            source = chunk.metadata["source"]
+            entry = self.documents.get(source)
+            if entry is None:
+                entry = {"digest": digests[source], "chunk_ids": []}
+                self.documents[source] = entry
+
+            chunk_uid = self._chunk_uid(source, chunk, 0)
+            occurrence = occurrences.get((source, chunk_uid), 0)
+            occurrences[(source, chunk_uid)] = occurrence + 1
+            if occurrence:
+                chunk_uid = self._chunk_uid(source, chunk, occurrence)
+
+            chunk.metadata["chunk_uid"] = chunk_uid
+            entry["chunk_ids"].append(chunk_uid)
+
+            reusable = self._superseded.get(source)
+            if reusable and chunk_uid in reusable:
+                reusable.discard(chunk_uid)
+                continue
+            yield chunk
+
+    def ensure_documents(self, digests: Dict[str, str]):
+        """
+        Records sources that produced no chunks, so an unchanged empty document is not
+        reprocessed on every ingest.
+        """
+        for source, digest in digests.items():
+            self.documents.setdefault(source, {"digest": digest, "chunk_ids": []})
+
+    def save(self):
+        """Writes the manifest atomically next to the index it describes."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"documents": self.documents}, f, indent=2)
+        os.replace(tmp_path, self.path)
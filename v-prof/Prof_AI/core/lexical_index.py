@@ -0,0 +1,112 @@
+"""
+Lexical Index - In-memory BM25 inverted index over the chunks of a vector index
+"""
+
+import re
+import math
+import heapq
+from collections import Counter
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+# Terms keep internal dots, hyphens and apostrophes, so "t-test", "f1-score" and
+# section numbers like "3.2" stay single tokens.
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[.\-'][a-z0-9]+)*")
+
+STOPWORDS = frozenset("""
+a about an and are as at be by can could did do does for from how i if in into is it its
+me my of on or please should tell than that the their them then there these this those to
+was we what when where which who why will with would you your explain describe define
+""".split())
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased terms of `text`, without stopwords."""
+    return [term for term in TOKEN_PATTERN.findall(text.lower()) if term not in STOPWORDS]
+
+class LexicalHit(NamedTuple):
+    doc_id: str
+    score: float
+    # Share of the query's IDF weight whose terms occur in the document
+    coverage: float
+
+class LexicalIndex:
+    """
+    BM25 inverted index mapping each term to the documents containing it and its frequency
+    in each. Documents are keyed by the same IDs as the vector index, so it is updated
+    alongside it and scoring a query only touches the postings of the query's terms.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self._keys: Dict[str, int] = {}
+        self._ids: Dict[int, str] = {}
+        # Distinct terms of each document, needed to remove its postings
+        self._terms: Dict[int, Tuple[str, ...]] = {}
+        self._lengths: Dict[int, int] = {}
+        self._total_length = 0
+        self._next_key = 0
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._keys
+
+    def add(self, doc_ids: Iterable[str], texts: Iterable[str]):
+        """Indexes texts under their document IDs. Existing IDs are replaced."""
+        for doc_id, text in zip(doc_ids, texts):
+            if doc_id in self._keys:
+                self.remove([doc_id])
+            key = self._next_key
+            self._next_key += 1
+            counts = Counter(tokenize(text))
+            for term, count in counts.items():
+                self.postings.setdefault(term, {})[key] = count
+            length = sum(counts.values())
+            self._keys[doc_id] = key
+            self._ids[key] = doc_id
+            self._terms[key] = tuple(counts)
+            self._lengths[key] = length
+            self._total_length += length
+
+    def remove(self, doc_ids: Iterable[str]):
+        """Removes documents by ID, ignoring IDs the index does not hold."""
+        for doc_id in doc_ids:
+            key = self._keys.pop(doc_id, None)
+            if key is None:
+                continue
+            del self._ids[key]
+            for term in self._terms.pop(key):
+                postings = self.postings[term]
+                del postings[key]
+                if not postings:
+                    del self.postings[term]
+            self._total_length -= self._lengths.pop(key)
+
+    def idf(self, term: str) -> float:
+        frequency = len(self.postings.get(term, ()))
+        return math.log(1 + (len(self._keys) - frequency + 0.5) / (frequency + 0.5))
+
+    def search(self, query: str, k: int = 4, doc_ids: Optional[Set[str]] = None) -> List[LexicalHit]:
+        """Returns the k best BM25 matches for `query`, best first, among `doc_ids` if given."""
+        terms = set(tokenize(query))
+        if not terms or not self._keys:
+            return []
+        allowed = None if doc_ids is None else {self._keys[doc_id] for doc_id in doc_ids if doc_id in self._keys}
+        average_length = self._total_length / len(self._keys) or 1.0
+        weights = {term: self.idf(term) for term in terms}
+        total_weight = sum(weights.values()) or 1.0
+
+        scores: Dict[int, float] = {}
+        matched: Dict[int, float] = {}
+        for term, weight in weights.items():
+            for key, count in self.postings.get(term, {}).items():
+                if allowed is not None and key not in allowed:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[key] / average_length)
+                scores[key] = scores.get(key, 0.0) + weight * count * (self.k1 + 1) / (count + norm)
+                matched[key] = matched.get(key, 0.0) + weight
+
+        best = heapq.nlargest(k, scores, key=scores.get)
+        return [LexicalHit(self._ids[key], scores[key], matched[key] / total_weight) for key in best]
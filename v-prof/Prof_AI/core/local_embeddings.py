@@ -0,0 +1,127 @@
+"""
+Local Embeddings - Batched CPU inference of an exported ONNX sentence embedding model
+"""
+
+import os
+import logging
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from langchain_core.embeddings import Embeddings
+
+try:
+    import onnxruntime
+    from tokenizers import Tokenizer
+except ImportError:
+    onnxruntime = None
+    Tokenizer = None
+
+# Model files tried in order when the model directory holds several exports
+MODEL_FILES = ("model_quantized.onnx", "model_int8.onnx", "model.onnx")
+TOKENIZER_FILE = "tokenizer.json"
+
+# One inference session per model file and thread count, shared by every LocalEmbeddings
+# instance in the process, so services that each build an embedding model hold one copy.
+_SESSIONS: Dict[Tuple[str, int], "onnxruntime.InferenceSession"] = {}
+_SESSIONS_LOCK = threading.Lock()
+
+def find_model_file(model_dir: str) -> str:
+    for name in MODEL_FILES:
+        path = os.path.join(model_dir, name)
+        if os.path.exists(path):
+            return path
+    raise FileNotFoundError(f"No ONNX model ({', '.join(MODEL_FILES)}) in {model_dir}")
+
+def _shared_session(model_path: str, threads: int) -> "onnxruntime.InferenceSession":
+    with _SESSIONS_LOCK:
+        session = _SESSIONS.get((model_path, threads))
+        if session is None:
+            options = onnxruntime.SessionOptions()
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+            options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+            session = onnxruntime.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+            _SESSIONS[(model_path, threads)] = session
+            logging.info(f"Loaded local embedding model {model_path} ({threads} threads per batch)")
+        return session
+
+class LocalEmbeddings(Embeddings):
+    """
+    LangChain Embeddings implementation running a sentence embedding model exported to
+    ONNX (optionally int8-quantized) on the CPU, e.g. a sentence-transformers model exported
+    with Optimum. `model_dir` holds the model file and its `tokenizer.json`.
+
+    Texts are sorted by length and tokenized in batches of `batch_size`, so each batch is
+    padded only to its longest text, and batches run on a pool of `workers` threads, each
+    inference using `threads` cores (by default the available cores split across workers).
+    Token embeddings are mean-pooled over the attention mask and L2-normalized; models that
+    already output a pooled `sentence_embedding` are used as is. The inference session is
+    loaded once per process and shared, and weights exported as ONNX external data are
+    memory-mapped by onnxruntime, so worker processes share one page-cached copy.
+    """
+
+    def __init__(self, model_dir: str, batch_size: int = 32, max_length: int = 256,
+                 workers: int = 1, threads: Optional[int] = None,
+                 query_prefix: str = "", document_prefix: str = ""):
+        if onnxruntime is None:
+            raise ImportError("The local embedding backend requires the onnxruntime and tokenizers packages")
+        self.model_dir = model_dir
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.workers = max(1, workers)
+        self.threads = threads or max(1, (os.cpu_count() or 1) // self.workers)
+        self.query_prefix = query_prefix
+        self.document_prefix = document_prefix
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, TOKENIZER_FILE))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.no_padding()
+        self.session = _shared_session(find_model_file(model_dir), self.threads)
+        self.input_names = [model_input.name for model_input in self.session.get_inputs()]
+        output_names = [output.name for output in self.session.get_outputs()]
+        self.output_name = "sentence_embedding" if "sentence_embedding" in output_names else output_names[0]
+        self._pool = ThreadPoolExecutor(max_workers=self.workers) if self.workers > 1 else None
+
+    def _encode(self, texts: List[str]) -> Dict[str, np.ndarray]:
+        encodings = self.tokenizer.encode_batch(texts)
+        length = max(len(encoding.ids) for encoding in encodings)
+        input_ids = np.zeros((len(texts), length), dtype=np.int64)
+        attention_mask = np.zeros((len(texts), length), dtype=np.int64)
+        for i, encoding in enumerate(encodings):
+            input_ids[i, :len(encoding.ids)] = encoding.ids
+            attention_mask[i, :len(encoding.ids)] = 1
+        inputs = {"input_ids": input_ids, "attention_mask": attention_mask,
+                  "token_type_ids": np.zeros_like(input_ids)}
+        return {name: inputs[name] for name in self.input_names if name in inputs}
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        inputs = self._encode(texts)
+        output = self.session.run([self.output_name], inputs)[0]
+        if output.ndim == 3:
+            mask = inputs["attention_mask"][:, :, None].astype(np.float32)
+            output = (output * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        norms = np.linalg.norm(output, axis=1, keepdims=True)
+        return output / np.maximum(norms, 1e-12)
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        batches = [
+            [texts[i] for i in order[start:start + self.batch_size]]
+            for start in range(0, len(order), self.batch_size)
+        ]
+        if self._pool:
+            results = list(self._pool.map(self._embed_batch, batches))
+        else:
+            results = [self._embed_batch(batch) for batch in batches]
+        vectors = np.empty((len(texts), results[0].shape[1]), dtype=np.float32)
+        vectors[order] = np.concatenate(results)
+        return vectors.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed([self.document_prefix + text for text in texts])
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([self.query_prefix + text])[0]
@@ -0,0 +1,51 @@
+"""
+MMR - Vectorized maximal marginal relevance selection
+"""
+
+import numpy as np
+from typing import List
+
+def maximal_marginal_relevance(query: np.ndarray, candidates: np.ndarray, k: int = 4,
+                               lambda_mult: float = 0.5) -> List[int]:
+    """
+    Greedily selects k candidate indices that balance similarity to the query against
+    similarity to the candidates already selected. The candidate similarity matrix is
+    computed once, and each step updates every candidate's redundancy with one array
+    operation instead of looping over candidates in Python. Selections match LangChain's
+    maximal_marginal_relevance, including tie-breaking.
+
+    Args:
+        query: Query embedding.
+        candidates: Candidate embeddings, one per row.
+        k: Number of candidates to select.
+        lambda_mult: 1 ranks by relevance only, 0 by diversity only.
+    """
+    candidates = np.asarray(candidates, dtype=np.float32)
+    count = min(k, len(candidates))
+    if count <= 0:
+        return []
+
+    norms = np.linalg.norm(candidates, axis=1)
+    norms[norms == 0] = 1.0
+    candidates = candidates / norms[:, None]
+    query = np.asarray(query, dtype=np.float32).reshape(-1)
+    query = query / (np.linalg.norm(query) or 1.0)
+
+    relevance = candidates @ query
+    similarity = candidates @ candidates.T
+
+    first = int(np.argmax(relevance))
+    selected = [first]
+    available = np.ones(len(candidates), dtype=bool)
+    available[first] = False
+    redundancy = similarity[first].copy()
+    weighted_relevance = lambda_mult * relevance
+
+    while len(selected) < count:
+        scores = weighted_relevance - (1 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(redundancy, similarity[best], out=redundancy)
+    return selected
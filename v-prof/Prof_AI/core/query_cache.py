@@ -0,0 +1,76 @@
+"""
+Query Cache - In-process LRU cache of query embeddings
+"""
+
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+from langchain_core.embeddings import Embeddings
+
+def normalize_query(text: str) -> str:
+    """Lowercases, collapses whitespace and drops trailing punctuation."""
+    return " ".join(text.lower().split()).rstrip("?!.。 ")
+
+class QueryEmbeddingCache(Embeddings):
+    """
+    Embeddings wrapper that keeps recent query embeddings in memory, keyed by model name
+    and normalized query text, so a question asked again within `ttl_seconds` is answered
+    without a round-trip to the embedding model. Holds at most `max_size` entries, evicting
+    the least recently used. Document embeddings pass through uncached.
+    """
+
+    def __init__(self, embeddings: Embeddings, model_name: str, max_size: int = 1024,
+                 ttl_seconds: float = 600):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, List[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        key = (self.model_name, normalize_query(text))
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+                self.expired += 1
+            self.misses += 1
+
+        vector = self.embeddings.embed_query(text)
+        with self._lock:
+            self._entries[key] = (now + self.ttl_seconds, vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return vector
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        """Returns hit/miss counters for this process."""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "size": len(self._entries),
+            "hit_rate": self.hits / total if total else 0.0
+        }
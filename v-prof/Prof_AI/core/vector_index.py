@@ -0,0 +1,839 @@
+"""
+Vector Index - One on-disk vector index shared by ingestion, course generation and chat
+"""
+
+import os
+import json
+import uuid
+import logging
+import numpy as np
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Type
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.vectorstores import VectorStore
+from core.lexical_index import LexicalIndex
+from core.mmr import maximal_marginal_relevance
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+FORMAT_VERSION = 2
+INDEX_FILE = "index.json"
+VECTORS_FILE = "vectors.npy"
+SEARCH_VECTORS_FILE = "search_vectors.npy"
+SEARCH_SCALES_FILE = "search_scales.npy"
+DOCUMENTS_FILE = "documents.json"
+
+SEARCH_DTYPES = ("float32", "float16", "int8")
+# Metadata fields with posting lists, so filtered searches only score the matching rows
+FILTER_FIELDS = ("source", "week", "topic", "type")
+
+class QuantizedVectors:
+    """
+    Compact copy of the index vectors that is scanned at query time: float32, float16,
+    or int8 with one scale per row (symmetric scalar quantization), optionally reduced to
+    the leading `dimensions` of each vector. Embeddings trained with Matryoshka
+    representation learning (such as text-embedding-3) keep most of their meaning in
+    their leading dimensions, so a truncated, re-normalized prefix is a good coarse
+    representation. Scores are computed block by block, so scanning a memory-mapped copy
+    never materializes a full float32 matrix. Scores are approximate unless the copy is
+    full-dimension float32.
+    """
+
+    # Size of the float32 scratch block used when scanning quantized rows
+    BLOCK_BYTES = 4 * 1024 * 1024
+
+    def __init__(self, dtype: str, data: np.ndarray, scales: Optional[np.ndarray] = None, reduced: bool = False):
+        if dtype not in SEARCH_DTYPES:
+            raise ValueError(f"Unknown search vector dtype: {dtype}")
+        self.dtype = dtype
+        self.data = data
+        self.scales = scales
+        self.reduced = reduced
+
+    @classmethod
+    def from_vectors(cls, vectors: np.ndarray, dtype: str, dimensions: Optional[int] = None) -> "QuantizedVectors":
+        reduced = bool(dimensions) and dimensions < vectors.shape[1]
+        if reduced:
+            vectors = _normalize(np.asarray(vectors[:, :dimensions], dtype=np.float32))
+        if dtype == "int8":
+            scales = np.abs(vectors).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            data = np.rint(vectors / scales[:, None]).astype(np.int8)
+            return cls(dtype, data, scales.astype(np.float32), reduced)
+        return cls(dtype, np.asarray(vectors, dtype=dtype), reduced=reduced)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    @property
+    def dimensions(self) -> int:
+        return self.data.shape[1]
+
+    @property
+    def is_exact(self) -> bool:
+        return self.dtype == "float32" and not self.reduced
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def append(self, vectors: np.ndarray) -> "QuantizedVectors":
+        added = QuantizedVectors.from_vectors(vectors, self.dtype, self.dimensions)
+        scales = None if self.scales is None else np.concatenate([self.scales, added.scales])
+        return QuantizedVectors(self.dtype, np.concatenate([self.data, added.data]), scales, self.reduced)
+
+    def take(self, rows: np.ndarray) -> "QuantizedVectors":
+        scales = None if self.scales is None else self.scales[rows]
+        return QuantizedVectors(self.dtype, self.data[rows], scales, self.reduced)
+
+    def prepare_query(self, query: np.ndarray) -> np.ndarray:
+        """Reduces a unit-length full-dimension query to the dimensions of this copy."""
+        return _normalize(query[:self.dimensions]) if self.reduced else query
+
+    def to_float32(self, start: int = 0) -> np.ndarray:
+        """Dequantizes the rows from `start` on, e.g. to feed another search library."""
+        vectors = np.asarray(self.data[start:], dtype=np.float32)
+        return vectors * self.scales[start:, None] if self.scales is not None else vectors
+
+    def scores(self, query: np.ndarray) -> np.ndarray:
+        """Approximate inner products of every row with a unit-length float32 query."""
+        query = self.prepare_query(query)
+        if self.dtype == "float32":
+            return self.data @ query
+        scores = np.empty(len(self.data), dtype=np.float32)
+        block_rows = max(1, self.BLOCK_BYTES // (4 * max(1, self.dimensions)))
+        for start in range(0, len(self.data), block_rows):
+            block = self.data[start:start + block_rows].astype(np.float32)
+            scores[start:start + len(block)] = block @ query
+        if self.scales is not None:
+            scores *= self.scales
+        return scores
+
+    def save(self, path: str):
+        _save_array(os.path.join(path, SEARCH_VECTORS_FILE), self.data)
+        if self.scales is not None:
+            _save_array(os.path.join(path, SEARCH_SCALES_FILE), self.scales)
+
+    @classmethod
+    def load(cls, path: str, dtype: str, reduced: bool, mmap: bool = True) -> "QuantizedVectors":
+        mmap_mode = "r" if mmap else None
+        data = np.load(os.path.join(path, SEARCH_VECTORS_FILE), mmap_mode=mmap_mode)
+        scales = np.load(os.path.join(path, SEARCH_SCALES_FILE)) if dtype == "int8" else None
+        return cls(dtype, data, scales, reduced)
+
+def _save_array(file_path: str, array: np.ndarray):
+    """Writes an .npy file atomically, so memory-mapped readers keep a consistent old copy."""
+    with open(f"{file_path}.tmp", 'wb') as f:
+        np.save(f, array)
+    os.replace(f"{file_path}.tmp", file_path)
+
+class IndexBackend:
+    """
+    Search structure over the vectors of a VectorIndex. A backend's structure can always be
+    rebuilt from the index's vectors, so switching backends never requires re-embedding;
+    backends that are slow to build may also cache their structure next to the index.
+    """
+
+    name = "base"
+
+    def __init__(self, **params):
+        self.params = params
+
+    def build(self, index: "VectorIndex"):
+        """Indexes all vectors of `index`, replacing any previous state."""
+        raise NotImplementedError
+
+    def add(self, index: "VectorIndex", first_row: int):
+        """Indexes the rows of `index` from `first_row` on, which were just appended."""
+        self.build(index)
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns (scores, rows) of the k rows with the highest inner product, best first."""
+        raise NotImplementedError
+
+    def is_exact(self) -> bool:
+        """Whether search scores are full-precision inner products that need no rescoring."""
+        return False
+
+    def save(self, path: str, index: "VectorIndex"):
+        """Caches the backend's structure in the index directory. Most backends have none."""
+
+    def load(self, path: str, index: "VectorIndex") -> bool:
+        """Restores a cached structure matching `index`. Returns False if it must be built."""
+        return False
+
+def _top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+    rows = np.argpartition(-scores, k - 1)[:k]
+    rows = rows[np.argsort(-scores[rows])]
+    return scores[rows], rows
+
+class FlatBackend(IndexBackend):
+    """Exact scan of the index's search vectors with NumPy."""
+
+    name = "flat"
+
+    def build(self, index: "VectorIndex"):
+        self.index = index
+
+    def add(self, index: "VectorIndex", first_row: int):
+        self.index = index
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        return _top_k(self.index.search_vectors.scores(query), k)
+
+    def is_exact(self) -> bool:
+        return self.index.search_vectors.is_exact
+
+class _FaissBackend(IndexBackend):
+    """Base for backends that search the index's search copy, dequantized, with FAISS."""
+
+    def __init__(self, **params):
+        if faiss is None:
+            raise ImportError(f"The '{self.name}' index backend requires the faiss-cpu package")
+        super().__init__(**params)
+        self.index = None
+        self.faiss_index = None
+
+    def _new_index(self, dimensions: int, count: int):
+        raise NotImplementedError
+
+    def _configure(self):
+        """Applies search-time parameters to the FAISS index."""
+
+    def build(self, index: "VectorIndex"):
+        self.index = index
+        vectors = np.ascontiguousarray(index.search_vectors.to_float32()) if len(index) else None
+        self.faiss_index = self._new_index(index.search_vectors.dimensions, len(index))
+        if vectors is not None:
+            if not self.faiss_index.is_trained:
+                self.faiss_index.train(vectors)
+            self.faiss_index.add(vectors)
+        self._configure()
+
+    def add(self, index: "VectorIndex", first_row: int):
+        if self.faiss_index is None:
+            self.build(index)
+        else:
+            self.index = index
+            self.faiss_index.add(np.ascontiguousarray(index.search_vectors.to_float32(first_row)))
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        k = min(k, self.faiss_index.ntotal)
+        if k <= 0:
+            return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+        query = self.index.search_vectors.prepare_query(query)
+        scores, rows = self.faiss_index.search(query.reshape(1, -1).astype(np.float32), k)
+        keep = rows[0] >= 0
+        return scores[0][keep], rows[0][keep]
+
+class FaissBackend(_FaissBackend):
+    """Exhaustive inner-product search with a FAISS flat index over the search copy, dequantized."""
+
+    name = "faiss"
+
+    def _new_index(self, dimensions: int, count: int):
+        return faiss.IndexFlatIP(dimensions)
+
+    def is_exact(self) -> bool:
+        return self.index.search_vectors.is_exact
+
+class _CachedFaissBackend(_FaissBackend):
+    """
+    FAISS backend whose structure is saved as `<name>.faiss` in the index directory, with
+    the index version, row count and parameters it was built for in `<name>.json`.
+    Search-time parameters can change without invalidating the saved structure.
+    """
+
+    search_params: Tuple[str, ...] = ()
+
+    def _signature(self, index: "VectorIndex") -> Dict[str, Any]:
+        return {
+            "version": index.version,
+            "count": len(index),
+            "search_dimensions": index.search_vectors.dimensions if index.search_vectors is not None else None,
+            "search_dtype": index.search_dtype,
+            "params": {key: value for key, value in self.params.items() if key not in self.search_params}
+        }
+
+    def save(self, path: str, index: "VectorIndex"):
+        if self.faiss_index is None:
+            return
+        structure_path = os.path.join(path, f"{self.name}.faiss")
+        faiss.write_index(self.faiss_index, f"{structure_path}.tmp")
+        os.replace(f"{structure_path}.tmp", structure_path)
+        with open(os.path.join(path, f"{self.name}.json"), 'w', encoding='utf-8') as f:
+            json.dump(self._signature(index), f)
+
+    def load(self, path: str, index: "VectorIndex") -> bool:
+        try:
+            with open(os.path.join(path, f"{self.name}.json"), 'r', encoding='utf-8') as f:
+                if json.load(f) != json.loads(json.dumps(self._signature(index))):
+                    return False
+            self.faiss_index = faiss.read_index(os.path.join(path, f"{self.name}.faiss"))
+        except (OSError, ValueError, RuntimeError):
+            return False
+        self.index = index
+        self._configure()
+        return self.faiss_index.ntotal == len(index)
+
+class HNSWBackend(_CachedFaissBackend):
+    """
+    Approximate search on a FAISS HNSW graph. Inserts are incremental; deletions rebuild
+    the graph. `ef_search` trades latency for recall at query time.
+    """
+
+    name = "hnsw"
+    search_params = ("ef_search",)
+
+    def __init__(self, m: int = 32, ef_construction: int = 40, ef_search: int = 64, **params):
+        super().__init__(m=m, ef_construction=ef_construction, ef_search=ef_search, **params)
+
+    def _new_index(self, dimensions: int, count: int):
+        faiss_index = faiss.IndexHNSWFlat(dimensions, self.params["m"], faiss.METRIC_INNER_PRODUCT)
+        faiss_index.hnsw.efConstruction = self.params["ef_construction"]
+        return faiss_index
+
+    def _configure(self):
+        self.faiss_index.hnsw.efSearch = self.params["ef_search"]
+
+class IVFPQBackend(_CachedFaissBackend):
+    """
+    Approximate search on a FAISS inverted file with product-quantized vectors: only the
+    `nprobe` closest of `nlist` clusters are scanned, and vectors are compressed to `pq_m`
+    bytes. Product quantization is coarse, so `refine_factor` times more candidates are
+    returned for the index to rescore at full precision. Clusters are trained when the
+    index is built; later inserts are assigned to the trained clusters. Indexes too small
+    to train fall back to exhaustive search.
+    """
+
+    name = "ivfpq"
+    search_params = ("nprobe", "refine_factor")
+    # FAISS needs this many training vectors per cluster
+    MIN_POINTS_PER_CLUSTER = 39
+
+    def __init__(self, nlist: Optional[int] = None, nprobe: int = 16, pq_m: int = 32, pq_bits: int = 8,
+                 refine_factor: int = 4, **params):
+        super().__init__(nlist=nlist, nprobe=nprobe, pq_m=pq_m, pq_bits=pq_bits,
+                         refine_factor=refine_factor, **params)
+
+    def _new_index(self, dimensions: int, count: int):
+        nlist = min(self.params["nlist"] or int(4 * np.sqrt(count)), count // self.MIN_POINTS_PER_CLUSTER)
+        # Each sub-quantizer trains 2**pq_bits centroids
+        if nlist < 2 or count < self.MIN_POINTS_PER_CLUSTER * 2 ** self.params["pq_bits"]:
+            return faiss.IndexFlatIP(dimensions)
+        # The number of sub-quantizers must divide the dimensions
+        pq_m = max(m for m in range(1, min(self.params["pq_m"], dimensions) + 1) if dimensions % m == 0)
+        quantizer = faiss.IndexFlatIP(dimensions)
+        return faiss.IndexIVFPQ(quantizer, dimensions, nlist, pq_m, self.params["pq_bits"], faiss.METRIC_INNER_PRODUCT)
+
+    def _configure(self):
+        if hasattr(self.faiss_index, "nprobe"):
+            self.faiss_index.nprobe = self.params["nprobe"]
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        if hasattr(self.faiss_index, "nprobe"):
+            k *= max(1, self.params["refine_factor"])
+        return super().search(query, k)
+
+    def build(self, index: "VectorIndex"):
+        super().build(index)
+        self.trained_count = len(index)
+
+    def add(self, index: "VectorIndex", first_row: int):
+        # Clusters are retrained whenever the index has doubled since they were trained
+        if self.faiss_index is None or len(index) >= 2 * max(self.trained_count, 1):
+            self.build(index)
+        else:
+            super().add(index, first_row)
+
+    def load(self, path: str, index: "VectorIndex") -> bool:
+        self.trained_count = len(index)
+        return super().load(path, index)
+
+INDEX_BACKENDS: Dict[str, Type[IndexBackend]] = {
+    FlatBackend.name: FlatBackend,
+    FaissBackend.name: FaissBackend,
+    HNSWBackend.name: HNSWBackend,
+    IVFPQBackend.name: IVFPQBackend,
+}
+
+def create_backend(name: str, **params) -> IndexBackend:
+    if name not in INDEX_BACKENDS:
+        raise ValueError(f"Unknown vector index backend: {name}")
+    return INDEX_BACKENDS[name](**params)
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+class VectorIndex(VectorStore):
+    """
+    LangChain vector store over unit-normalized embeddings, persisted as one directory:
+    `vectors.npy` (full-precision float32 rows), `search_vectors.npy` (the copy scanned at
+    query time, optionally float16 or int8), `documents.json` (IDs, text and metadata in
+    row order) and `index.json` (format, embedding model, dimensions, row count, version).
+    Loaded indexes memory-map the vector files, so worker processes share one page-cached
+    copy and loading does not read the vectors up front. With a quantized search copy, the
+    top `k * rescore_factor` candidates are rescored against the full-precision vectors.
+    `search_dimensions` shrinks the search copy to a Matryoshka prefix of each vector, making
+    the first pass a coarse low-dimension search that rescoring refines at full dimension;
+    a rescore_factor of 0 skips the second pass.
+    Search runs through a pluggable IndexBackend, so every chunk is embedded once and the
+    same index serves ingestion, course generation and chat. A BM25 LexicalIndex over the
+    same chunks is kept in memory and rebuilt on load, for hybrid retrieval.
+    Searches accept a LangChain-style metadata `filter` such as {"week": 3}. Rows are
+    grouped into posting lists by the values of FILTER_FIELDS, so a filtered search scores
+    exactly the matching slice instead of filtering the global top k.
+    """
+
+    def __init__(self, embeddings: Embeddings, embedding_model: Optional[str] = None,
+                 backend: str = "flat", backend_params: Optional[Dict[str, Any]] = None,
+                 search_dtype: str = "float32", search_dimensions: Optional[int] = None,
+                 rescore_factor: int = 4):
+        if search_dtype not in SEARCH_DTYPES:
+            raise ValueError(f"Unknown search vector dtype: {search_dtype}")
+        self._embeddings = embeddings
+        self.embedding_model = embedding_model
+        self.backend_name = backend
+        self.backend_params = backend_params or {}
+        self.backend = create_backend(backend, **self.backend_params)
+        self.search_dtype = search_dtype
+        self.search_dimensions = search_dimensions
+        self.rescore_factor = max(0, rescore_factor)
+        self.ids: List[str] = []
+        self.documents: List[Document] = []
+        self.vectors: Optional[np.ndarray] = None
+        self.search_vectors: Optional[QuantizedVectors] = None
+        self._rows: Dict[str, int] = {}
+        self.lexical_index = LexicalIndex()
+        # {field: {str(value): [rows]}} for FILTER_FIELDS
+        self._postings: Dict[str, Dict[str, List[int]]] = {}
+        # Incremented on every change, so caches can tell index versions apart
+        self.version = 0
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embeddings
+
+    @property
+    def dimensions(self) -> Optional[int]:
+        return None if self.vectors is None else self.vectors.shape[1]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._rows
+
+    def memory_usage(self) -> Dict[str, int]:
+        """Bytes held by the full-precision vectors and by the search copy, if separate."""
+        shared = self.search_vectors is None or self.search_vectors.data is self.vectors
+        return {
+            "vectors": 0 if self.vectors is None else self.vectors.nbytes,
+            "search_vectors": 0 if shared else self.search_vectors.nbytes
+        }
+
+    # --- Writing ---
+
+    def _shares_vectors(self, dimensions: int) -> bool:
+        """A full-dimension float32 search copy is the full-precision array itself."""
+        return self.search_dtype == "float32" and not (self.search_dimensions and self.search_dimensions < dimensions)
+
+    def _search_copy(self, vectors: np.ndarray) -> QuantizedVectors:
+        if self._shares_vectors(vectors.shape[1]):
+            return QuantizedVectors("float32", vectors)
+        return QuantizedVectors.from_vectors(vectors, self.search_dtype, self.search_dimensions)
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None,
+                  ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        """Embeds texts and adds them to the index. Existing IDs are replaced."""
+        texts = list(texts)
+        if not texts:
+            return []
+        vectors = self._embeddings.embed_documents(texts)
+        return self.add_embeddings(texts, vectors, metadatas=metadatas, ids=ids)
+
+    def add_embeddings(self, texts: List[str], vectors: List[List[float]],
+                       metadatas: Optional[List[dict]] = None,
+                       ids: Optional[List[str]] = None) -> List[str]:
+        """Adds texts with precomputed embeddings. Existing IDs are replaced."""
+        ids = list(ids) if ids else [str(uuid.uuid4()) for _ in texts]
+        metadatas = metadatas or [{} for _ in texts]
+        new_vectors = _normalize(np.asarray(vectors, dtype=np.float32))
+        if self.vectors is not None and new_vectors.shape[1] != self.vectors.shape[1]:
+            raise ValueError(
+                f"Embedding dimensions {new_vectors.shape[1]} do not match index dimensions {self.vectors.shape[1]}"
+            )
+
+        replaced = [doc_id for doc_id in ids if doc_id in self._rows]
+        if replaced:
+            self.delete(replaced)
+
+        first_row = len(self.ids)
+        for offset, (doc_id, text, metadata) in enumerate(zip(ids, texts, metadatas)):
+            self._rows[doc_id] = first_row + offset
+            self.ids.append(doc_id)
+            self.documents.append(Document(page_content=text, metadata=dict(metadata)))
+        self.lexical_index.add(ids, texts)
+        self._index_metadata(first_row)
+
+        if self.vectors is None:
+            self.vectors = new_vectors
+            self.search_vectors = self._search_copy(new_vectors)
+            self.backend.build(self)
+        else:
+            self.vectors = np.concatenate([self.vectors, new_vectors])
+            if self._shares_vectors(self.dimensions):
+                self.search_vectors = self._search_copy(self.vectors)
+            else:
+                self.search_vectors = self.search_vectors.append(new_vectors)
+            self.backend.add(self, first_row)
+        self.version += 1
+        return ids
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        """Removes documents by ID, ignoring IDs the index does not hold."""
+        removed = {self._rows[doc_id] for doc_id in ids or [] if doc_id in self._rows}
+        if not removed:
+            return False
+        self.lexical_index.remove(ids)
+        keep = np.array([row not in removed for row in range(len(self.ids))], dtype=bool)
+        self.ids = [doc_id for row, doc_id in enumerate(self.ids) if keep[row]]
+        self.documents = [doc for row, doc in enumerate(self.documents) if keep[row]]
+        self.vectors = self.vectors[keep]
+        if self._shares_vectors(self.dimensions):
+            self.search_vectors = self._search_copy(self.vectors)
+        else:
+            self.search_vectors = self.search_vectors.take(keep)
+        self._rows = {doc_id: row for row, doc_id in enumerate(self.ids)}
+        self._postings = {}
+        self._index_metadata(0)
+        self.backend.build(self)
+        self.version += 1
+        return True
+
+    def _index_metadata(self, first_row: int):
+        """Adds the rows from `first_row` on to the posting lists of their metadata values."""
+        for row in range(first_row, len(self.documents)):
+            metadata = self.documents[row].metadata
+            for field in FILTER_FIELDS:
+                if metadata.get(field) is not None:
+                    self._postings.setdefault(field, {}).setdefault(str(metadata[field]), []).append(row)
+
+    # --- Reading ---
+
+    def get_documents(self) -> List[Document]:
+        """Returns the stored documents in insertion order."""
+        return list(self.documents)
+
+    def _document_at(self, row: int) -> Document:
+        doc = self.documents[row]
+        return Document(page_content=doc.page_content, metadata=dict(doc.metadata))
+
+    def _filter_rows(self, filter: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """
+        Sorted rows whose metadata matches every field of `filter`, or None without a filter.
+        A field's value may be a list, matching any of its values. Fields without posting
+        lists are matched by scanning the metadata of the remaining rows.
+        """
+        if not filter:
+            return None
+        rows = None
+        scanned = {}
+        for field, value in filter.items():
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            if field not in FILTER_FIELDS:
+                scanned[field] = {str(v) for v in values}
+                continue
+            postings = self._postings.get(field, {})
+            matches = set()
+            for v in values:
+                matches.update(postings.get(str(v), ()))
+            rows = matches if rows is None else rows & matches
+        if rows is None:
+            rows = range(len(self.documents))
+        if scanned:
+            rows = [
+                row for row in rows
+                if all(str(self.documents[row].metadata.get(field)) in values for field, values in scanned.items())
+            ]
+        return np.array(sorted(rows), dtype=np.int64)
+
+    def _embed_query(self, query: str) -> np.ndarray:
+        return _normalize(np.asarray(self._embeddings.embed_query(query), dtype=np.float32))
+
+    def _search(self, query: np.ndarray, k: int, rows: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns (scores, rows) of the k best rows. Candidates from an approximate search
+        are rescored with the full-precision vectors, reading only their rows from disk.
+        When `rows` is given, only those rows are scored, exactly.
+        """
+        if rows is not None:
+            if not len(rows):
+                return np.zeros(0, dtype=np.float32), rows
+            top_scores, top = _top_k(np.asarray(self.vectors[rows], dtype=np.float32) @ query, k)
+            return top_scores, rows[top]
+        if self.backend.is_exact() or not self.rescore_factor:
+            scores, rows = self.backend.search(query, k)
+            return scores[:k], rows[:k]
+        _, candidates = self.backend.search(query, k * self.rescore_factor)
+        candidates = np.sort(candidates)
+        scores = np.asarray(self.vectors[candidates], dtype=np.float32) @ query
+        top_scores, top = _top_k(scores, k)
+        return top_scores, candidates[top]
+
+    def similarity_search_with_score_by_vector(self, embedding: List[float], k: int = 4,
+                                               filter: Optional[Dict[str, Any]] = None,
+                                               **kwargs: Any) -> List[Tuple[Document, float]]:
+        """Returns the k nearest documents matching `filter` with their cosine similarity."""
+        if not self.ids:
+            return []
+        query = _normalize(np.asarray(embedding, dtype=np.float32))
+        scores, rows = self._search(query, k, self._filter_rows(filter))
+        return [(self._document_at(int(row)), float(score)) for score, row in zip(scores, rows)]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k, **kwargs)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        if not self.ids:
+            return []
+        return self.similarity_search_with_score_by_vector(self._embed_query(query), k, **kwargs)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, **kwargs)]
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        # Cosine similarity in [-1, 1] mapped to a relevance score in [0, 1]
+        return lambda score: (score + 1.0) / 2.0
+
+    def max_marginal_relevance_search_by_vector(self, embedding: List[float], k: int = 4, fetch_k: int = 20,
+                                                lambda_mult: float = 0.5, filter: Optional[Dict[str, Any]] = None,
+                                                **kwargs: Any) -> List[Document]:
+        """
+        Fetches fetch_k nearest documents and selects k of them with vectorized maximal
+        marginal relevance, so as_retriever(search_type="mmr") diversifies results cheaply.
+        """
+        if not self.ids:
+            return []
+        query = _normalize(np.asarray(embedding, dtype=np.float32))
+        _, rows = self._search(query, fetch_k, self._filter_rows(filter))
+        if not len(rows):
+            return []
+        rows = np.sort(rows)
+        candidates = np.asarray(self.vectors[rows], dtype=np.float32)
+        selected = maximal_marginal_relevance(query, candidates, k=k, lambda_mult=lambda_mult)
+        return [self._document_at(int(rows[i])) for i in selected]
+
+    def max_marginal_relevance_search(self, query: str, k: int = 4, fetch_k: int = 20,
+                                      lambda_mult: float = 0.5, **kwargs: Any) -> List[Document]:
+        if not self.ids:
+            return []
+        return self.max_marginal_relevance_search_by_vector(
+            self._embed_query(query), k=k, fetch_k=fetch_k, lambda_mult=lambda_mult, **kwargs
+        )
+
+    def _lexical_hits(self, query: str, fetch_k: int, filter: Optional[Dict[str, Any]]) -> Tuple[Optional[np.ndarray], list]:
+        """Returns the rows matching `filter` (None for all rows) and the fetch_k best BM25 hits among them."""
+        rows = self._filter_rows(filter)
+        if rows is not None and not len(rows):
+            return rows, []
+        hits = self.lexical_index.search(
+            query, fetch_k, doc_ids=None if rows is None else {self.ids[row] for row in rows}
+        )
+        return rows, hits
+
+    @staticmethod
+    def _is_decisive(hits: list, k: int, lexical_coverage: float, lexical_margin: float) -> bool:
+        """Whether the BM25 ranking can stand alone: k documents match, and the best match decisively."""
+        return len(hits) >= k and hits[0].coverage >= lexical_coverage and (
+            len(hits) == 1 or hits[0].score >= lexical_margin * hits[1].score
+        )
+
+    def lexical_fast_path(self, query: str, k: int = 4, fetch_k: int = 20, lexical_coverage: float = 1.0,
+                          lexical_margin: float = 1.5, filter: Optional[Dict[str, Any]] = None) -> Optional[List[Document]]:
+        """
+        Returns the documents hybrid_search would return without embedding the query, or
+        None if the query needs the dense ranking. Only BM25 is consulted, so this is cheap
+        enough to decide whether a query needs its embedding at all.
+        """
+        if not self.ids:
+            return []
+        _, hits = self._lexical_hits(query, fetch_k, filter)
+        if not self._is_decisive(hits, k, lexical_coverage, lexical_margin):
+            return None
+        return [self._document_at(self._rows[hit.doc_id]) for hit in hits[:k]]
+
+    def hybrid_search(self, query: str, k: int = 4, fetch_k: int = 20, rrf_k: int = 60,
+                      lexical_coverage: float = 1.0, lexical_margin: float = 1.5,
+                      filter: Optional[Dict[str, Any]] = None) -> List[Document]:
+        """
+        Fuses the fetch_k best BM25 and dense matches with reciprocal rank fusion, scoring
+        each document by the sum of 1 / (rrf_k + rank) over both rankings. When the best
+        BM25 match is decisive, i.e. it contains query terms carrying at least
+        `lexical_coverage` of the query's IDF weight and outscores the runner-up by
+        `lexical_margin`, and at least k documents contain query terms, the BM25 ranking is
+        returned as is and the query is never embedded. With fewer than k lexical matches the
+        dense ranking fills the remaining slots, so k documents are returned either way.
+        """
+        if not self.ids:
+            return []
+        rows, hits = self._lexical_hits(query, fetch_k, filter)
+        if rows is not None and not len(rows):
+            return []
+        if self._is_decisive(hits, k, lexical_coverage, lexical_margin):
+            logging.debug(f"Lexical fast path for query: {query}")
+            return [self._document_at(self._rows[hit.doc_id]) for hit in hits[:k]]
+
+        _, dense_rows = self._search(self._embed_query(query), fetch_k, rows)
+        fused: Dict[int, float] = {}
+        for rank, row in enumerate(dense_rows):
+            fused[int(row)] = fused.get(int(row), 0.0) + 1.0 / (rrf_k + rank + 1)
+        for rank, hit in enumerate(hits):
+            row = self._rows[hit.doc_id]
+            fused[row] = fused.get(row, 0.0) + 1.0 / (rrf_k + rank + 1)
+        best = sorted(fused, key=fused.get, reverse=True)[:k]
+        return [self._document_at(row) for row in best]
+
+    def as_retriever(self, **kwargs: Any) -> BaseRetriever:
+        """Adds search_type="hybrid" to the standard retriever search types."""
+        if kwargs.get("search_type") == "hybrid":
+            return HybridRetriever(
+                vector_index=self, tags=kwargs.get("tags") or [self.__class__.__name__],
+                **kwargs.get("search_kwargs", {})
+            )
+        return super().as_retriever(**kwargs)
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None,
+                   ids: Optional[List[str]] = None, **kwargs: Any) -> "VectorIndex":
+        index = cls(embedding, **kwargs)
+        index.add_texts(texts, metadatas=metadatas, ids=ids)
+        return index
+
+    # --- Persistence ---
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.exists(os.path.join(path, INDEX_FILE))
+
+    def save(self, path: str):
+        """
+        Writes the index to `path`. Each file is replaced atomically and index.json is
+        written last, so a reader never sees a row count that does not match the data.
+        """
+        os.makedirs(path, exist_ok=True)
+        vectors = self.vectors if self.vectors is not None else np.zeros((0, 0), dtype=np.float32)
+        _save_array(os.path.join(path, VECTORS_FILE), vectors)
+        if self.search_vectors is not None and not self._shares_vectors(self.dimensions):
+            self.search_vectors.save(path)
+
+        documents_path = os.path.join(path, DOCUMENTS_FILE)
+        with open(f"{documents_path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump([
+                {"id": doc_id, "page_content": doc.page_content, "metadata": doc.metadata}
+                for doc_id, doc in zip(self.ids, self.documents)
+            ], f, ensure_ascii=False)
+        os.replace(f"{documents_path}.tmp", documents_path)
+
+        index_path = os.path.join(path, INDEX_FILE)
+        with open(f"{index_path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump({
+                "format_version": FORMAT_VERSION,
+                "embedding_model": self.embedding_model,
+                "dimensions": self.dimensions,
+                "search_dtype": self.search_dtype,
+                "search_dimensions": self.search_vectors.dimensions if self.search_vectors is not None else None,
+                "count": len(self.ids),
+                "version": self.version
+            }, f, indent=2)
+        os.replace(f"{index_path}.tmp", index_path)
+        self.backend.save(path, self)
+
+    @classmethod
+    def load(cls, path: str, embeddings: Embeddings, embedding_model: Optional[str] = None,
+             backend: str = "flat", backend_params: Optional[Dict[str, Any]] = None,
+             search_dtype: Optional[str] = None, search_dimensions: Optional[int] = None,
+             rescore_factor: int = 4, mmap: bool = True) -> "VectorIndex":
+        """
+        Loads an index saved with save(), memory-mapping its vectors unless `mmap` is False.
+        `search_dtype` and `search_dimensions` default to those of the stored search copy;
+        if they differ from it, the copy is rebuilt in memory. Raises ValueError when the index was built with a different embedding
+        model or its files are inconsistent.
+        """
+        with open(os.path.join(path, INDEX_FILE), 'r', encoding='utf-8') as f:
+            info = json.load(f)
+        if info.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported vector index format: {info.get('format_version')}")
+        if embedding_model and info.get("embedding_model") and info["embedding_model"] != embedding_model:
+            raise ValueError(
+                f"Vector index was built with {info['embedding_model']}, not {embedding_model}"
+            )
+
+        with open(os.path.join(path, DOCUMENTS_FILE), 'r', encoding='utf-8') as f:
+            records = json.load(f)
+        stored_dtype = info["search_dtype"]
+        stored_dimensions = info.get("search_dimensions")
+        index = cls(embeddings, embedding_model=info.get("embedding_model") or embedding_model,
+                    backend=backend, backend_params=backend_params,
+                    search_dtype=search_dtype or stored_dtype,
+                    search_dimensions=search_dimensions or stored_dimensions,
+                    rescore_factor=rescore_factor)
+        index.ids = [record["id"] for record in records]
+        index.documents = [
+            Document(page_content=record["page_content"], metadata=record["metadata"])
+            for record in records
+        ]
+        index._rows = {doc_id: row for row, doc_id in enumerate(index.ids)}
+        index.lexical_index.add(index.ids, (doc.page_content for doc in index.documents))
+        index._index_metadata(0)
+        index.version = info.get("version", 0)
+        if len(records) != info["count"]:
+            raise ValueError(f"Vector index at {path} is inconsistent")
+        if not records:
+            return index
+
+        index.vectors = np.load(os.path.join(path, VECTORS_FILE), mmap_mode="r" if mmap else None)
+        stored_dimensions = min(stored_dimensions or index.dimensions, index.dimensions)
+        wanted_dimensions = min(index.search_dimensions or index.dimensions, index.dimensions)
+        if index._shares_vectors(index.dimensions):
+            index.search_vectors = index._search_copy(index.vectors)
+        elif index.search_dtype == stored_dtype and wanted_dimensions == stored_dimensions:
+            index.search_vectors = QuantizedVectors.load(
+                path, stored_dtype, reduced=stored_dimensions < index.dimensions, mmap=mmap
+            )
+        else:
+            index.search_vectors = index._search_copy(index.vectors)
+        if len(index.vectors) != len(records) or len(index.search_vectors) != len(records):
+            raise ValueError(f"Vector index at {path} is inconsistent")
+        if not index.backend.load(path, index):
+            index.backend.build(index)
+        return index
+
+class HybridRetriever(BaseRetriever):
+    """Retriever over VectorIndex.hybrid_search, created by as_retriever(search_type="hybrid")."""
+
+    vector_index: VectorIndex
+    k: int = 4
+    fetch_k: int = 20
+    rrf_k: int = 60
+    lexical_coverage: float = 1.0
+    lexical_margin: float = 1.5
+    filter: Optional[Dict[str, Any]] = None
+
+    def _get_relevant_documents(self, query: str, *,
+                                run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return self.vector_index.hybrid_search(
+            query, k=self.k, fetch_k=self.fetch_k, rrf_k=self.rrf_k,
+            lexical_coverage=self.lexical_coverage, lexical_margin=self.lexical_margin,
+            filter=self.filter
+        )
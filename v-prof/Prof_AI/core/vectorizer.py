@@ -2,56 +2,137 @@
 Vectorizer - Handles vector embeddings and vector store operations
 """
 
-import os
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import FAISS
 from langchain_core.documents import Document
-from typing import List
+from core.embeddings import create_embeddings
+from core.vector_index import VectorIndex
+from itertools import islice
+from typing import Any, Dict, Iterable, List, Optional
 import logging
 
 class Vectorizer:
-    """Handles the creation, saving, and loading of vector embeddings and the vector store."""
+    """Handles the creation, saving, and loading of vector embeddings and the vector index."""
 
-    def __init__(self, embedding_model: str, api_key: str):
-        self.embeddings = OpenAIEmbeddings(model=embedding_model, openai_api_key=api_key)
+    def __init__(self, embedding_model: str, api_key: str, index_backend: str = "flat",
+                 index_params: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            embedding_model: Name of the embedding model.
+            api_key: API key for the embedding provider.
+            index_backend: Search backend of the vector index.
+            index_params: Further VectorIndex options, e.g. search_dtype and rescore_factor.
+        """
+        self.embedding_model = embedding_model
+        self.index_backend = index_backend
+        self.index_params = index_params or {}
+        self.embeddings = create_embeddings(embedding_model, api_key)
+
+    def new_vector_store(self) -> VectorIndex:
+        """Returns an empty vector index for this embedding model."""
+        return VectorIndex(
+            self.embeddings, embedding_model=self.embedding_model, backend=self.index_backend, **self.index_params
+        )
 
     def create_vector_store(self, chunks: List[Document]):
-        """Creates a FAISS vector store from a list of document chunks."""
+        """Creates a vector index from a list of document chunks."""
         if not chunks:
             logging.error("Cannot create vector store: No chunks provided")
             return None
             
         logging.info("Creating new vector store from chunks...")
         try:
-            vector_store = FAISS.from_documents(chunks, self.embeddings)
+            vector_store = self.new_vector_store()
+            vector_store.add_documents(chunks)
             logging.info("Vector store created successfully")
             return vector_store
         except Exception as e:
             logging.error(f"Failed to create vector store: {e}")
             return None
 
+    def create_vector_store_from_stream(self, chunks: Iterable[Document], batch_size: int,
+                                        vector_store=None, id_key: Optional[str] = None):
+        """
+        Creates a vector index from a stream of document chunks, or extends
+        `vector_store` when one is given. Chunks are embedded and inserted one batch at
+        a time, so only a single batch of raw embeddings is held in memory alongside the
+        index. When `id_key` is set, each chunk is stored under `chunk.metadata[id_key]`.
+        """
+        logging.info(f"Embedding streamed chunks into vector store (batch size {batch_size})...")
+        chunk_iter = iter(chunks)
+        total_chunks = 0
+        try:
+            while True:
+                batch = list(islice(chunk_iter, batch_size))
+                if not batch:
+                    break
+                ids = [chunk.metadata[id_key] for chunk in batch] if id_key else None
+                if vector_store is None:
+                    vector_store = self.new_vector_store()
+                vector_store.add_documents(batch, ids=ids)
+                total_chunks += len(batch)
+                logging.info(f"Embedded {total_chunks} chunks so far")
+        except Exception as e:
+            logging.error(f"Failed to create vector store: {e}")
+            return None
+
+        if vector_store is None:
+            logging.error("Cannot create vector store: No chunks provided")
+            return None
+        logging.info(f"Vector store ready, {total_chunks} new chunks embedded")
+        return vector_store
+
+    def update_vector_store(self, vector_store, chunks: Iterable[Document], manifest,
+                            batch_size: int, id_key: str = "chunk_uid"):
+        """
+        Incrementally updates a vector index, creating it if `vector_store` is None.
+        `chunks` should come from IndexManifest.tag_chunks, so only new chunk content is
+        embedded and inserted; afterwards the chunk IDs the manifest reports as superseded
+        are tombstoned.
+        """
+        if vector_store is None:
+            vector_store = self.new_vector_store()
+        vector_store = self.create_vector_store_from_stream(
+            chunks, batch_size, vector_store=vector_store, id_key=id_key
+        )
+        if vector_store is not None:
+            self.delete_chunks(vector_store, manifest.superseded_chunk_ids())
+        return vector_store
+
+    @staticmethod
+    def delete_chunks(vector_store, chunk_ids: List[str]):
+        """Removes chunks from a vector index by ID, ignoring IDs it does not hold."""
+        ids_to_delete = [chunk_id for chunk_id in chunk_ids if chunk_id in vector_store]
+        if ids_to_delete:
+            vector_store.delete(ids_to_delete)
+            logging.info(f"Removed {len(ids_to_delete)} stale chunks from vector store")
+
+    @staticmethod
+    def get_documents(vector_store) -> List[Document]:
+        """Returns the documents stored in a vector index, in insertion order."""
+        return vector_store.get_documents()
+
     def save_vector_store(self, vector_store, path: str):
-        """Saves the FAISS vector store to a local path."""
+        """Saves the vector index to a local path."""
         if not vector_store:
             logging.error("Cannot save: Invalid vector store provided")
             return
         try:
-            os.makedirs(path, exist_ok=True)
-            vector_store.save_local(path)
+            vector_store.save(path)
             logging.info(f"Vector store saved successfully to {path}")
         except Exception as e:
             logging.error(f"Failed to save vector store: {e}")
 
-    @staticmethod
-    def load_vector_store(path: str, embeddings):
-        """Loads a FAISS vector store from a local path."""
-        if not os.path.exists(path):
-            logging.error(f"Cannot load vector store: Path does not exist at {path}")
+    def load_vector_store(self, path: str):
+        """Loads a vector index from a local path, memory-mapping its vectors."""
+        if not VectorIndex.exists(path):
+            logging.error(f"Cannot load vector store: No index found at {path}")
             return None
         try:
-            vector_store = FAISS.load_local(path, embeddings, allow_dangerous_deserialization=True)
-            logging.info(f"Vector store loaded successfully from {path}")
+            vector_store = VectorIndex.load(
+                path, self.embeddings, embedding_model=self.embedding_model, backend=self.index_backend,
+                **self.index_params
+            )
+            logging.info(f"Vector store loaded successfully from {path} ({len(vector_store)} chunks)")
             return vector_store
         except Exception as e:
             logging.error(f"Failed to load vector store: {e}")
-            return None
\ No newline at end of file
+            return None
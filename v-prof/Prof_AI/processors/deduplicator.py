@@ -0,0 +1,103 @@
+"""
+Chunk Deduplicator - Drops near-duplicate chunks before they are embedded
+"""
+
+import hashlib
+import logging
+import numpy as np
+from typing import Dict, Iterable, Iterator, List, Tuple
+from langchain_core.documents import Document
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+class ChunkDeduplicator:
+    """
+    Filters a stream of chunks with MinHash signatures and locality-sensitive hashing.
+    A chunk is dropped when its estimated Jaccard similarity to an already kept chunk,
+    over word shingles, is at least `threshold`. Repeated headers, footers, boilerplate
+    and overlapping notes therefore cost one embedding instead of many.
+    """
+
+    def __init__(self, threshold: float = 0.85, num_perm: int = 128, shingle_size: int = 3, seed: int = 1):
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        # a, b < 2**32 and 32-bit shingle hashes keep a * h + b within uint64
+        rng = np.random.RandomState(seed)
+        self.perm_a = rng.randint(1, _MAX_HASH, size=num_perm, dtype=np.uint64)
+        self.perm_b = rng.randint(0, _MAX_HASH, size=num_perm, dtype=np.uint64)
+        self.bands, self.rows = self._choose_bands(threshold, num_perm)
+        self.buckets: List[Dict[Tuple[int, ...], List[int]]] = [{} for _ in range(self.bands)]
+        self.signatures: List[Tuple[int, ...]] = []
+        self.seen = 0
+        self.dropped = 0
+
+    @staticmethod
+    def _choose_bands(threshold: float, num_perm: int) -> Tuple[int, int]:
+        """
+        Picks (bands, rows) so the LSH candidate threshold (1/bands)**(1/rows) sits just
+        below `threshold`. Candidates are verified against the full signature afterwards,
+        so erring low only costs a few extra comparisons.
+        """
+        best = (num_perm, 1)
+        best_threshold = 0.0
+        for rows in range(1, num_perm + 1):
+            bands = num_perm // rows
+            candidate_threshold = (1.0 / bands) ** (1.0 / rows)
+            if best_threshold < candidate_threshold <= threshold:
+                best, best_threshold = (bands, rows), candidate_threshold
+        return best
+
+    def _shingles(self, text: str) -> set:
+        words = text.lower().split()
+        if len(words) <= self.shingle_size:
+            return {" ".join(words)}
+        return {" ".join(words[i:i + self.shingle_size]) for i in range(len(words) - self.shingle_size + 1)}
+
+    def signature(self, text: str) -> Tuple[int, ...]:
+        """Computes the MinHash signature of a text's word shingles."""
+        hashes = np.array([
+            int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=4).digest(), "big")
+            for shingle in self._shingles(text)
+        ], dtype=np.uint64)
+        permuted = (np.outer(hashes, self.perm_a) + self.perm_b) % np.uint64(_MERSENNE_PRIME)
+        return tuple((permuted.min(axis=0) & np.uint64(_MAX_HASH)).tolist())
+
+    def _band_keys(self, signature: Tuple[int, ...]) -> Iterator[Tuple[int, Tuple[int, ...]]]:
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows]
+
+    def is_duplicate(self, signature: Tuple[int, ...]) -> bool:
+        """Checks a signature against the kept chunks that share at least one LSH band."""
+        candidates = set()
+        for band, key in self._band_keys(signature):
+            candidates.update(self.buckets[band].get(key, ()))
+        for index in candidates:
+            kept = self.signatures[index]
+            matches = sum(1 for x, y in zip(signature, kept) if x == y)
+            if matches / len(signature) >= self.threshold:
+                return True
+        return False
+
+    def add(self, signature: Tuple[int, ...]):
+        """Registers the signature of a kept chunk."""
+        index = len(self.signatures)
+        self.signatures.append(signature)
+        for band, key in self._band_keys(signature):
+            self.buckets[band].setdefault(key, []).append(index)
+
+    def filter(self, chunks: Iterable[Document]) -> Iterator[Document]:
+        """Yields the chunks that are not near-duplicates of an earlier chunk in the stream."""
+        for chunk in chunks:
+            self.seen += 1
+            signature = self.signature(chunk.page_content)
+            if self.is_duplicate(signature):
+                self.dropped += 1
+                continue
+            self.add(signature)
+            yield chunk
+
+        logging.info(
+            f"Deduplication dropped {self.dropped} of {self.seen} chunks "
+            f"(similarity threshold {self.threshold})"
+        )
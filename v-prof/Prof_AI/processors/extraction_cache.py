@@ -0,0 +1,134 @@
+"""
+Extraction Cache - Content-addressed on-disk cache of extracted document text
+"""
+
+import os
+import json
+import hashlib
+import logging
+from typing import Iterator, List, Optional, Tuple
+
+class CacheEntryWriter:
+    """
+    Writes one cache entry incrementally, one page range at a time, so a file's pages are
+    never all held in memory. The entry only becomes visible on commit(); abort() discards
+    it, e.g. when some of the file's pages could not be extracted.
+    """
+
+    def __init__(self, cache: "ExtractionCache", digest: str):
+        self.cache = cache
+        self.path = cache._entry_path(digest)
+        self.tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        self._file = open(self.tmp_path, 'w', encoding='utf-8')
+
+    def add(self, pages: List[Tuple[int, str]]):
+        """Appends (page_number, text) pairs, one JSON line per page."""
+        for page_number, text in pages:
+            self._file.write(json.dumps([page_number, text], ensure_ascii=False) + "\n")
+
+    def commit(self):
+        try:
+            self._file.close()
+            os.replace(self.tmp_path, self.path)
+        except Exception as e:
+            logging.warning(f"Could not write extraction cache entry {self.path}: {e}")
+            self.abort()
+            return
+        self.cache._evict()
+
+    def abort(self):
+        self._file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+class ExtractionCache:
+    """
+    Caches extracted page text keyed by the SHA-256 of the source file bytes, so an
+    unchanged file is never parsed twice. Entries are evicted least-recently-used
+    first once the cache grows beyond `max_bytes`.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def file_digest(file_path: str) -> str:
+        """Returns the SHA-256 hex digest of a file's bytes."""
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _entry_path(self, digest: str) -> str:
+        return os.path.join(self.cache_dir, f"{digest}.json")
+
+    def get(self, digest: str) -> Optional[Iterator[Tuple[int, str]]]:
+        """
+        Returns an iterator over the cached (page_number, text) pairs for a digest, or None on
+        a miss. Pages are read lazily from the open entry, one line at a time.
+        """
+        path = self._entry_path(digest)
+        try:
+            f = open(path, 'r', encoding='utf-8')
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logging.warning(f"Ignoring unreadable extraction cache entry {path}: {e}")
+            return None
+
+        # Touch the entry so eviction treats it as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return self._read_pages(f, path)
+
+    @staticmethod
+    def _read_pages(f, path: str) -> Iterator[Tuple[int, str]]:
+        """Yields the pages of an open entry. A corrupt entry is removed and raises ValueError."""
+        with f:
+            try:
+                for line in f:
+                    if line.strip():
+                        page_number, text = json.loads(line)
+                        yield page_number, text
+            except (ValueError, TypeError) as e:
+                logging.warning(f"Removing corrupt extraction cache entry {path}: {e}")
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                raise ValueError(f"Corrupt extraction cache entry {path}") from e
+
+    def open_entry(self, digest: str) -> CacheEntryWriter:
+        """Starts writing the entry of a file, to be filled page range by page range."""
+        return CacheEntryWriter(self, digest)
+
+    def _evict(self):
+        """Removes least-recently-used entries until the cache fits in max_bytes."""
+        entries = []
+        total_bytes = 0
+        for filename in os.listdir(self.cache_dir):
+            if not filename.endswith(".json"):
+                continue
+            path = os.path.join(self.cache_dir, filename)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total_bytes += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total_bytes -= size
+                logging.info(f"Evicted extraction cache entry: {os.path.basename(path)}")
+            except OSError:
+                pass
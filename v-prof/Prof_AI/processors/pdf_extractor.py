@@ -6,64 +6,238 @@ import os
 import PyPDF2
 import docx
 import logging
-from typing import List, Dict
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from processors.extraction_cache import ExtractionCache
+
+SUPPORTED_EXTENSIONS = ('.pdf', '.docx')
+
+def _extract_pdf_pages(file_path: str, start: int, end: int) -> List[Tuple[int, str]]:
+    """
+    Extracts the text of pages [start, end) from a PDF as (page_number, text) pairs.
+    Page numbers are 1-based. Defined at module level so it can run in a worker process.
+    """
+    with open(file_path, 'rb') as f:
+        reader = PyPDF2.PdfReader(f)
+        end = min(end, len(reader.pages))
+        page_texts = []
+        for page_index in range(start, end):
+            text = reader.pages[page_index].extract_text()
+            if text:
+                page_texts.append((page_index + 1, text))
+        return page_texts
+
+def _extract_docx_text(file_path: str) -> str:
+    """Extracts the paragraph text from a DOCX file."""
+    doc = docx.Document(file_path)
+    return "\n".join([para.text for para in doc.paragraphs if para.text])
+
+def _extract_task(file_path: str, start: Optional[int], end: Optional[int]) -> Optional[List[Tuple[int, str]]]:
+    """
+    Runs one extraction task. DOCX files have no pages and are returned as page 1.
+    Returns None if the pages could not be read, so the failure is not mistaken for empty pages.
+    """
+    try:
+        if start is None:
+            text = _extract_docx_text(file_path)
+            return [(1, text)] if text else []
+        return _extract_pdf_pages(file_path, start, end)
+    except Exception as e:
+        logging.error(f"Could not read {file_path}: {e}")
+        return None
+
+def _count_pdf_pages(file_path: str) -> int:
+    """Returns the number of pages in a PDF without extracting any text."""
+    with open(file_path, 'rb') as f:
+        return len(PyPDF2.PdfReader(f).pages)
 
 class PDFExtractor:
     """Extracts text content from various document types."""
 
-    def _extract_from_pdf(self, file_path: str) -> str:
-        """Extracts text from a single PDF file."""
-        try:
-            with open(file_path, 'rb') as f:
-                reader = PyPDF2.PdfReader(f)
-                text = "".join(page.extract_text() for page in reader.pages if page.extract_text())
-            logging.info(f"Successfully extracted text from PDF: {os.path.basename(file_path)}")
-            return text
-        except Exception as e:
-            logging.error(f"Could not read PDF {file_path}: {e}")
-            return ""
-
-    def _extract_from_docx(self, file_path: str) -> str:
-        """Extracts text from a single DOCX file."""
+    def __init__(self, max_workers: int = 1, pages_per_task: int = 50, cache: Optional[ExtractionCache] = None):
+        """
+        Args:
+            max_workers: Number of worker processes. 1 keeps extraction in-process.
+            pages_per_task: Number of PDF pages extracted per task. Large PDFs are split
+                into several tasks, which also bounds how many pages are held in memory.
+            cache: Optional content-addressed cache. Files whose bytes are already cached
+                are not parsed at all.
+        """
+        self.max_workers = max(1, max_workers or 1)
+        self.pages_per_task = max(1, pages_per_task)
+        self.cache = cache
+        # Files of the last iter_pages run with pages that could not be extracted
+        self.failed_files = set()
+
+    def _list_supported_files(self, directory_path: str) -> List[str]:
+        """Returns the supported filenames in a directory, in listing order."""
+        filenames = []
+        for filename in os.listdir(directory_path):
+            if filename.lower().endswith(SUPPORTED_EXTENSIONS):
+                filenames.append(filename)
+            else:
+                logging.warning(f"Skipping unsupported file type: {filename}")
+        return filenames
+
+    def _iter_tasks(self, directory_path: str, filenames: List[str],
+                    digests: Optional[Dict[str, str]] = None) -> Iterator[Tuple[Tuple, Optional[Iterable[Tuple[int, str]]]]]:
+        """
+        Yields ((filename, file_path, digest, start_page, end_page), cached_pages) in document order.
+        A cache hit yields a single entry carrying a lazy iterator over its pages; a miss
+        yields one extraction task per page range with cached_pages set to None. Files without
+        a digest in `digests` are hashed here.
+        """
+        for filename in filenames:
+            file_path = os.path.join(directory_path, filename)
+            digest = (digests or {}).get(filename)
+            if self.cache:
+                try:
+                    digest = digest or self.cache.file_digest(file_path)
+                    cached_pages = self.cache.get(digest)
+                except Exception as e:
+                    logging.warning(f"Could not check extraction cache for {filename}: {e}")
+                    cached_pages = None
+                if cached_pages is not None:
+                    logging.info(f"Extraction cache hit: {filename}")
+                    yield (filename, file_path, digest, None, None), cached_pages
+                    continue
+
+            if not filename.lower().endswith('.pdf'):
+                yield (filename, file_path, digest, None, None), None
+                continue
+            try:
+                page_count = _count_pdf_pages(file_path)
+            except Exception as e:
+                logging.error(f"Could not read PDF {file_path}: {e}")
+                self.failed_files.add(filename)
+                continue
+            for start in range(0, page_count, self.pages_per_task):
+                yield (filename, file_path, digest, start, start + self.pages_per_task), None
+
+    def _run_tasks(self, tasks: Iterator[Tuple]) -> Iterator[Tuple[Tuple, Optional[Iterable[Tuple[int, str]]], bool]]:
+        """
+        Runs extraction tasks and yields (task, pages, from_cache) in task order, with pages
+        None for a failed task. With more than one worker, tasks run on a process pool with
+        a bounded number in flight.
+        """
+        if self.max_workers <= 1:
+            for task, cached_pages in tasks:
+                if cached_pages is not None:
+                    yield task, cached_pages, True
+                else:
+                    yield task, _extract_task(task[1], task[3], task[4]), False
+            return
+
+        with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+            pending = deque()
+            for task, cached_pages in tasks:
+                if cached_pages is not None:
+                    future = Future()
+                    future.set_result(cached_pages)
+                else:
+                    future = pool.submit(_extract_task, task[1], task[3], task[4])
+                pending.append((task, future, cached_pages is not None))
+                if len(pending) >= self.max_workers * 2:
+                    done_task, future, from_cache = pending.popleft()
+                    yield done_task, future.result(), from_cache
+            while pending:
+                done_task, future, from_cache = pending.popleft()
+                yield done_task, future.result(), from_cache
+
+    def iter_pages(self, directory_path: str, filenames: Optional[Iterable[str]] = None,
+                   digests: Optional[Dict[str, str]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Streams the pages of every supported file in a directory, or only of `filenames` when given.
+        `digests` maps filenames to the SHA-256 of their bytes when the caller already has them,
+        so the extraction cache does not hash the files again.
+        Yields dictionaries with the source filename, the 1-based page number and the page text.
+        Only a bounded number of page ranges is held in memory at any time; extracted pages are
+        appended to the file's extraction cache entry as they stream past. A file with a page
+        range that could not be extracted is not cached and is recorded in `failed_files`; its
+        other pages have already been yielded, so callers must discard what they built from them.
+        """
+        logging.info(f"Starting text extraction from directory: {directory_path}")
+        self.failed_files = set()
+
+        if not os.path.exists(directory_path):
+            logging.error(f"Directory does not exist: {directory_path}")
+            return
+
+        supported = self._list_supported_files(directory_path)
+        if filenames is not None:
+            wanted = set(filenames)
+            supported = [filename for filename in supported if filename in wanted]
+        filenames = supported
+        if self.max_workers > 1 and filenames:
+            logging.info(f"Extracting {len(filenames)} files with {self.max_workers} worker processes")
+
+        # Cache entry of the file currently being extracted, committed once all its pages are in
+        current_file = None
+        writer = None
         try:
-            doc = docx.Document(file_path)
-            text = "\n".join([para.text for para in doc.paragraphs if para.text])
-            logging.info(f"Successfully extracted text from DOCX: {os.path.basename(file_path)}")
-            return text
-        except Exception as e:
-            logging.error(f"Could not read DOCX {file_path}: {e}")
-            return ""
+            for (filename, _, digest, start, end), pages, from_cache in self._run_tasks(
+                    self._iter_tasks(directory_path, filenames, digests)):
+                if filename != current_file:
+                    if writer:
+                        writer.commit()
+                    writer = None
+                    current_file = filename
+                    if self.cache and digest and not from_cache:
+                        try:
+                            writer = self.cache.open_entry(digest)
+                        except OSError as e:
+                            logging.warning(f"Could not write extraction cache entry for {filename}: {e}")
+
+                if pages is None:
+                    missing = "its text" if start is None else f"pages {start + 1}-{end}"
+                    logging.error(
+                        f"Could not extract {missing} of {filename}; the file is not cached "
+                        f"and will be extracted again on the next ingest"
+                    )
+                    self.failed_files.add(filename)
+                    if writer:
+                        writer.abort()
+                        writer = None
+                    continue
+                if writer:
+                    writer.add(pages)
+
+                try:
+                    for page_number, text in pages:
+                        yield {"source": filename, "page": page_number, "content": text}
+                except ValueError as e:
+                    # Cached pages are read lazily, so a corrupt entry only shows up here
+                    if not from_cache:
+                        raise
+                    logging.error(f"{e}; {filename} will be extracted again on the next ingest")
+                    self.failed_files.add(filename)
+
+            if writer:
+                writer.commit()
+                writer = None
+        finally:
+            # The consumer stopped early or extraction failed: the entry may be incomplete
+            if writer:
+                writer.abort()
 
     def extract_text_from_directory(self, directory_path: str) -> List[Dict[str, str]]:
         """
         Iterates through a directory and extracts text from all supported files.
         Returns a list of dictionaries, each containing the source filename and its content.
         """
-        all_documents = []
-        logging.info(f"Starting text extraction from directory: {directory_path}")
-        
-        if not os.path.exists(directory_path):
-            logging.error(f"Directory does not exist: {directory_path}")
-            return all_documents
-        
-        for filename in os.listdir(directory_path):
-            file_path = os.path.join(directory_path, filename)
-            content = ""
-            
-            if filename.lower().endswith('.pdf'):
-                content = self._extract_from_pdf(file_path)
-            elif filename.lower().endswith('.docx'):
-                content = self._extract_from_docx(file_path)
-            else:
-                logging.warning(f"Skipping unsupported file type: {filename}")
-                continue
+        page_texts_by_source = {}
+        for page in self.iter_pages(directory_path):
+            page_texts_by_source.setdefault(page["source"], []).append(page["content"])
 
-            if content:
-                all_documents.append({"source": filename, "content": content})
+        all_documents = [
+            {"source": source, "content": "".join(page_texts)}
+            for source, page_texts in page_texts_by_source.items()
+        ]
 
         if not all_documents:
             logging.warning("No documents were successfully processed in the directory")
         else:
             logging.info(f"Successfully processed {len(all_documents)} documents")
-        
-        return all_documents
\ No newline at end of file
+
+        return all_documents
@@ -4,18 +4,138 @@ Text Chunker - Splits raw text into smaller, structured Document objects
 
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
-from typing import List, Dict
+from typing import Any, Dict, Iterable, Iterator, List
+import bisect
+import hashlib
 import logging
+import re
+
+CHUNKING_MODES = ("recursive", "content_defined")
+
+# Random 64-bit value per byte for the gear rolling hash
+_GEAR = [int.from_bytes(hashlib.sha256(bytes([i])).digest()[:8], "big") for i in range(256)]
+_HASH_MASK = (1 << 64) - 1
+_SENTENCE_END = re.compile(r"[.!?][\"')\]]*\s+")
+
+def content_hash(text: str) -> str:
+    """
+    Returns a stable identifier for a chunk's text. Whitespace is normalized first, since
+    PDF page breaks and reflow change line breaks without changing the content.
+    """
+    return hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()[:32]
+
+class ContentDefinedSplitter:
+    """
+    Splits text at content-defined boundaries. A gear rolling hash over the text proposes
+    a cut point once a chunk reaches `min_size`, and the cut snaps forward to the next
+    sentence end. Because boundaries depend only on nearby content, an edit only changes
+    the chunks around it and every later chunk keeps its text, and therefore its hash.
+    Runs of whitespace hash as a single space so page breaks do not move boundaries.
+    Chunks do not overlap, since overlap would carry an edit into the following chunk.
+    """
+
+    def __init__(self, chunk_size: int):
+        self.min_size = max(1, chunk_size // 2)
+        self.max_size = chunk_size * 2
+        # A cut is proposed on average every 2**bits characters past min_size
+        self.hash_bits = max(1, (chunk_size - self.min_size).bit_length())
+
+    def _cut_point(self, text: str, candidate: int, start: int) -> int:
+        """Snaps a proposed cut to the next sentence end, falling back to a word break."""
+        limit = min(len(text), start + self.max_size)
+        match = _SENTENCE_END.search(text, candidate, limit)
+        if match:
+            return match.end()
+        if limit == len(text):
+            return limit
+        space = text.rfind(" ", start + self.min_size, limit)
+        return space + 1 if space >= 0 else limit
+
+    def split_text(self, text: str) -> List[str]:
+        chunks = []
+        start = 0
+        position = 0
+        rolling_hash = 0
+        shift = 64 - self.hash_bits
+        previous_space = False
+        while position < len(text):
+            char = text[position]
+            position += 1
+            if char.isspace():
+                if previous_space:
+                    continue
+                previous_space = True
+                char = " "
+            else:
+                previous_space = False
+            rolling_hash = ((rolling_hash << 1) + _GEAR[ord(char) & 0xFF]) & _HASH_MASK
+            length = position - start
+            if length < self.min_size:
+                continue
+            if rolling_hash >> shift == 0 or length >= self.max_size:
+                end = self._cut_point(text, position, start)
+                chunk = text[start:end].strip()
+                if chunk:
+                    chunks.append(chunk)
+                start = position = end
+                rolling_hash = 0
+                previous_space = False
+        tail = text[start:].strip()
+        if tail:
+            chunks.append(tail)
+        return chunks
+
+class _PageBuffer:
+    """Text of the pages of one source that have not been chunked yet."""
+
+    def __init__(self, source: str):
+        self.source = source
+        self.text = ""
+        self.page_offsets: List[int] = []
+        self.page_numbers: List[int] = []
+        self.next_chunk_id = 0
+
+    def append(self, page_number: int, text: str):
+        if self.text:
+            self.text += "\n"
+        self.page_offsets.append(len(self.text))
+        self.page_numbers.append(page_number)
+        self.text += text
+
+    def page_at(self, offset: int) -> int:
+        """Returns the page number the character at `offset` belongs to."""
+        index = bisect.bisect_right(self.page_offsets, offset) - 1
+        return self.page_numbers[max(index, 0)]
+
+    def discard_before(self, offset: int):
+        """Drops the text before `offset`, keeping page offsets aligned."""
+        first_page = max(bisect.bisect_right(self.page_offsets, offset) - 1, 0)
+        self.page_numbers = self.page_numbers[first_page:]
+        self.page_offsets = [0] + [page_offset - offset for page_offset in self.page_offsets[first_page + 1:]]
+        self.text = self.text[offset:]
 
 class TextChunker:
     """Splits raw text into smaller, structured Document objects."""
 
-    def __init__(self, chunk_size: int, chunk_overlap: int):
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size,
-            chunk_overlap=chunk_overlap,
-            length_function=len,
-        )
+    def __init__(self, chunk_size: int, chunk_overlap: int, mode: str = "recursive"):
+        """
+        Args:
+            chunk_size: Target chunk size in characters.
+            chunk_overlap: Overlap between consecutive chunks in "recursive" mode.
+            mode: "recursive" for LangChain's recursive character splitter, or
+                "content_defined" for rolling-hash boundaries that stay stable under edits.
+        """
+        if mode not in CHUNKING_MODES:
+            raise ValueError(f"Unknown chunking mode: {mode}")
+        self.chunk_size = chunk_size
+        if mode == "content_defined":
+            self.text_splitter = ContentDefinedSplitter(chunk_size)
+        else:
+            self.text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=chunk_size,
+                chunk_overlap=chunk_overlap,
+                length_function=len,
+            )
 
     def chunk_documents(self, documents: List[Dict[str, str]]) -> List[Document]:
         """
@@ -24,18 +144,83 @@ class TextChunker:
         """
         logging.info(f"Starting to chunk {len(documents)} documents...")
         all_chunks = []
-        
+
         for doc in documents:
             chunks = self.text_splitter.split_text(doc['content'])
             for i, chunk in enumerate(chunks):
                 all_chunks.append(Document(
-                    page_content=chunk, 
+                    page_content=chunk,
                     metadata={
                         "source": doc['source'],
                         "chunk_id": i,
-                        "total_chunks": len(chunks)
+                        "total_chunks": len(chunks),
+                        "content_hash": content_hash(chunk)
                     }
                 ))
-        
+
         logging.info(f"Successfully created {len(all_chunks)} chunks")
-        return all_chunks
\ No newline at end of file
+        return all_chunks
+
+    def _drain(self, buffer: _PageBuffer, final: bool) -> Iterator[Document]:
+        """
+        Splits the buffered text and yields its chunks. Unless this is the final drain
+        for the source, the last chunk is kept in the buffer since the next page may extend it.
+        """
+        chunks = self.text_splitter.split_text(buffer.text)
+        search_from = 0
+        keep_from = len(buffer.text)
+        for i, chunk in enumerate(chunks):
+            start = buffer.text.find(chunk, search_from)
+            if start < 0:
+                start = search_from
+            if not final and i == len(chunks) - 1:
+                keep_from = start
+                break
+            end = start + max(len(chunk) - 1, 0)
+            yield Document(
+                page_content=chunk,
+                metadata={
+                    "source": buffer.source,
+                    "chunk_id": buffer.next_chunk_id,
+                    "content_hash": content_hash(chunk),
+                    "page_start": buffer.page_at(start),
+                    "page_end": buffer.page_at(end)
+                }
+            )
+            buffer.next_chunk_id += 1
+            search_from = start + 1
+        buffer.discard_before(keep_from)
+
+    def iter_chunks(self, pages: Iterable[Dict[str, Any]]) -> Iterator[Document]:
+        """
+        Streams chunks from a stream of pages as produced by PDFExtractor.iter_pages.
+        Pages of a source are buffered only until they have been split, so memory stays
+        bounded regardless of document size. Each chunk records the pages it spans in
+        `page_start` and `page_end`. Since the stream has no end until it is consumed,
+        chunks carry no `total_chunks` field. `content_hash` identifies a chunk by its text
+        and does not change when unrelated parts of the document are edited.
+        """
+        flush_size = self.chunk_size * 8
+        buffer = None
+        chunk_count = 0
+
+        for page in pages:
+            if buffer is None or page["source"] != buffer.source:
+                if buffer is not None:
+                    for chunk in self._drain(buffer, final=True):
+                        chunk_count += 1
+                        yield chunk
+                buffer = _PageBuffer(page["source"])
+
+            buffer.append(page["page"], page["content"])
+            if len(buffer.text) >= flush_size:
+                for chunk in self._drain(buffer, final=False):
+                    chunk_count += 1
+                    yield chunk
+
+        if buffer is not None:
+            for chunk in self._drain(buffer, final=True):
+                chunk_count += 1
+                yield chunk
+
+        logging.info(f"Successfully streamed {chunk_count} chunks")
@@ -2,11 +2,18 @@
 Chat Service - Handles RAG-based conversations and multilingual support
 """
 
+import os
+import json
 import time
-from typing import Dict, Any
+import asyncio
+from typing import Dict, Any, List, Optional
 import config
+from core.answer_cache import AnswerCache
+from core.course_catalog import ShardCache
+from core.query_cache import QueryEmbeddingCache
+from core.vector_index import INDEX_FILE, VectorIndex
 from services.document_service import DocumentProcessor
-from services.rag_service import RAGService
+from services.rag_service import IndexSnapshot, RAGService
 from services.llm_service import LLMService
 from services.sarvam_service import SarvamService
 
@@ -17,90 +24,190 @@ class ChatService:
         self.llm_service = LLMService()
         self.sarvam_service = SarvamService()
         self.document_processor = DocumentProcessor()
+        self.catalog = self.document_processor.catalog
+        self.answer_cache = AnswerCache(
+            threshold=config.ANSWER_CACHE_THRESHOLD,
+            max_entries=config.ANSWER_CACHE_MAX_ENTRIES,
+            ttl_seconds=config.ANSWER_CACHE_TTL
+        ) if config.ANSWER_CACHE_ENABLED else None
         
-        # Initialize vectorstore and RAG
-        self.vectorstore = self.document_processor.get_vectorstore()
-        self._load_course_content_if_available()
-        
-        if self.vectorstore:
-            self.rag_service = RAGService(self.vectorstore)
-            self.is_rag_active = True
-            print("✅ Vectorstore loaded and RAG chain initialized")
+        # RAG services of the most recently used courses, each over its course's index shard.
+        # A shard changed on disk is rebuilt in the background and hot-swapped into its service.
+        self.rag_services = ShardCache(
+            loader=self._load_rag_service,
+            stamp=self._shard_stamp,
+            max_loaded=config.MAX_LOADED_COURSE_SHARDS,
+            refresh=self._refresh_rag_service
+        )
+        course_id = self.catalog.default_course_id()
+        if course_id and self._get_rag_service(course_id):
+            print(f"✅ Vectorstore of course {course_id} loaded and RAG chain initialized")
         else:
-            self.rag_service = None
-            self.is_rag_active = False
             print("❗ No vectorstore found. Operating in general knowledge mode")
     
-    def _load_course_content_if_available(self):
-        """Load generated course content into the vectorstore if available."""
+    def _shard_stamp(self, course_id: str):
+        """
+        Changes whenever the course's index shard is rewritten or a finished version of its
+        course content is saved. Partial saves of a course being generated leave it unchanged.
+        """
+        index_path = os.path.join(self.catalog.vectorstore_dir(course_id), INDEX_FILE)
+        entry = self.catalog.course_entry(course_id) or {}
+        return (os.path.getmtime(index_path) if os.path.exists(index_path) else None, entry.get("content_version"))
+    
+    def _build_vectorstore(self, course_id: str) -> Optional[VectorIndex]:
+        """
+        Loads a fresh copy of a course's index shard and indexes its generated content if
+        not done yet. The copy is private to the caller, so a live snapshot is never mutated.
+        """
         try:
-            import os
-            
-            if os.path.exists(config.OUTPUT_JSON_PATH):
-                print("📚 Found generated course content, loading into RAG system...")
-                
-                # Load course documents
-                course_docs = self.document_processor.load_course_content_as_documents(config.OUTPUT_JSON_PATH)
-                if course_docs:
-                    # Split documents
-                    split_course_docs = self.document_processor.split_documents(course_docs)
-                    
-                    # Create or update vectorstore
-                    if self.vectorstore is None:
-                        # Create new vectorstore with course content
-                        self.vectorstore = self.document_processor.create_vectorstore_from_documents(split_course_docs)
-                        print(f"✅ Created new vectorstore with {len(split_course_docs)} course content chunks")
-                    else:
-                        # Add to existing vectorstore
-                        self.vectorstore.add_documents(split_course_docs)
-                        print(f"✅ Added {len(split_course_docs)} course content chunks to existing vectorstore")
-                        
+            vectorstore = self.document_processor.get_vectorstore(course_id)
+        except ValueError:
+            # The shard was being rewritten while it was read; the retry sees the new files
+            time.sleep(0.1)
+            vectorstore = self.document_processor.get_vectorstore(course_id)
+        entry = self.catalog.course_entry(course_id) or {}
+        # A course still being generated has only part of its content; it is indexed once finished
+        course_data = self.catalog.load_course(course_id) if entry.get("status", "ready") == "ready" else None
+        if course_data:
+            try:
+                # Index only if this course version is not already in the vectorstore
+                vectorstore, added_chunks = self.document_processor.index_course_content(
+                    course_id, course_data, vectorstore
+                )
+                if added_chunks:
+                    print(f"✅ Added {added_chunks} course content chunks to the index of course {course_id}")
+            except Exception as e:
+                print(f"⚠️ Could not load course content of course {course_id}: {e}")
+        return vectorstore
+    
+    def _load_rag_service(self, course_id: str) -> Optional[RAGService]:
+        """Loads a course's index shard, indexing its generated content if not done yet."""
+        vectorstore = self._build_vectorstore(course_id)
+        if not vectorstore:
+            return None
+        print(f"📚 Loaded index shard of course {course_id} ({len(vectorstore)} chunks)")
+        rag_service = RAGService(vectorstore)
+        if self.answer_cache:
+            # Answers of earlier snapshots can never be served again
+            self.answer_cache.invalidate(course_id, keep_snapshot=rag_service.snapshot_key)
+        return rag_service
+    
+    def _on_swap(self, course_id: str, rag_service: RAGService, vectorstore: Optional[VectorIndex]):
+        # Restamped even if the rebuild failed, so a broken shard is not rebuilt on every query
+        self.rag_services.restamp(course_id)
+        if vectorstore is not None and self.answer_cache:
+            self.answer_cache.invalidate(course_id, keep_snapshot=rag_service.snapshot_key)
+    
+    def _refresh_rag_service(self, course_id: str, rag_service: RAGService):
+        """Rebuilds a course's changed index shard in the background while the old snapshot keeps serving."""
+        rag_service.rebuild_in_background(
+            lambda: self._build_vectorstore(course_id),
+            on_swap=lambda vectorstore: self._on_swap(course_id, rag_service, vectorstore)
+        )
+    
+    def _get_rag_service(self, course_id: Optional[str]) -> Optional[RAGService]:
+        if course_id is None or course_id not in self.catalog:
+            return None
+        return self.rag_services.get(course_id)
+    
+    async def _embed_for_cache(self, rag_service: RAGService, snapshot: IndexSnapshot, query: str,
+                               query_language_code: str, scope: Optional[Dict[str, Any]]) -> Optional[List[float]]:
+        """
+        Embeds the query for the answer cache, or returns None if the cache is unavailable
+        or not worth an embedding call. An English query that retrieval answers on the
+        lexical fast path never needs its embedding, so it bypasses the cache. Otherwise
+        retrieval embeds the same query, which the query embedding cache then serves.
+        """
+        if not self.answer_cache:
+            return None
+        try:
+            loop = asyncio.get_event_loop()
+            if query_language_code == "en-IN" and await loop.run_in_executor(
+                    None, rag_service.answers_lexically, query, scope, snapshot):
+                return None
+            return await loop.run_in_executor(None, snapshot.vectorstore.embeddings.embed_query, query)
         except Exception as e:
-            print(f"⚠️ Could not load course content: {e}")
+            print(f"  > Could not embed query for the answer cache: {e}")
+            return None
 
-    async def ask_question(self, query: str, query_language_code: str = "en-IN") -> Dict[str, Any]:
-        """Answer a question using RAG with multilingual support."""
+    async def ask_question(self, query: str, query_language_code: str = "en-IN",
+                           course_id: Optional[str] = None,
+                           scope: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Answer a question using RAG over the index shard of course `course_id` (by default
+        the most recently created course), with multilingual support. `scope` is a metadata
+        filter such as {"week": 3}, limiting retrieval to that module/week/topic. Answers are
+        cached by the embedding of the question as asked, so paraphrases of an answered
+        question in the same language and scope are served from the answer cache.
+        """
         
         response_lang_name = next(
             (lang["name"] for lang in config.SUPPORTED_LANGUAGES if lang["code"] == query_language_code), 
             "English"
         )
 
-        if self.is_rag_active:
-            # Translate query to English if needed
-            start_time = time.time()
-            english_query = query
-            if query_language_code != "en-IN":
-                print("[TASK] Translating query to English using Sarvam AI...")
-                english_query = await self.sarvam_service.translate_text(
-                    text=query,
-                    source_language_code=query_language_code,
-                    target_language_code="en-IN"
-                )
-                end_time = time.time()
-                print(f"  > Translation complete in {end_time - start_time:.2f}s. (Query: '{english_query}')")
-            
-            try:
-                # Execute RAG chain
-                print("[TASK] Executing RAG chain...")
+        course_id = self.catalog.default_course_id() if course_id is None else str(course_id)
+        loop = asyncio.get_event_loop()
+        try:
+            rag_service = await loop.run_in_executor(None, self._get_rag_service, course_id)
+        except Exception as e:
+            print(f"  > Could not load the index of course {course_id}: {e}")
+            rag_service = None
+
+        if rag_service:
+            # Answers are looked up, generated and cached against the same index snapshot
+            with rag_service.snapshot() as snapshot:
+                retrieval_scope = json.dumps(scope, sort_keys=True, default=str) if scope else None
+                query_vector = await self._embed_for_cache(rag_service, snapshot, query, query_language_code, scope)
+                if query_vector is not None:
+                    cached = self.answer_cache.lookup(
+                        course_id, snapshot.key, response_lang_name, query_vector, retrieval_scope
+                    )
+                    if cached:
+                        print("  > Answer cache hit, skipping translation and RAG chain.")
+                        return cached
+
+                # Translate query to English if needed
                 start_time = time.time()
-                answer = await self.rag_service.get_answer(english_query, response_lang_name)
-                end_time = time.time()
-                print(f"  > RAG chain complete in {end_time - start_time:.2f}s.")
-                
-                # Check if RAG found an answer
-                if "I cannot find the answer" in answer:
-                    print("  > RAG chain failed. Falling back to general LLM...")
+                english_query = query
+                if query_language_code != "en-IN":
+                    print("[TASK] Translating query to English using Sarvam AI...")
+                    english_query = await self.sarvam_service.translate_text(
+                        text=query,
+                        source_language_code=query_language_code,
+                        target_language_code="en-IN"
+                    )
+                    end_time = time.time()
+                    print(f"  > Translation complete in {end_time - start_time:.2f}s. (Query: '{english_query}')")
+            
+                try:
+                    # Execute RAG chain
+                    print("[TASK] Executing RAG chain...")
                     start_time = time.time()
-                    answer = await self.llm_service.get_general_response(query, response_lang_name)
+                    answer = await rag_service.get_answer(english_query, response_lang_name, scope, snapshot)
                     end_time = time.time()
-                    print(f"  > Fallback complete in {end_time - start_time:.2f}s.")
-                    return {"answer": answer, "sources": ["General Knowledge Fallback"]}
+                    print(f"  > RAG chain complete in {end_time - start_time:.2f}s.")
+                
+                    # Check if RAG found an answer
+                    if "I cannot find the answer" in answer:
+                        print("  > RAG chain failed. Falling back to general LLM...")
+                        start_time = time.time()
+                        answer = await self.llm_service.get_general_response(query, response_lang_name)
+                        end_time = time.time()
+                        print(f"  > Fallback complete in {end_time - start_time:.2f}s.")
+                        response = {"answer": answer, "sources": ["General Knowledge Fallback"]}
+                    else:
+                        response = {"answer": answer, "sources": ["Course Content"]}
 
-                return {"answer": answer, "sources": ["Course Content"]}
+                    # Answers of a snapshot replaced meanwhile could never be served
+                    if query_vector is not None and snapshot.key == rag_service.snapshot_key:
+                        self.answer_cache.store(
+                            course_id, snapshot.key, response_lang_name, query_vector, response, retrieval_scope
+                        )
+                    return response
 
-            except Exception as e:
-                print(f"  > Error during RAG chain invocation: {e}. Falling back...")
+                except Exception as e:
+                    print(f"  > Error during RAG chain invocation: {e}. Falling back...")
         
         # Fallback to general knowledge
         print("[TASK] Using general knowledge fallback...")
@@ -110,26 +217,7 @@ class ChatService:
         print(f"  > General knowledge fallback complete in {end_time - start_time:.2f}s.")
         return {"answer": answer, "sources": ["General Knowledge"]}
     
-    def update_with_course_content(self, course_data: dict):
-        """Update the RAG system with new course content."""
-        try:
-            # Extract course documents
-            course_documents = self.document_processor.extract_course_documents(course_data)
-            
-            if course_documents:
-                # Split documents
-                split_course_docs = self.document_processor.split_documents(course_documents)
-                
-                # Add to vectorstore
-                if self.vectorstore:
-                    self.vectorstore.add_documents(split_course_docs)
-                else:
-                    self.vectorstore = self.document_processor.create_vectorstore_from_documents(split_course_docs)
-                    self.rag_service = RAGService(self.vectorstore)
-                    self.is_rag_active = True
-                
-                print(f"✅ Added {len(split_course_docs)} course content chunks to RAG system")
-                
-        except Exception as e:
-            print(f"⚠️ Error updating RAG with course content: {e}")
-            raise e
\ No newline at end of file
+    def query_cache_stats(self) -> Optional[Dict[str, float]]:
+        """Hit-rate metrics of the query embedding cache shared by all course shards, if configured."""
+        embeddings = self.document_processor.embeddings
+        return embeddings.stats() if isinstance(embeddings, QueryEmbeddingCache) else None
@@ -5,29 +5,56 @@ Document Service - Handles PDF processing and course generation
 import os
 import shutil
 import json
+import hashlib
 import logging
-from typing import List
+import threading
+from typing import List, Optional, Tuple
 from fastapi import UploadFile
 from langchain_core.documents import Document
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import Chroma
 
 import config
+from core.build_events import BuildEventLog
+from core.course_catalog import CourseCatalog
+from core.index_manifest import IndexManifest
+from core.vector_index import VectorIndex
+from core.vectorizer import Vectorizer
+
+# Metadata sources of the documents extracted from generated course content
+COURSE_SOURCES = ("course_overview", "course_module", "course_content")
 
 class DocumentService:
     """Service for processing documents and generating courses."""
     
     def __init__(self):
         self.document_processor = DocumentProcessor()
+        # Progress events of course builds, streamed to clients while a build runs
+        self.build_events = BuildEventLog()
     
-    def process_uploaded_pdfs(self, pdf_files: List[UploadFile], course_title: str = None):
-        """Process uploaded PDF files and generate course content."""
+    def process_uploaded_pdfs(self, pdf_files: List[UploadFile], course_title: str = None,
+                              course_id: Optional[str] = None):
+        """
+        Process uploaded PDF files and generate course content. The files replace the
+        documents of course `course_id`, or of a new course in the catalog when it is None.
+        Progress events are published to `build_events` under the course ID, and each
+        finished sub-topic is saved to the course store as it completes.
+        Returns the generated course, including its `course_id`.
+        """
+        catalog = self.document_processor.catalog
+        if course_id is None:
+            course_id = catalog.create_course(course_title)
+        elif course_id not in catalog:
+            raise ValueError(f"Course {course_id} does not exist")
+        self.build_events.start(course_id)
+        self.build_events.publish(course_id, {"type": "started", "course_title": course_title})
         try:
+            documents_dir = catalog.documents_dir(course_id)
+            vectorstore_dir = catalog.vectorstore_dir(course_id)
+
             # Clear and prepare documents directory
-            if os.path.exists(config.DOCUMENTS_DIR):
-                shutil.rmtree(config.DOCUMENTS_DIR)
-            os.makedirs(config.DOCUMENTS_DIR, exist_ok=True)
+            if os.path.exists(documents_dir):
+                shutil.rmtree(documents_dir)
+            os.makedirs(documents_dir, exist_ok=True)
             
             # Save uploaded PDFs
             saved_files = []
@@ -35,7 +62,7 @@ class DocumentService:
                 if not pdf_file.filename.lower().endswith('.pdf'):
                     raise ValueError(f"File {pdf_file.filename} is not a PDF")
                 
-                file_path = os.path.join(config.DOCUMENTS_DIR, pdf_file.filename)
+                file_path = os.path.join(documents_dir, pdf_file.filename)
                 with open(file_path, "wb") as buffer:
                     shutil.copyfileobj(pdf_file.file, buffer)
                 saved_files.append(file_path)
@@ -44,92 +71,234 @@ class DocumentService:
             # Import processing modules
             from core.course_generator import CourseGenerator
             from processors.pdf_extractor import PDFExtractor
+            from processors.extraction_cache import ExtractionCache
             from processors.text_chunker import TextChunker
-            from core.vectorizer import Vectorizer
+            from processors.deduplicator import ChunkDeduplicator
             
-            # Process documents
-            logging.info("STEP 1: Extracting text from PDFs...")
-            extractor = PDFExtractor()
-            raw_docs = extractor.extract_text_from_directory(config.DOCUMENTS_DIR)
-            if not raw_docs:
-                raise Exception("No text could be extracted from uploaded documents")
-
-            logging.info("STEP 2: Chunking documents...")
-            chunker = TextChunker(chunk_size=config.CHUNK_SIZE, chunk_overlap=config.CHUNK_OVERLAP)
-            doc_chunks = chunker.chunk_documents(raw_docs)
-            if not doc_chunks:
-                raise Exception("No chunks could be created from documents")
-
-            logging.info("STEP 3: Creating vector store...")
-            vectorizer = Vectorizer(embedding_model=config.EMBEDDING_MODEL_NAME, api_key=config.OPENAI_API_KEY)
-            vector_store = vectorizer.create_vector_store(doc_chunks)
+            # Process documents as a stream: pages -> chunks -> embedded batches
+            logging.info("STEP 1-3: Extracting, chunking and embedding documents...")
+            extractor = PDFExtractor(
+                max_workers=config.EXTRACTION_WORKERS,
+                pages_per_task=config.EXTRACTION_PAGES_PER_TASK,
+                cache=ExtractionCache(config.EXTRACTION_CACHE_DIR, config.EXTRACTION_CACHE_MAX_BYTES)
+            )
+            chunker = TextChunker(
+                chunk_size=config.CHUNK_SIZE,
+                chunk_overlap=config.CHUNK_OVERLAP,
+                mode=config.CHUNKING_MODE
+            )
+            vectorizer = self.document_processor.vectorizer
+            deduplicator = ChunkDeduplicator(threshold=config.CHUNK_DEDUP_THRESHOLD) if config.CHUNK_DEDUP_ENABLED else None
+
+            if config.INCREMENTAL_INGESTION:
+                vector_store, manifest = self._update_vector_store_incrementally(
+                    course_id, extractor, chunker, vectorizer, deduplicator
+                )
+            else:
+                pages = extractor.iter_pages(documents_dir)
+                chunks = chunker.iter_chunks(pages)
+                if deduplicator:
+                    chunks = deduplicator.filter(chunks)
+                vector_store = vectorizer.create_vector_store_from_stream(chunks, batch_size=config.EMBEDDING_BATCH_SIZE)
+                manifest = None
             if not vector_store:
-                raise Exception("Vector store could not be created")
+                raise Exception("No text could be extracted and embedded from uploaded documents")
+            # The index also holds generated content of earlier builds, which must not feed back
+            # into curriculum or content generation; only the uploaded documents' chunks do
+            doc_chunks = [
+                doc for doc in vectorizer.get_documents(vector_store)
+                if doc.metadata.get("source") not in COURSE_SOURCES
+            ]
+            document_sources = sorted({doc.metadata.get("source") for doc in doc_chunks})
             
             # Save vector store
-            if os.path.exists(config.VECTORSTORE_DIR):
-                shutil.rmtree(config.VECTORSTORE_DIR)
-            vectorizer.save_vector_store(vector_store, config.VECTORSTORE_DIR)
+            if not config.INCREMENTAL_INGESTION and os.path.exists(vectorstore_dir):
+                shutil.rmtree(vectorstore_dir)
+            vectorizer.save_vector_store(vector_store, vectorstore_dir)
+            if manifest:
+                manifest.save()
 
             logging.info("STEP 4: Generating course...")
+            self.build_events.publish(course_id, {"type": "ingested", "chunks": len(doc_chunks)})
             course_generator = CourseGenerator()
-            final_course = course_generator.generate_course(doc_chunks, vector_store.as_retriever(), course_title)
+            final_course = course_generator.generate_course(
+                doc_chunks, vector_store, course_title, on_event=self._course_progress(course_id, course_title),
+                retrieval_filter={"source": document_sources}
+            )
             
             if not final_course:
                 raise Exception("Course generation failed")
 
             # Save course output
             logging.info("STEP 5: Saving course...")
-            os.makedirs(config.COURSES_DIR, exist_ok=True)
-            with open(config.OUTPUT_JSON_PATH, 'w', encoding='utf-8') as f:
-                json.dump(final_course.dict(), f, indent=4, ensure_ascii=False)
+            catalog.save_course(course_id, final_course.dict())
             
-            logging.info("Course generation completed successfully!")
-            return final_course.dict()
+            logging.info(f"Course {course_id} generation completed successfully!")
+            course = {**final_course.dict(), "course_id": course_id}
+            self.build_events.publish(course_id, {"type": "completed", "course": course})
+            return course
             
         except Exception as e:
             logging.error(f"Error processing PDFs: {e}")
+            self.build_events.publish(course_id, {"type": "failed", "error": str(e)})
             raise e
 
+    def _course_progress(self, course_id: str, course_title: Optional[str]):
+        """
+        Returns the progress handler of a course build: it publishes the build's events and
+        saves the partial course, with status "generating", whenever a sub-topic finishes, so
+        finished modules can be opened while later ones are still being generated.
+        """
+        catalog = self.document_processor.catalog
+        course = {"course_title": course_title or "Generated Course", "modules": []}
+        lock = threading.Lock()
+
+        def on_event(event: dict):
+            with lock:
+                if event["type"] == "module_started":
+                    course["modules"][event["module_index"]:event["module_index"] + 1] = [event["module"]]
+                elif event["type"] == "curriculum":
+                    course["course_title"] = event["course_title"]
+                    catalog.save_course(course_id, course, status="generating")
+                elif event["type"] == "sub_topic":
+                    module = course["modules"][event["module_index"]]
+                    module["sub_topics"][event["sub_topic_index"]] = event["sub_topic"]
+                    catalog.save_course(course_id, course, status="generating")
+                self.build_events.publish(course_id, event)
+
+        return on_event
+
+    def _update_vector_store_incrementally(self, course_id, extractor, chunker, vectorizer, deduplicator=None):
+        """
+        Re-chunks only the course's documents that are new or changed since the last ingest,
+        embeds only chunks whose content is new, and tombstones chunks that no longer exist.
+        Returns the updated vector index and the manifest to save alongside it.
+        Generated course content in the same index is left to DocumentProcessor.index_course_content.
+        """
+        from processors.extraction_cache import ExtractionCache
+
+        catalog = self.document_processor.catalog
+        documents_dir = catalog.documents_dir(course_id)
+        manifest = IndexManifest(catalog.manifest_path(course_id))
+        digests = {
+            filename: ExtractionCache.file_digest(os.path.join(documents_dir, filename))
+            for filename in os.listdir(documents_dir)
+        }
+
+        vector_store = None
+        if manifest.documents:
+            vector_store = vectorizer.load_vector_store(catalog.vectorstore_dir(course_id))
+        if vector_store is None:
+            # Without the index the manifest is meaningless, so rebuild from scratch
+            manifest.forget(list(manifest.documents))
+
+        to_embed, to_remove = manifest.diff(digests, ignore=COURSE_SOURCES)
+        logging.info(
+            f"Incremental ingest: {len(to_embed)} documents to embed, "
+            f"{len(set(to_remove) - set(to_embed))} to remove, {len(digests) - len(to_embed)} unchanged"
+        )
+        manifest.supersede(to_remove)
+
+        pages = extractor.iter_pages(documents_dir, filenames=to_embed, digests=digests)
+        chunks = chunker.iter_chunks(pages)
+        if deduplicator:
+            chunks = deduplicator.filter(chunks)
+        chunks = manifest.tag_chunks(chunks, digests)
+        vector_store = vectorizer.update_vector_store(
+            vector_store, chunks, manifest, batch_size=config.EMBEDDING_BATCH_SIZE
+        )
+        manifest.ensure_documents(digests)
+        if extractor.failed_files:
+            # A partly extracted document must not be indexed as if it were complete: drop the
+            # chunks it did produce and leave it out of the manifest, so it is re-ingested next time
+            logging.warning(f"Incomplete extraction of {sorted(extractor.failed_files)}; they will be re-ingested next time")
+            manifest.supersede(extractor.failed_files)
+            if vector_store is not None:
+                vectorizer.delete_chunks(vector_store, manifest.superseded_chunk_ids())
+        return vector_store, manifest
+
 class DocumentProcessor:
     """Helper class for document processing operations."""
     
     def __init__(self):
-        self.embeddings = OpenAIEmbeddings(
-            model=config.EMBEDDING_MODEL_NAME, 
-            openai_api_key=config.OPENAI_API_KEY
+        self.vectorizer = Vectorizer(
+            embedding_model=(
+                config.LOCAL_EMBEDDING_MODEL_NAME if config.EMBEDDING_BACKEND == "local"
+                else config.EMBEDDING_MODEL_NAME
+            ),
+            api_key=config.OPENAI_API_KEY,
+            index_backend=config.VECTOR_INDEX_BACKEND,
+            index_params={
+                "backend_params": config.VECTOR_INDEX_BACKEND_PARAMS.get(config.VECTOR_INDEX_BACKEND, {}),
+                "search_dtype": config.VECTOR_INDEX_SEARCH_DTYPE,
+                "search_dimensions": config.VECTOR_INDEX_SEARCH_DIMENSIONS,
+                "rescore_factor": config.VECTOR_INDEX_RESCORE_FACTOR
+            }
         )
+        self.embeddings = self.vectorizer.embeddings
+        self.catalog = CourseCatalog(config.COURSES_DIR)
+        self.catalog.migrate_single_course(config.OUTPUT_JSON_PATH, config.DOCUMENTS_DIR, config.VECTORSTORE_DIR)
     
-    def get_vectorstore(self, recreate: bool = False, documents: List[Document] = None):
-        """Get or create vectorstore."""
+    def get_vectorstore(self, course_id: str, recreate: bool = False,
+                        documents: List[Document] = None) -> Optional[VectorIndex]:
+        """Get or create the vector index shard of a course."""
         if recreate:
-            if os.path.exists(config.CHROMA_DB_PATH):
-                shutil.rmtree(config.CHROMA_DB_PATH)
             if not documents:
                 raise ValueError("Documents must be provided when recreating vectorstore")
-            return Chroma.from_documents(
-                documents=documents,
-                embedding=self.embeddings,
-                persist_directory=config.CHROMA_DB_PATH,
-                collection_name=config.CHROMA_COLLECTION_NAME
-            )
+            return self.create_vectorstore_from_documents(course_id, documents)
         else:
-            if not os.path.exists(config.CHROMA_DB_PATH):
+            vectorstore_dir = self.catalog.vectorstore_dir(course_id)
+            if not VectorIndex.exists(vectorstore_dir):
                 return None
-            return Chroma(
-                persist_directory=config.CHROMA_DB_PATH,
-                embedding_function=self.embeddings,
-                collection_name=config.CHROMA_COLLECTION_NAME
-            )
+            return self.vectorizer.load_vector_store(vectorstore_dir)
+    
+    def create_vectorstore_from_documents(self, course_id: str, documents: List[Document]) -> VectorIndex:
+        """Create a new vector index shard for a course from documents, replacing the saved one."""
+        vectorstore_dir = self.catalog.vectorstore_dir(course_id)
+        if os.path.exists(vectorstore_dir):
+            shutil.rmtree(vectorstore_dir)
+        vectorstore = self.vectorizer.create_vector_store(documents)
+        self.vectorizer.save_vector_store(vectorstore, vectorstore_dir)
+        return vectorstore
     
-    def create_vectorstore_from_documents(self, documents: List[Document]):
-        """Create a new vectorstore from documents."""
-        return Chroma.from_documents(
-            documents=documents,
-            embedding=self.embeddings,
-            persist_directory=config.CHROMA_DB_PATH,
-            collection_name=config.CHROMA_COLLECTION_NAME
+    def index_course_content(self, course_id: str, course_data: dict,
+                             vectorstore: Optional[VectorIndex] = None) -> Tuple[VectorIndex, int]:
+        """
+        Idempotently indexes generated course content into the course's vector index shard.
+        The course version (a hash of its JSON) and the IDs of its chunks are recorded in
+        the index manifest. If that version is already indexed, nothing is split or
+        embedded; otherwise only chunks whose content changed are embedded.
+        `vectorstore` is the already loaded index, if any; otherwise it is loaded from disk.
+        Returns the vector index and the number of chunks embedded.
+        """
+        manifest = IndexManifest(self.catalog.manifest_path(course_id))
+        course_version = hashlib.sha256(
+            json.dumps(course_data, sort_keys=True, ensure_ascii=False).encode("utf-8")
+        ).hexdigest()
+        digests = {source: course_version for source in COURSE_SOURCES}
+
+        if vectorstore is None:
+            vectorstore = self.get_vectorstore(course_id)
+        if vectorstore is None:
+            manifest.forget(list(manifest.documents))
+
+        document_sources = [source for source in manifest.documents if source not in COURSE_SOURCES]
+        to_embed, to_remove = manifest.diff(digests, ignore=document_sources)
+        if not to_embed and not to_remove:
+            logging.info(f"Course content version {course_version[:12]} is already indexed")
+            return vectorstore, 0
+
+        manifest.supersede(to_remove)
+        split_docs = self.split_documents(self.extract_course_documents(course_data))
+        new_chunks = list(manifest.tag_chunks(split_docs, digests))
+        manifest.ensure_documents(digests)
+        vectorstore = self.vectorizer.update_vector_store(
+            vectorstore, new_chunks, manifest, batch_size=config.EMBEDDING_BATCH_SIZE
         )
+        self.vectorizer.save_vector_store(vectorstore, self.catalog.vectorstore_dir(course_id))
+        manifest.save()
+        logging.info(f"Indexed course content version {course_version[:12]}: {len(new_chunks)} chunks embedded")
+        return vectorstore, len(new_chunks)
     
     def split_documents(self, documents: List[Document]) -> List[Document]:
         """Split documents into chunks."""
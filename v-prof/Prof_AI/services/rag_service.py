@@ -2,30 +2,104 @@
 RAG Service - Handles Retrieval-Augmented Generation
 """
 
+import uuid
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langchain_community.vectorstores import Chroma
 from langchain_groq import ChatGroq
-from typing import List, Any
+from typing import Any, Callable, Dict, Iterator, List, Optional
 import config
+from core.vector_index import VectorIndex
 
-class RAGService:
-    """Service for RAG-based question answering."""
-    
-    def __init__(self, vectorstore: Chroma):
+class IndexSnapshot:
+    """
+    One immutable version of the vector index together with its retriever. Queries hold a
+    reference while they run; once the snapshot has been replaced and its last query has
+    released it, the index is dropped so its memory can be reclaimed.
+    """
+
+    def __init__(self, vectorstore: VectorIndex, snapshot_id: int):
         self.vectorstore = vectorstore
+        self.snapshot_id = snapshot_id
+        self.version = vectorstore.version
+        # Unique across services and reloads, unlike snapshot_id and the index version, so
+        # answers cached for this snapshot are never served from another one
+        self.key = uuid.uuid4().hex
+        self.retriever = vectorstore.as_retriever(
+            search_type=config.RETRIEVAL_SEARCH_TYPE,
+            search_kwargs={"k": config.RETRIEVAL_K}
+        )
+        self._refs = 0
+        self._retired = False
+        self._lock = threading.Lock()
+
+    @property
+    def reclaimed(self) -> bool:
+        return self.vectorstore is None
+
+    def acquire(self):
+        with self._lock:
+            self._refs += 1
+
+    def release(self):
+        with self._lock:
+            self._refs -= 1
+            reclaim = self._retired and self._refs == 0
+        if reclaim:
+            self._reclaim()
+
+    def retire(self):
+        """Marks the snapshot as replaced; it is reclaimed as soon as no query holds it."""
+        with self._lock:
+            self._retired = True
+            reclaim = self._refs == 0
+        if reclaim:
+            self._reclaim()
+
+    def _reclaim(self):
+        self.vectorstore = None
+        self.retriever = None
+        print(f"♻️ Reclaimed index snapshot {self.snapshot_id} (index version {self.version})")
+
+class RAGService:
+    """
+    Service for RAG-based question answering. Queries run against an immutable index
+    snapshot: updates build a new vector index in the background and swap it in
+    atomically, so in-flight queries finish on the snapshot they started with and the
+    event loop never waits for an index update.
+    """
+
+    def __init__(self, vectorstore: VectorIndex):
         self.llm = ChatGroq(
             model="llama3-8b-8192",
             temperature=0,
             groq_api_key=config.GROQ_API_KEY
         )
         self.prompt = ChatPromptTemplate.from_template(config.QA_PROMPT_TEMPLATE)
-        self.retriever = vectorstore.as_retriever(
-            search_type=config.RETRIEVAL_SEARCH_TYPE,
-            search_kwargs={"k": config.RETRIEVAL_K}
-        )
+        self._swap_lock = threading.Lock()
+        self._snapshot_ids = 1
+        self._current = IndexSnapshot(vectorstore, self._snapshot_ids)
+        # Index rebuilds run one at a time, off the event loop
+        self._builder = ThreadPoolExecutor(max_workers=1, thread_name_prefix="index-build")
+        self._pending: Optional[Future] = None
         self._initialize_chain()
-    
+
+    @property
+    def vectorstore(self) -> VectorIndex:
+        """The vector index of the current snapshot."""
+        return self._current.vectorstore
+
+    @property
+    def retriever(self):
+        return self._current.retriever
+
+    @property
+    def snapshot_key(self) -> str:
+        """The key of the current snapshot."""
+        return self._current.key
+
     def _initialize_chain(self):
         """Initialize the RAG chain."""
         def format_docs(docs: List[Any]) -> str:
@@ -33,7 +107,7 @@ class RAGService:
 
         self.rag_chain = (
             {
-                "context": lambda x: format_docs(self.retriever.invoke(x["question"])),
+                "context": lambda x: format_docs(self.retrieve(x["question"], x.get("filter"), x.get("snapshot"))),
                 "question": lambda x: x["question"],
                 "response_language": lambda x: x["response_language"]
             }
@@ -41,24 +115,109 @@ class RAGService:
             | self.llm
             | StrOutputParser()
         )
-    
-    async def get_answer(self, question: str, response_language: str = "English") -> str:
-        """Get an answer using the RAG chain."""
+
+    @contextmanager
+    def snapshot(self) -> Iterator[IndexSnapshot]:
+        """Holds the current index snapshot for the duration of a query."""
+        with self._swap_lock:
+            snapshot = self._current
+            snapshot.acquire()
+        try:
+            yield snapshot
+        finally:
+            snapshot.release()
+
+    def retrieve(self, question: str, filter: Optional[Dict[str, Any]] = None,
+                 snapshot: Optional[IndexSnapshot] = None) -> List[Any]:
+        """
+        Retrieves context for a question from `snapshot`, or the current snapshot. A metadata
+        filter such as {"week": 3} limits the search to the matching slice of the index, via
+        its per-field posting lists.
+        """
+        if snapshot is None:
+            with self.snapshot() as current:
+                return self.retrieve(question, filter, current)
+        if not filter:
+            return snapshot.retriever.invoke(question)
+        return snapshot.vectorstore.as_retriever(
+            search_type=config.RETRIEVAL_SEARCH_TYPE,
+            search_kwargs={"k": config.RETRIEVAL_K, "filter": filter}
+        ).invoke(question)
+
+    def answers_lexically(self, question: str, filter: Optional[Dict[str, Any]] = None,
+                          snapshot: Optional[IndexSnapshot] = None) -> bool:
+        """
+        Whether retrieval for `question` from `snapshot`, or the current snapshot, takes the
+        hybrid search's lexical fast path, i.e. answers without ever embedding the question.
+        """
+        if config.RETRIEVAL_SEARCH_TYPE != "hybrid":
+            return False
+        if snapshot is None:
+            with self.snapshot() as current:
+                return self.answers_lexically(question, filter, current)
+        return snapshot.vectorstore.lexical_fast_path(question, k=config.RETRIEVAL_K, filter=filter) is not None
+
+    async def get_answer(self, question: str, response_language: str = "English",
+                         filter: Optional[Dict[str, Any]] = None,
+                         snapshot: Optional[IndexSnapshot] = None) -> str:
+        """
+        Get an answer using the RAG chain, retrieving only from documents matching `filter`,
+        from `snapshot` (held by the caller) or the current snapshot.
+        """
+        if snapshot is None:
+            with self.snapshot() as current:
+                return await self.get_answer(question, response_language, filter, current)
         try:
             answer = await self.rag_chain.ainvoke({
                 "question": question,
-                "response_language": response_language
+                "response_language": response_language,
+                "filter": filter,
+                "snapshot": snapshot
             })
             return answer
         except Exception as e:
             print(f"Error in RAG chain: {e}")
             raise e
-    
-    def update_vectorstore(self, vectorstore: Chroma):
-        """Update the vectorstore and reinitialize the chain."""
-        self.vectorstore = vectorstore
-        self.retriever = vectorstore.as_retriever(
-            search_type=config.RETRIEVAL_SEARCH_TYPE,
-            search_kwargs={"k": config.RETRIEVAL_K}
-        )
-        self._initialize_chain()
\ No newline at end of file
+
+    def update_vectorstore(self, vectorstore: VectorIndex):
+        """
+        Atomically swaps in `vectorstore` as a new snapshot. `vectorstore` must not be
+        modified afterwards; build updates on a separate copy, e.g. with rebuild_in_background.
+        """
+        with self._swap_lock:
+            if vectorstore is self._current.vectorstore:
+                return
+            self._snapshot_ids += 1
+            previous, self._current = self._current, IndexSnapshot(vectorstore, self._snapshot_ids)
+        previous.retire()
+        print(f"🔄 Swapped in index snapshot {self._current.snapshot_id} (index version {vectorstore.version})")
+
+    def rebuild_in_background(self, build: Callable[[], Optional[VectorIndex]],
+                              on_swap: Optional[Callable[[Optional[VectorIndex]], None]] = None,
+                              coalesce: bool = True) -> Future:
+        """
+        Runs `build`, which must return a new VectorIndex object (e.g. loaded from disk and
+        then updated), on the background builder and swaps the result in. Queries keep using
+        the current snapshot meanwhile. Rebuilds run one at a time; with `coalesce`, a rebuild
+        already pending is returned instead of queueing another. `on_swap` receives the new index, or None if the build failed or returned nothing.
+        """
+        with self._swap_lock:
+            if coalesce and self._pending is not None and not self._pending.done():
+                return self._pending
+
+            def run():
+                vectorstore = None
+                try:
+                    vectorstore = build()
+                    if vectorstore is not None:
+                        self.update_vectorstore(vectorstore)
+                    return vectorstore
+                except Exception as e:
+                    print(f"⚠️ Background index rebuild failed, keeping snapshot {self._current.snapshot_id}: {e}")
+                    vectorstore = None
+                finally:
+                    if on_swap:
+                        on_swap(vectorstore)
+
+            self._pending = self._builder.submit(run)
+            return self._pending
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Course catalog test: courses being generated are never served by default, partial saves leave
+shards current, course IDs are unique across processes, the single-course layout migrates once
+and resumes after a crash, and shard loads don't block each other
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import threading
+
+from core.course_catalog import CourseCatalog, ShardCache
+
+COURSE = {"course_title": "Statistics", "modules": [{"week": 1, "title": "Optimization", "sub_topics": []}]}
+
+def test_generating_course_is_not_default():
+    """A course saved mid-build is listed as generating, and neither becomes the default nor bumps its version."""
+    with tempfile.TemporaryDirectory() as root:
+        catalog = CourseCatalog(root)
+        finished = catalog.create_course("Statistics")
+        catalog.save_course(finished, COURSE)
+        building = catalog.create_course("Algebra")
+        catalog.save_course(building, {**COURSE, "course_title": "Algebra"}, status="generating")
+
+        assert [course["status"] for course in catalog.list_courses()] == ["ready", "generating"]
+        assert catalog.default_course_id() == finished
+        assert catalog.course_entry(building).get("content_version") is None
+
+        catalog.save_course(building, {**COURSE, "course_title": "Algebra"}, status="generating")
+        assert catalog.course_entry(building).get("content_version") is None
+        catalog.save_course(building, {**COURSE, "course_title": "Algebra"})
+        assert catalog.course_entry(building)["content_version"] == 1
+        assert catalog.default_course_id() == building
+
+def test_course_ids_are_unique():
+    """Catalogs sharing a root allocate distinct IDs without losing entries, and never reuse deleted IDs."""
+    with tempfile.TemporaryDirectory() as root:
+        # Separate instances share only the lock file, like separate processes
+        created = []
+        threads = [
+            threading.Thread(target=lambda: created.extend(CourseCatalog(root).create_course() for _ in range(5)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        catalog = CourseCatalog(root)
+        assert sorted(created, key=int) == [str(number) for number in range(1, 41)]
+        assert len(catalog._read()) == 40
+        assert not os.path.exists(os.path.join(root, "catalog.lock"))
+
+        catalog.delete_course("40")
+        assert catalog.create_course() == "41"
+
+def test_single_course_migrates_once():
+    """Concurrent migrations of the single-course layout create exactly one course."""
+    with tempfile.TemporaryDirectory() as root:
+        courses_dir = os.path.join(root, "courses")
+        documents_dir = os.path.join(root, "documents")
+        vectorstore_dir = os.path.join(root, "vectorstore")
+        os.makedirs(documents_dir)
+        os.makedirs(vectorstore_dir)
+        with open(os.path.join(documents_dir, "notes.pdf"), "w") as f:
+            f.write("notes")
+        course_json_path = os.path.join(root, "course_output.json")
+        with open(course_json_path, "w") as f:
+            json.dump(COURSE, f)
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(
+                CourseCatalog(courses_dir).migrate_single_course(course_json_path, documents_dir, vectorstore_dir)
+            ))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        catalog = CourseCatalog(courses_dir)
+        assert sorted(results, key=str) == ["1"] + [None] * 7
+        assert [course["course_id"] for course in catalog.list_courses()] == ["1"]
+        assert os.listdir(catalog.documents_dir("1")) == ["notes.pdf"]
+
+        # A legacy course JSON written again later is not migrated a second time
+        with open(course_json_path, "w") as f:
+            json.dump(COURSE, f)
+        assert catalog.migrate_single_course(course_json_path, documents_dir, vectorstore_dir) is None
+        assert len(catalog.list_courses()) == 1
+
+def test_interrupted_migration_resumes():
+    """A migration that crashes after creating its course resumes into that course on the next start."""
+    with tempfile.TemporaryDirectory() as root:
+        courses_dir = os.path.join(root, "courses")
+        documents_dir = os.path.join(root, "documents")
+        vectorstore_dir = os.path.join(root, "vectorstore")
+        os.makedirs(documents_dir)
+        os.makedirs(vectorstore_dir)
+        with open(os.path.join(documents_dir, "notes.pdf"), "w") as f:
+            f.write("notes")
+        course_json_path = os.path.join(root, "course_output.json")
+        with open(course_json_path, "w") as f:
+            json.dump(COURSE, f)
+
+        def crash(*args):
+            raise OSError("process killed")
+
+        move = shutil.move
+        shutil.move = crash
+        try:
+            CourseCatalog(courses_dir).migrate_single_course(course_json_path, documents_dir, vectorstore_dir)
+            assert False, "the migration did not crash"
+        except OSError:
+            pass
+        finally:
+            shutil.move = move
+
+        catalog = CourseCatalog(courses_dir)
+        assert catalog.migrate_single_course(course_json_path, documents_dir, vectorstore_dir) == "1"
+        assert [course["course_id"] for course in catalog.list_courses()] == ["1"]
+        assert os.listdir(catalog.documents_dir("1")) == ["notes.pdf"]
+        assert not os.path.exists(course_json_path)
+        assert catalog.migrate_single_course(course_json_path, documents_dir, vectorstore_dir) is None
+
+def test_shard_loads_run_per_course():
+    """Shards of different courses load concurrently; requests for one course share a single load."""
+    loads = []
+
+    def loader(course_id):
+        loads.append(course_id)
+        time.sleep(0.3)
+        return f"shard {course_id}"
+
+    cache = ShardCache(loader=loader, stamp=lambda course_id: 1)
+    threads = [threading.Thread(target=cache.get, args=(course_id,)) for course_id in ("1", "1", "2", "2")]
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - start
+
+    assert sorted(loads) == ["1", "2"]
+    assert elapsed < 0.55, f"loads of different courses were serialized ({elapsed:.2f}s)"
+    assert cache.get("1") == "shard 1"
+
+def main():
+    """Main test function."""
+    print("🧪 Course Catalog Test")
+    print("=" * 40)
+
+    start = time.time()
+    test_generating_course_is_not_default()
+    print("📚 Courses being generated stay out of the default")
+    test_course_ids_are_unique()
+    print("📚 Course IDs allocated once across catalogs")
+    test_single_course_migrates_once()
+    print("📚 Single-course layout migrated once")
+    test_interrupted_migration_resumes()
+    print("📚 Interrupted migration resumed")
+    test_shard_loads_run_per_course()
+    print("📚 Shard loads run per course")
+    print(f"\n✅ Course catalog test passed in {time.time() - start:.2f}s")
+
+if __name__ == "__main__":
+    try:
+        main()
+    except AssertionError as e:
+        print(f"\n❌ Course catalog test failed: {e}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        print("\n🛑 Test interrupted by user")
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Course generator test: the streamed curriculum is parsed from partial JSON, each module is
+handed over once, as soon as it is complete, and condensed course material fits the prompt limit
+"""
+
+import os
+import sys
+import json
+import time
+from typing import List
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+import config
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.prompts import ChatPromptTemplate
+from core.course_generator import CourseGenerator
+from models.schemas import CourseLMS, Module, SubTopic
+
+class RecordingChatModel(BaseChatModel):
+    """Streams a fixed response one character at a time, recording what has been streamed."""
+
+    response: str
+    streamed: List[str] = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "recording-fake"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.response))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        for char in self.response:
+            self.streamed.append(char)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=char))
+
+def curriculum(weeks: int = 4, topics: int = 3) -> CourseLMS:
+    return CourseLMS(course_title="Statistics", modules=[
+        Module(week=week, title=f"Week {week}", sub_topics=[
+            SubTopic(title=f"Topic {week}.{topic}") for topic in range(1, topics + 1)
+        ])
+        for week in range(1, weeks + 1)
+    ])
+
+def stream(response: str):
+    """Streams `response` as the curriculum completion; returns the curriculum and the handed-over modules."""
+    generator = CourseGenerator()
+    generator.curriculum_model = RecordingChatModel(response=response)
+    delivered = []
+
+    def on_module(module: Module):
+        delivered.append((module, len("".join(generator.curriculum_model.streamed))))
+
+    result = generator._stream_curriculum(ChatPromptTemplate.from_template("{context}"), "material", on_module)
+    return result, delivered
+
+def test_modules_stream_as_they_complete():
+    """Each module is handed over complete, once, before the stream ends; the last at the end."""
+    expected = curriculum()
+    for response in (
+        "```json\n" + json.dumps(expected.dict(), indent=2) + "\n```",
+        json.dumps(expected.dict(), separators=(",", ":")),
+    ):
+        result, delivered = stream(response)
+        assert [module for module, _ in delivered] == expected.modules
+        assert [module.week for module in result.modules] == [1, 2, 3, 4]
+        assert all(result.modules[i] is module for i, (module, _) in enumerate(delivered)), \
+            "curriculum modules are not the objects handed over"
+
+        positions = [position for _, position in delivered]
+        assert positions == sorted(positions)
+        assert all(position < len(response) for position in positions[:-1]), \
+            f"modules were only handed over at the end of the stream: {positions}"
+        # Each module was handed over only after its last sub-topic had streamed
+        for module, position in delivered:
+            assert f'"{module.sub_topics[-1].title}"' in response[:position]
+
+def test_single_module():
+    """A one-module curriculum is handed over when the stream ends."""
+    expected = curriculum(weeks=1, topics=2)
+    response = json.dumps(expected.dict())
+    result, delivered = stream(response)
+    assert [module for module, _ in delivered] == expected.modules
+    assert delivered[0][1] == len(response)
+    assert result.modules[0] is delivered[0][0]
+
+def test_condensed_context_fits_the_limit():
+    """Outlines that never shrink below the limit are truncated to fit, each keeping a share."""
+    saved = config.CURRICULUM_MAX_CONTEXT_TOKENS, config.CURRICULUM_MAP_GROUP_TOKENS
+    config.CURRICULUM_MAX_CONTEXT_TOKENS, config.CURRICULUM_MAP_GROUP_TOKENS = 400, 300
+    try:
+        generator = CourseGenerator()
+        # Every summary is as long as a whole group, so merging never converges
+        generator.curriculum_model = RecordingChatModel(response="outline " * 300)
+        context = generator._condense_context([f"Chunk {i} on gradient descent. " * 40 for i in range(12)])
+        assert generator._count_tokens(context) <= config.CURRICULUM_MAX_CONTEXT_TOKENS
+        assert all(outline.startswith("outline") for outline in context.split("\n---\n"))
+    finally:
+        config.CURRICULUM_MAX_CONTEXT_TOKENS, config.CURRICULUM_MAP_GROUP_TOKENS = saved
+
+def main():
+    """Main test function."""
+    print("🧪 Course Generator Test")
+    print("=" * 40)
+
+    start = time.time()
+    test_modules_stream_as_they_complete()
+    test_single_module()
+    test_condensed_context_fits_the_limit()
+    print(f"\n✅ Course generator test passed in {time.time() - start:.2f}s")
+
+if __name__ == "__main__":
+    try:
+        main()
+    except AssertionError as e:
+        print(f"\n❌ Course generator test failed: {e}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        print("\n🛑 Test interrupted by user")
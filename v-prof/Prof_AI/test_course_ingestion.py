@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Course ingestion test: re-ingesting a course must not feed its previously generated content
+back into course generation
+"""
+
+import os
+import sys
+import time
+import hashlib
+import tempfile
+from contextlib import contextmanager
+from typing import List
+
+import numpy as np
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+import config
+from langchain_core.embeddings import Embeddings
+from core.course_generator import CourseGenerator
+from models.schemas import CourseLMS, Module, SubTopic
+
+def write_pdf(path: str, pages):
+    """Writes a minimal PDF with one line of Helvetica text per page."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+    data, offsets = b"%PDF-1.4\n", []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(data))
+        data += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(data)
+    data += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    data += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode("latin-1")
+    data += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    with open(path, "wb") as f:
+        f.write(data)
+
+class FakeEmbeddings(Embeddings):
+    """Deterministic random vectors seeded by the text, so equal texts embed identically."""
+
+    def __init__(self, size: int):
+        self.size = size
+
+    def _vector(self, text: str) -> List[float]:
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+        return np.random.default_rng(seed).standard_normal(self.size).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._vector(text)
+
+class Upload:
+    """The parts of an UploadFile that process_uploaded_pdfs uses."""
+
+    def __init__(self, path: str):
+        self.filename = os.path.basename(path)
+        self.file = open(path, "rb")
+
+class RecordingGenerator:
+    """Replaces CourseGenerator.generate_course, recording its inputs."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, generator, documents, vector_index, course_title=None, on_event=None, retrieval_filter=None):
+        self.calls.append({"documents": documents, "vector_index": vector_index, "retrieval_filter": retrieval_filter})
+        return CourseLMS(course_title=course_title or "Statistics", modules=[
+            Module(week=1, title="Optimization", sub_topics=[
+                SubTopic(title="Gradient descent", content="GENERATED lecture on gradient descent and step sizes.")
+            ])
+        ])
+
+@contextmanager
+def configured(root: str):
+    """Points the data paths in config at `root` for the duration of the block, then restores them."""
+    settings = {
+        "COURSES_DIR": os.path.join(root, "courses"),
+        "DOCUMENTS_DIR": os.path.join(root, "documents"),
+        "VECTORSTORE_DIR": os.path.join(root, "vectorstore"),
+        "OUTPUT_JSON_PATH": os.path.join(root, "courses", "course_output.json"),
+        "EXTRACTION_CACHE_DIR": os.path.join(root, "cache", "extraction"),
+        "EMBEDDING_CACHE_PATH": os.path.join(root, "cache", "embeddings.sqlite3"),
+        "EXTRACTION_WORKERS": 1,
+        "INCREMENTAL_INGESTION": True,
+    }
+    saved = {name: getattr(config, name) for name in settings}
+    try:
+        for name, value in settings.items():
+            setattr(config, name, value)
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(config, name, value)
+
+def test_reingest_excludes_generated_content():
+    """Regenerating a course uses only its uploaded documents, never its earlier generated content."""
+    from services.document_service import COURSE_SOURCES, DocumentService
+
+    recorder = RecordingGenerator()
+    original = CourseGenerator.__init__, CourseGenerator.generate_course
+    CourseGenerator.__init__ = lambda self: None
+    CourseGenerator.generate_course = lambda self, *args, **kwargs: recorder(self, *args, **kwargs)
+    try:
+        with tempfile.TemporaryDirectory() as root, configured(root):
+            pdf_path = os.path.join(root, "notes.pdf")
+            write_pdf(pdf_path, ["Gradient descent minimizes the training loss.",
+                                 "Regularization trades bias for variance."])
+
+            service = DocumentService()
+            processor = service.document_processor
+            processor.vectorizer.embeddings = processor.embeddings = FakeEmbeddings(size=32)
+
+            course = service.process_uploaded_pdfs([Upload(pdf_path)], "Statistics")
+            course_id = course["course_id"]
+            # Index the generated content into the course's shard, as the chat service does
+            vectorstore, added = processor.index_course_content(course_id, processor.catalog.load_course(course_id))
+            assert added > 0
+            assert any(doc.metadata["source"] in COURSE_SOURCES for doc in vectorstore.get_documents())
+
+            service.process_uploaded_pdfs([Upload(pdf_path)], "Statistics", course_id=course_id)
+    finally:
+        CourseGenerator.__init__, CourseGenerator.generate_course = original
+
+    assert len(recorder.calls) == 2
+    regeneration = recorder.calls[1]
+    sources = {doc.metadata["source"] for doc in regeneration["documents"]}
+    assert sources == {"notes.pdf"}, f"curriculum input includes {sources}"
+    assert not any("GENERATED" in doc.page_content for doc in regeneration["documents"])
+    assert regeneration["retrieval_filter"] == {"source": ["notes.pdf"]}
+
+    index = regeneration["vector_index"]
+    assert any(doc.metadata["source"] in COURSE_SOURCES for doc in index.get_documents())
+    retrieved = index.similarity_search("gradient descent lecture", k=10, filter=regeneration["retrieval_filter"])
+    assert retrieved and all(doc.metadata["source"] == "notes.pdf" for doc in retrieved)
+
+    print(f"📄 Regeneration used {len(regeneration['documents'])} document chunks, none generated")
+
+def main():
+    """Main test function."""
+    print("🧪 Course Ingestion Test")
+    print("=" * 40)
+
+    start = time.time()
+    test_reingest_excludes_generated_content()
+    print(f"\n✅ Course ingestion test passed in {time.time() - start:.2f}s")
+
+if __name__ == "__main__":
+    try:
+        main()
+    except AssertionError as e:
+        print(f"\n❌ Course ingestion test failed: {e}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        print("\n🛑 Test interrupted by user")
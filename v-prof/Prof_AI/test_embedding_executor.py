@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Embedding executor test against a local fake OpenAI-compatible embeddings server
+"""
+
+import sys
+import json
+import time
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from core.embedding_executor import BatchedEmbeddings
+
+class FakeEmbeddingServer:
+    """Serves /v1/embeddings with deterministic vectors, throttling the first request."""
+
+    def __init__(self, throttle_first: int = 1, latency: float = 0.05):
+        self.requests = []
+        self.active = 0
+        self.max_active = 0
+        self.throttle_remaining = throttle_first
+        self.latency = latency
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_address[1]}/v1"
+
+    @staticmethod
+    def vector(text: str):
+        digest = hashlib.sha256(text.encode("utf-8")).digest()
+        return [b / 255.0 for b in digest[:8]]
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, payload, headers=None):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with server._lock:
+                    throttle = server.throttle_remaining > 0
+                    if throttle:
+                        server.throttle_remaining -= 1
+                    else:
+                        server.requests.append(body["input"])
+                        server.active += 1
+                        server.max_active = max(server.max_active, server.active)
+                if throttle:
+                    self._send(429, {"error": {"message": "Rate limit reached", "type": "requests"}},
+                               {"retry-after": "0.1"})
+                    return
+
+                time.sleep(server.latency)
+                # Answer out of order; clients must sort by index
+                data = [
+                    {"object": "embedding", "index": i, "embedding": server.vector(text)}
+                    for i, text in enumerate(body["input"])
+                ][::-1]
+                with server._lock:
+                    server.active -= 1
+                self._send(200, {
+                    "object": "list",
+                    "data": data,
+                    "model": body["model"],
+                    "usage": {"prompt_tokens": 0, "total_tokens": 0}
+                })
+
+        return Handler
+
+    def __enter__(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+def test_embedding_executor():
+    """Embeds 200 texts and checks ordering, token batching, retries and concurrency."""
+    texts = [f"Chunk number {i} about gradient descent. " * (1 + i % 7) for i in range(200)]
+
+    with FakeEmbeddingServer() as server:
+        embeddings = BatchedEmbeddings(
+            model="text-embedding-3-small",
+            api_key="test-key",
+            base_url=server.base_url,
+            max_batch_tokens=500,
+            max_concurrency=4,
+            initial_backoff=0.05
+        )
+        vectors = embeddings.embed_documents(texts)
+        query_vector = embeddings.embed_query("What is gradient descent?")
+
+    assert vectors == [server.vector(text) for text in texts], "vectors out of order"
+    assert query_vector == server.vector("What is gradient descent?")
+
+    document_requests = server.requests[:-1]
+    assert sorted(text for batch in document_requests for text in batch) == sorted(texts)
+    for batch in document_requests:
+        tokens = sum(embeddings.count_tokens(text) for text in batch)
+        assert len(batch) == 1 or tokens <= 500, f"batch of {tokens} tokens exceeds budget"
+    assert server.throttle_remaining == 0, "throttled request was not retried"
+    assert 1 < server.max_active <= 4, f"expected bounded concurrency, saw {server.max_active}"
+
+    print(f"📨 {len(document_requests)} requests, up to {server.max_active} in flight")
+
+def main():
+    """Main test function."""
+    print("🧪 Embedding Executor Test")
+    print("=" * 40)
+
+    start = time.time()
+    test_embedding_executor()
+    print(f"\n✅ Embedding executor test passed in {time.time() - start:.2f}s")
+
+if __name__ == "__main__":
+    try:
+        main()
+    except AssertionError as e:
+        print(f"\n❌ Embedding executor test failed: {e}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        print("\n🛑 Test interrupted by user")
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Index manifest test: diffing documents against the manifest, superseding changed sources and
+reusing the chunk IDs of unchanged chunks
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+from langchain_core.documents import Document
+from core.index_manifest import IndexManifest
+
+def chunks(source: str, *texts: str):
+    return [Document(page_content=text, metadata={"source": source}) for text in texts]
+
+def test_diff():
+    """New and changed sources are re-chunked; changed and removed ones are superseded."""
+    with tempfile.TemporaryDirectory() as root:
+        manifest = IndexManifest(os.path.join(root, "manifest.json"))
+        digests = {"a.pdf": "a1", "b.pdf": "b1", "c.pdf": "c1"}
+        list(manifest.tag_chunks(chunks("a.pdf", "alpha") + chunks("b.pdf", "beta"), digests))
+        manifest.ensure_documents(digests)
+        manifest.save()
+
+        manifest = IndexManifest(manifest.path)
+        to_embed, to_remove = manifest.diff({"a.pdf": "a1", "b.pdf": "b2", "d.pdf": "d1"})
+        assert sorted(to_embed) == ["b.pdf", "d.pdf"]
+        assert sorted(to_remove) == ["b.pdf", "c.pdf"]
+
+        # Sources indexed by another process are never superseded
+        _, to_remove = manifest.diff({"a.pdf": "a1", "b.pdf": "b1"}, ignore=["c.pdf"])
+        assert to_remove == []
+
+def test_supersede_reuses_unchanged_chunks():
+    """Re-chunking a changed source embeds only new chunks and tombstones only vanished ones."""
+    with tempfile.TemporaryDirectory() as root:
+        manifest = IndexManifest(os.path.join(root, "manifest.json"))
+        first = list(manifest.tag_chunks(chunks("a.pdf", "intro", "gradients", "summary"), {"a.pdf": "v1"}))
+        assert len(first) == 3
+        ids = {chunk.page_content: chunk.metadata["chunk_uid"] for chunk in first}
+
+        manifest.supersede(["a.pdf"])
+        second = list(manifest.tag_chunks(chunks("a.pdf", "intro", "momentum", "summary"), {"a.pdf": "v2"}))
+        assert [chunk.page_content for chunk in second] == ["momentum"]
+        assert manifest.superseded_chunk_ids() == [ids["gradients"]]
+        assert manifest.superseded_chunk_ids() == []
+
+        entry = manifest.documents["a.pdf"]
+        assert entry["digest"] == "v2"
+        assert ids["intro"] in entry["chunk_ids"] and ids["summary"] in entry["chunk_ids"]
+
+def test_tag_chunks_ids():
+    """Chunk IDs are stable per source and text, and repeated text gets distinct IDs."""
+    with tempfile.TemporaryDirectory() as root:
+        manifest = IndexManifest(os.path.join(root, "manifest.json"))
+        tagged = list(manifest.tag_chunks(
+            chunks("a.pdf", "repeat", "repeat") + chunks("b.pdf", "repeat"), {"a.pdf": "a1", "b.pdf": "b1"}
+        ))
+        uids = [chunk.metadata["chunk_uid"] for chunk in tagged]
+        assert len(set(uids)) == 3
+
+        again = IndexManifest(os.path.join(root, "other.json"))
+        assert [chunk.metadata["chunk_uid"] for chunk in again.tag_chunks(chunks("a.pdf", "repeat"), {"a.pdf": "a1"})] == uids[:1]
+
+def main():
+    """Main test function."""
+    print("🧪 Index Manifest Test")
+    print("=" * 40)
+
+    start = time.time()
+    test_diff()
+    test_supersede_reuses_unchanged_chunks()
+    test_tag_chunks_ids()
+    print(f"\n✅ Index manifest test passed in {time.time() - start:.2f}s")
+
+if __name__ == "__main__":
+    try:
+        main()
+    except AssertionError as e:
+        print(f"\n❌ Index manifest test failed: {e}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        print("\n🛑 Test interrupted by user")
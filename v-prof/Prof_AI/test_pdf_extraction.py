@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+PDF extraction test: extracted pages are cached per file, and a file with pages that could
+not be extracted is neither cached nor indexed
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+import processors.pdf_extractor as pdf_extractor
+from processors.extraction_cache import ExtractionCache
+from processors.pdf_extractor import PDFExtractor
+from test_course_ingestion import FakeEmbeddings, configured, write_pdf
+
+PAGES = [f"Lecture page {number} on gradient descent." for number in range(1, 6)]
+
+def test_pages_are_cached_per_file():
+    """A fully extracted file is cached page range by page range and streamed back from the cache."""
+    with tempfile.TemporaryDirectory() as root:
+        documents_dir = os.path.join(root, "documents")
+        os.makedirs(documents_dir)
+        write_pdf(os.path.join(documents_dir, "notes.pdf"), PAGES)
+        cache = ExtractionCache(os.path.join(root, "cache"), max_bytes=10 * 1024 * 1024)
+
+        extractor = PDFExtractor(pages_per_task=2, cache=cache)
+        pages = list(extractor.iter_pages(documents_dir))
+        assert [page["page"] for page in pages] == [1, 2, 3, 4, 5]
+        assert not extractor.failed_files
+
+        digest = cache.file_digest(os.path.join(documents_dir, "notes.pdf"))
+        assert [text for _, text in cache.get(digest)] == [page["content"] for page in pages]
+        assert [name for name in os.listdir(cache.cache_dir) if name.endswith(".tmp")] == []
+
+        again = list(PDFExtractor(pages_per_task=2, cache=cache).iter_pages(documents_dir))
+        assert again == pages
+
+        # Digests the caller already computed are used as they are, without hashing the file again
+        hashed = []
+        cache.file_digest = lambda file_path: hashed.append(file_path)
+        again = list(PDFExtractor(pages_per_task=2, cache=cache).iter_pages(documents_dir, digests={"notes.pdf": digest}))
+        assert again == pages and hashed == []
+
+        # A corrupt entry is dropped and its file reported, to be extracted again
+        with open(cache._entry_path(digest), 'a', encoding='utf-8') as f:
+            f.write("{not json\n")
+        extractor = PDFExtractor(pages_per_task=2, cache=cache)
+        list(extractor.iter_pages(documents_dir, digests={"notes.pdf": digest}))
+        assert extractor.failed_files == {"notes.pdf"} and cache.get(digest) is None
+
+_extract_pdf_pages = pdf_extractor._extract_pdf_pages
+
+def flaky(file_path, start, end):
+    """Fails on the page range starting at the third page."""
+    if start == 2:
+        raise ValueError("corrupt page stream")
+    return _extract_pdf_pages(file_path, start, end)
+
+def test_failed_range_is_not_cached():
+    """A page range that fails is reported, and the file is not cached."""
+    pdf_extractor._extract_pdf_pages = flaky
+    try:
+        with tempfile.TemporaryDirectory() as root:
+            documents_dir = os.path.join(root, "documents")
+            os.makedirs(documents_dir)
+            write_pdf(os.path.join(documents_dir, "notes.pdf"), PAGES)
+            write_pdf(os.path.join(documents_dir, "slides.pdf"), ["Regularization trades bias for variance."])
+            cache = ExtractionCache(os.path.join(root, "cache"), max_bytes=10 * 1024 * 1024)
+
+            extractor = PDFExtractor(pages_per_task=2, cache=cache)
+            pages = list(extractor.iter_pages(documents_dir, filenames=["notes.pdf", "slides.pdf"]))
+            assert {(page["source"], page["page"]) for page in pages} == {
+                ("notes.pdf", 1), ("notes.pdf", 2), ("notes.pdf", 5), ("slides.pdf", 1)
+            }
+            assert extractor.failed_files == {"notes.pdf"}
+            assert cache.get(cache.file_digest(os.path.join(documents_dir, "notes.pdf"))) is None
+            assert cache.get(cache.file_digest(os.path.join(documents_dir, "slides.pdf"))) is not None
+            assert [name for name in os.listdir(cache.cache_dir) if name.endswith(".tmp")] == []
+
+    finally:
+        pdf_extractor._extract_pdf_pages = _extract_pdf_pages
+
+def test_failed_file_is_not_indexed():
+    """Chunks of a partly extracted file are dropped from the index, and the file is retried next time."""
+    from services.document_service import DocumentService
+    from processors.text_chunker import TextChunker
+
+    with tempfile.TemporaryDirectory() as root, configured(root):
+        service = DocumentService()
+        processor = service.document_processor
+        processor.vectorizer.embeddings = processor.embeddings = FakeEmbeddings(size=32)
+        course_id = processor.catalog.create_course("Statistics")
+        documents_dir = processor.catalog.documents_dir(course_id)
+        os.makedirs(documents_dir, exist_ok=True)
+        write_pdf(os.path.join(documents_dir, "notes.pdf"), PAGES)
+        write_pdf(os.path.join(documents_dir, "slides.pdf"), ["Regularization trades bias for variance."])
+
+        def ingest():
+            extractor = PDFExtractor(pages_per_task=2)
+            return extractor, service._update_vector_store_incrementally(
+                course_id, extractor, TextChunker(chunk_size=200, chunk_overlap=0), processor.vectorizer
+            )
+
+        pdf_extractor._extract_pdf_pages = flaky
+        try:
+            extractor, (vector_store, manifest) = ingest()
+        finally:
+            pdf_extractor._extract_pdf_pages = _extract_pdf_pages
+        assert extractor.failed_files == {"notes.pdf"}
+        assert {doc.metadata["source"] for doc in vector_store.get_documents()} == {"slides.pdf"}
+        assert "notes.pdf" not in manifest.documents
+        processor.vectorizer.save_vector_store(vector_store, processor.catalog.vectorstore_dir(course_id))
+        manifest.save()
+
+        extractor, (vector_store, manifest) = ingest()
+        assert not extractor.failed_files
+        notes = [doc for doc in vector_store.get_documents() if doc.metadata["source"] == "notes.pdf"]
+        assert notes and max(doc.metadata["page_end"] for doc in notes) == len(PAGES)
+
+def main():
+    """Main test function."""
+    print("🧪 PDF Extraction Test")
+    print("=" * 40)
+
+    start = time.time()
+    test_pages_are_cached_per_file()
+    print("📄 Extracted pages cached and read back")
+    test_failed_range_is_not_cached()
+    print("📄 Failed page range kept out of the cache")
+    test_failed_file_is_not_indexed()
+    print("📄 Partly extracted file kept out of the index and retried")
+    print(f"\n✅ PDF extraction test passed in {time.time() - start:.2f}s")
+
+if __name__ == "__main__":
+    try:
+        main()
+    except AssertionError as e:
+        print(f"\n❌ PDF extraction test failed: {e}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        print("\n🛑 Test interrupted by user")
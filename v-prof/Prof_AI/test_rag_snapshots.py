@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+RAG snapshot test: queries keep the index snapshot they started with, replaced snapshots are
+reclaimed once released, and background rebuilds swap in atomically
+"""
+
+import os
+import sys
+import time
+import hashlib
+from typing import List
+
+import numpy as np
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ.setdefault("GROQ_API_KEY", "test-key")
+
+from langchain_core.embeddings import Embeddings
+from core.vector_index import VectorIndex
+from services.rag_service import IndexSnapshot, RAGService
+
+class FakeEmbeddings(Embeddings):
+    """Deterministic random vectors seeded by the text, so equal texts embed identically."""
+
+    def __init__(self, size: int):
+        self.size = size
+
+    def _vector(self, text: str) -> List[float]:
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+        return np.random.default_rng(seed).standard_normal(self.size).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._vector(text)
+
+def build_index(*texts: str) -> VectorIndex:
+    return VectorIndex.from_texts(list(texts), FakeEmbeddings(size=16))
+
+def test_snapshot_refcount():
+    """A retired snapshot is reclaimed only when its last holder releases it."""
+    snapshot = IndexSnapshot(build_index("alpha", "beta"), snapshot_id=1)
+    snapshot.acquire()
+    snapshot.acquire()
+    snapshot.retire()
+    assert not snapshot.reclaimed
+    snapshot.release()
+    assert not snapshot.reclaimed
+    snapshot.release()
+    assert snapshot.reclaimed and snapshot.retriever is None
+
+    idle = IndexSnapshot(build_index("alpha"), snapshot_id=2)
+    idle.retire()
+    assert idle.reclaimed, "a snapshot nobody holds is reclaimed on retire"
+
+def test_swap_keeps_inflight_snapshot():
+    """A query holding a snapshot finishes on it while a new index is swapped in."""
+    service = RAGService(build_index("Gradient descent minimizes the loss."))
+    with service.snapshot() as held:
+        service.update_vectorstore(build_index("Kernels map inputs to feature spaces."))
+        assert service.vectorstore is not held.vectorstore
+        assert not held.reclaimed
+        docs = service.retrieve("gradient descent", snapshot=held)
+        assert docs[0].page_content.startswith("Gradient descent")
+    assert held.reclaimed
+    assert service.retrieve("kernels")[0].page_content.startswith("Kernels")
+
+def test_snapshot_keys_are_unique():
+    """Snapshot keys differ across swaps and reloads, even where snapshot IDs and index versions repeat."""
+    index = build_index("Gradient descent minimizes the loss.")
+    first, reloaded = RAGService(index), RAGService(index)
+    assert first._current.snapshot_id == reloaded._current.snapshot_id
+    assert first.snapshot_key != reloaded.snapshot_key
+
+    key = first.snapshot_key
+    first.update_vectorstore(build_index("Gradient descent minimizes the loss."))
+    assert first.vectorstore.version == index.version and first.snapshot_key != key
+
+def test_background_rebuild():
+    """Rebuilds swap in their result and report it; a failed rebuild keeps the current snapshot."""
+    service = RAGService(build_index("first"))
+    swapped = []
+    new_index = build_index("second")
+    service.rebuild_in_background(lambda: new_index, on_swap=swapped.append).result(timeout=10)
+    assert service.vectorstore is new_index and swapped == [new_index]
+
+    def failing_build():
+        raise RuntimeError("index files are being rewritten")
+
+    service.rebuild_in_background(failing_build, on_swap=swapped.append).result(timeout=10)
+    assert service.vectorstore is new_index and swapped == [new_index, None]
+
+def main():
+    """Main test function."""
+    print("🧪 RAG Snapshot Test")
+    print("=" * 40)
+
+    start = time.time()
+    test_snapshot_refcount()
+    test_swap_keeps_inflight_snapshot()
+    test_snapshot_keys_are_unique()
+    test_background_rebuild()
+    print(f"\n✅ RAG snapshot test passed in {time.time() - start:.2f}s")
+
+if __name__ == "__main__":
+    try:
+        main()
+    except AssertionError as e:
+        print(f"\n❌ RAG snapshot test failed: {e}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        print("\n🛑 Test interrupted by user")
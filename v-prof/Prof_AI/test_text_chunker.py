@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Text chunker test: content-defined boundaries survive edits, and streamed chunks record the
+pages they span
+"""
+
+import sys
+import time
+import random
+
+from processors.text_chunker import ContentDefinedSplitter, TextChunker, content_hash
+
+def lecture_text(sentences: int, seed: int = 7) -> str:
+    rng = random.Random(seed)
+    words = ["gradient", "descent", "loss", "variance", "bias", "kernel", "margin", "entropy",
+             "posterior", "likelihood", "regularization", "momentum", "batch", "epoch"]
+    return " ".join(
+        " ".join(rng.choice(words) for _ in range(rng.randint(6, 16))).capitalize() + "."
+        for _ in range(sentences)
+    )
+
+def test_boundaries_survive_edits():
+    """An edit early in a document changes only the chunks around it."""
+    splitter = ContentDefinedSplitter(chunk_size=300)
+    text = lecture_text(400)
+    original = splitter.split_text(text)
+    assert len(original) > 10
+    assert "".join(chunk.replace(" ", "") for chunk in original) == text.replace(" ", "")
+    assert all(len(chunk) <= splitter.max_size for chunk in original)
+
+    edited = splitter.split_text(text.replace(".", ". An inserted remark about convexity.", 1))
+    unchanged = set(map(content_hash, original)) & set(map(content_hash, edited))
+    assert len(unchanged) >= len(original) - 3, f"only {len(unchanged)} of {len(original)} chunks survived"
+
+    # Reflowed whitespace, e.g. from a page break, leaves the boundaries in place
+    reflowed = splitter.split_text(text.replace(" ", "\n", 50))
+    assert list(map(content_hash, reflowed)) == list(map(content_hash, original))
+
+def test_streamed_chunks_record_pages():
+    """iter_chunks tags every chunk with its source and the pages it spans."""
+    pages = [
+        {"source": "notes.pdf", "page": number, "content": lecture_text(12, seed=number)}
+        for number in range(1, 9)
+    ] + [{"source": "slides.pdf", "page": 1, "content": lecture_text(5, seed=99)}]
+
+    for mode in ("content_defined", "recursive"):
+        chunker = TextChunker(chunk_size=200, chunk_overlap=0, mode=mode)
+        chunks = list(chunker.iter_chunks(iter(pages)))
+        notes = [chunk for chunk in chunks if chunk.metadata["source"] == "notes.pdf"]
+        slides = [chunk for chunk in chunks if chunk.metadata["source"] == "slides.pdf"]
+        assert notes and slides
+
+        assert [chunk.metadata["chunk_id"] for chunk in notes] == list(range(len(notes)))
+        for chunk in notes:
+            start, end = chunk.metadata["page_start"], chunk.metadata["page_end"]
+            assert 1 <= start <= end <= 8
+            # The chunk's first words appear on its first page
+            assert chunk.page_content.split("\n")[0][:40] in pages[start - 1]["content"]
+        assert notes[0].metadata["page_start"] == 1 and notes[-1].metadata["page_end"] == 8
+        assert all(chunk.metadata["page_start"] == chunk.metadata["page_end"] == 1 for chunk in slides)
+        assert all(chunk.metadata["content_hash"] == content_hash(chunk.page_content) for chunk in chunks)
+
+def main():
+    """Main test function."""
+    print("🧪 Text Chunker Test")
+    print("=" * 40)
+
+    start = time.time()
+    test_boundaries_survive_edits()
+    test_streamed_chunks_record_pages()
+    print(f"\n✅ Text chunker test passed in {time.time() - start:.2f}s")
+
+if __name__ == "__main__":
+    try:
+        main()
+    except AssertionError as e:
+        print(f"\n❌ Text chunker test failed: {e}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        print("\n🛑 Test interrupted by user")
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Vector index test: save, memory-mapped load, filtered search and delete for every search dtype and backend,
+with full vectors and Matryoshka search prefixes, and the lexical fast path of hybrid search
+"""
+
+import sys
+import time
+import hashlib
+import tempfile
+import importlib.util
+from typing import List
+import numpy as np
+
+from langchain_core.embeddings import Embeddings
+from core.vector_index import SEARCH_DTYPES, VectorIndex
+
+BACKENDS = {"flat": {}}
+if importlib.util.find_spec("faiss"):
+    # IVF-PQ is trained with 4-bit sub-quantizers, so a few hundred vectors suffice
+    BACKENDS.update({"faiss": {}, "hnsw": {}, "ivfpq": {"nlist": 8, "pq_bits": 4, "pq_m": 8}})
+
+class FakeEmbeddings(Embeddings):
+    """Deterministic random vectors seeded by the text, so equal texts embed identically."""
+
+    def __init__(self, size: int):
+        self.size = size
+
+    def _vector(self, text: str) -> List[float]:
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+        return np.random.default_rng(seed).standard_normal(self.size).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._vector(text)
+
+class CountingEmbeddings(FakeEmbeddings):
+    """Fake embeddings that count query embeddings."""
+
+    def __init__(self, size: int):
+        super().__init__(size)
+        self.queries = 0
+
+    def embed_query(self, text: str) -> List[float]:
+        self.queries += 1
+        return super().embed_query(text)
+
+def corpus(count: int):
+    texts = [f"Lecture note {i} on topic {i % 7} in week {i % 5}" for i in range(count)]
+    metadatas = [{"source": f"notes{i % 3}.pdf", "week": i % 5} for i in range(count)]
+    return texts, metadatas
+
+def check_backend(backend: str, backend_params: dict, search_dtype: str, search_dimensions=None):
+    embeddings = FakeEmbeddings(size=32)
+    texts, metadatas = corpus(700)
+    index = VectorIndex.from_texts(
+        texts, embeddings, metadatas=metadatas, ids=[f"doc-{i}" for i in range(len(texts))],
+        backend=backend, backend_params=backend_params, search_dtype=search_dtype,
+        search_dimensions=search_dimensions
+    )
+    assert index.similarity_search(texts[42], k=1)[0].page_content == texts[42]
+
+    with tempfile.TemporaryDirectory() as path:
+        index.save(path)
+        loaded = VectorIndex.load(path, embeddings, backend=backend, backend_params=backend_params)
+        assert isinstance(loaded.vectors, np.memmap), "vectors were not memory-mapped"
+        assert loaded.search_dtype == search_dtype and len(loaded) == len(index)
+        assert loaded.version == index.version
+        assert loaded.search_vectors.dimensions == (search_dimensions or 32)
+        assert loaded.similarity_search(texts[42], k=1)[0].page_content == texts[42]
+
+        found = loaded.similarity_search(texts[42], k=5, filter={"week": 2})
+        assert len(found) == 5 and all(doc.metadata["week"] == 2 for doc in found)
+        found = loaded.similarity_search(texts[42], k=5, filter={"source": ["notes0.pdf", "notes1.pdf"]})
+        assert all(doc.metadata["source"] != "notes2.pdf" for doc in found)
+
+        assert loaded.delete(["doc-42", "doc-missing"])
+        assert not loaded.delete(["doc-missing"])
+        assert len(loaded) == len(texts) - 1 and "doc-42" not in loaded
+        assert all(doc.page_content != texts[42] for doc in loaded.similarity_search(texts[42], k=10))
+        assert loaded.similarity_search(texts[43], k=1)[0].page_content == texts[43]
+
+        loaded.save(path)
+        reloaded = VectorIndex.load(path, embeddings, backend=backend, backend_params=backend_params, mmap=False)
+        assert len(reloaded) == len(texts) - 1 and "doc-42" not in reloaded
+        assert reloaded.similarity_search(texts[43], k=1)[0].page_content == texts[43]
+
+        # A different search dtype than the saved one rebuilds the search copy
+        other = next(dtype for dtype in SEARCH_DTYPES if dtype != search_dtype)
+        converted = VectorIndex.load(path, embeddings, backend=backend, backend_params=backend_params,
+                                     search_dtype=other)
+        assert converted.search_dtype == other
+        assert converted.similarity_search(texts[43], k=1)[0].page_content == texts[43]
+
+def test_backends_and_dtypes():
+    """Every backend serves exact self-matches after save, load, filter and delete, at every dtype."""
+    for backend, backend_params in BACKENDS.items():
+        for search_dtype in SEARCH_DTYPES:
+            # A 16-dimension prefix of the 32-dimension vectors is rescored at full length
+            for search_dimensions in (None, 16):
+                check_backend(backend, backend_params, search_dtype, search_dimensions)
+                print(f"🗂️ {backend} / {search_dtype} / {search_dimensions or 'full'} ok")
+
+def test_lexical_fast_path():
+    """A decisive exact-term query with k matches is answered without embedding it."""
+    embeddings = CountingEmbeddings(size=16)
+    index = VectorIndex.from_texts([
+        "Gradient descent minimizes the training loss step by step.",
+        "Stochastic gradient descent samples a mini batch.",
+        "The bias variance tradeoff governs generalization.",
+        "Kernel methods map inputs into feature spaces.",
+        "Decision trees split on the most informative feature.",
+    ], embeddings)
+
+    assert index.lexical_fast_path("kernel methods", k=1) is not None
+    found = index.hybrid_search("kernel methods", k=1)
+    assert embeddings.queries == 0
+    assert found[0].page_content.startswith("Kernel methods")
+
+    # Fewer lexical matches than k: the dense ranking fills the result
+    assert index.lexical_fast_path("kernel methods", k=4) is None
+    assert len(index.hybrid_search("kernel methods", k=4)) == 4
+    assert embeddings.queries == 1
+
+def main():
+    """Main test function."""
+    print("🧪 Vector Index Test")
+    print("=" * 40)
+
+    start = time.time()
+    test_backends_and_dtypes()
+    test_lexical_fast_path()
+    print(f"\n✅ Vector index test passed in {time.time() - start:.2f}s")
+
+if __name__ == "__main__":
+    try:
+        main()
+    except AssertionError as e:
+        print(f"\n❌ Vector index test failed: {e}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        print("\n🛑 Test interrupted by user")